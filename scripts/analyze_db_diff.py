@@ -1,64 +1,49 @@
 #!/usr/bin/env python3
 """
 ローカルD1と本番環境のbuilding_regulationsテーブルの差分を分析
+本番側は .cache/ のスナップショットを読む（--refresh-cache で強制的に差分更新）
 """
-import json
-import subprocess
 import sys
 
-def get_municipalities(db_type):
-    """指定されたDB（local or remote）から自治体リストを取得"""
-    cmd = [
-        "npx", "wrangler", "d1", "execute", "real-estate-200units-db",
-        f"--{db_type}",
-        "--command=SELECT prefecture, city FROM building_regulations WHERE verification_status='VERIFIED' ORDER BY prefecture, city;"
-    ]
-    
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd="/home/user/webapp", timeout=30)
-        if result.returncode != 0:
-            print(f"Error executing command for {db_type}:", file=sys.stderr)
-            print(result.stderr, file=sys.stderr)
-            return set()
-        
-        # JSONパースを試みる
-        lines = result.stdout.strip().split('\n')
-        municipalities = set()
-        
-        for line in lines:
-            if '"prefecture"' in line and '"city"' in line:
-                try:
-                    # JSON形式の行をパース
-                    data = json.loads(line.strip().rstrip(','))
-                    if 'prefecture' in data and 'city' in data:
-                        municipalities.add((data['prefecture'], data['city']))
-                except:
-                    continue
-        
-        return municipalities
-    except Exception as e:
-        print(f"Exception for {db_type}: {e}", file=sys.stderr)
-        return set()
+from d1_client import D1Error, open_session
+from d1_fetch import open_pool
+from regulation_diff import diff_building_regulations, print_diff_summary
+from snapshot_cache import open_snapshot
+
+def count_municipalities(session):
+    """指定されたDB（ローカル or 本番スナップショット）のVERIFIED自治体数を取得"""
+    rows = session.query(
+        "SELECT COUNT(*) AS n FROM (SELECT DISTINCT prefecture, city FROM building_regulations WHERE verification_status='VERIFIED');"
+    )
+    return rows[0]['n'] if rows else 0
 
 def main():
     print("ローカルD1と本番環境の差分分析")
     print("="*60)
     
-    # データ取得
+    # データ取得（ハッシュが一致しない枝だけを取得）
     print("\n📊 データ取得中...")
-    local_municipalities = get_municipalities("local")
-    production_municipalities = get_municipalities("remote")
+    try:
+        remote = open_snapshot(refresh='--refresh-cache' in sys.argv[1:])
+        diff = diff_building_regulations(open_pool("local"), remote)
+        local_count = count_municipalities(open_session("local"))
+        production_count = count_municipalities(remote)
+    except D1Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
     
-    print(f"ローカルD1: {len(local_municipalities)}自治体")
-    print(f"本番環境: {len(production_municipalities)}自治体")
+    print_diff_summary(diff)
+    print(f"ローカルD1: {local_count}自治体")
+    print(f"本番環境: {production_count}自治体")
     
     # 差分計算
-    missing_in_production = local_municipalities - production_municipalities
-    missing_in_local = production_municipalities - local_municipalities
+    missing_in_production = diff.cities_only_local
+    missing_in_local = diff.cities_only_remote
     
     print(f"\n📋 差分結果:")
     print(f"ローカルにあるが本番にない: {len(missing_in_production)}自治体")
     print(f"本番にあるがローカルにない: {len(missing_in_local)}自治体")
+    print(f"内容が異なる行: {len(diff.changed)}件")
     
     if missing_in_production:
         print("\n🔍 ローカルD1にあるが本番環境にない自治体:")
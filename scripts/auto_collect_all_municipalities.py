@@ -8,6 +8,8 @@ import json
 import csv
 from datetime import datetime
 
+from municipality_registry import load_registry
+
 # 未収集自治体リスト（missing_municipalities_full.csvから）
 TOKYO_WARDS = [
     '港区', '文京区', '台東区', '墨田区', '世田谷区', '渋谷区', '中野区', '杉並区',
@@ -38,6 +40,7 @@ SAITAMA_CITIES = [
 # 検索クエリテンプレート
 def generate_search_queries():
     """全自治体の検索クエリを生成"""
+    registry = load_registry()
     queries = []
     
     # 東京都の区
@@ -46,6 +49,7 @@ def generate_search_queries():
         queries.append({
             'prefecture': '東京都',
             'city': ward,
+            'code': registry.require('東京都', ward),
             'query': f'{ward} ワンルーム マンション 条例 site:{domain}',
             'domain': domain
         })
@@ -56,6 +60,7 @@ def generate_search_queries():
         queries.append({
             'prefecture': '東京都',
             'city': city,
+            'code': registry.require('東京都', city),
             'query': f'{city} ワンルーム マンション 条例 site:{domain}',
             'domain': domain
         })
@@ -66,6 +71,7 @@ def generate_search_queries():
         queries.append({
             'prefecture': '神奈川県',
             'city': city,
+            'code': registry.require('神奈川県', city),
             'query': f'{city} 開発 建築 指導要綱 site:{domain}',
             'domain': domain
         })
@@ -76,6 +82,7 @@ def generate_search_queries():
         queries.append({
             'prefecture': '千葉県',
             'city': city,
+            'code': registry.require('千葉県', city),
             'query': f'{city} 開発 建築 指導要綱 site:{domain}',
             'domain': domain
         })
@@ -86,6 +93,7 @@ def generate_search_queries():
         queries.append({
             'prefecture': '埼玉県',
             'city': city,
+            'code': registry.require('埼玉県', city),
             'query': f'{city} ワンルーム マンション 指導要綱 site:{domain}',
             'domain': domain
         })
@@ -93,44 +101,12 @@ def generate_search_queries():
     return queries
 
 def get_domain(prefecture, city):
-    """自治体のドメインを推定"""
-    # 東京都の区
-    if prefecture == '東京都' and city.endswith('区'):
-        city_name = city[:-1]  # '区'を除去
-        # 特殊ケース
-        if city_name == '中野':
-            return 'city.tokyo-nakano.lg.jp'
-        return f'city.{city_name}.tokyo.jp'
-    
-    # 東京都の市
-    if prefecture == '東京都' and city.endswith('市'):
-        city_name = city[:-1]
-        return f'city.{city_name}.tokyo.jp'
-    
-    # 神奈川県
-    if prefecture == '神奈川県':
-        city_name = city[:-1]
-        return f'city.{city_name}.kanagawa.jp'
-    
-    # 千葉県
-    if prefecture == '千葉県':
-        city_name = city[:-1]
-        return f'city.{city_name}.chiba.jp'
-    
-    # 埼玉県
-    if prefecture == '埼玉県':
-        if city == '伊奈町':
-            return 'town.saitama-ina.lg.jp'
-        elif city == '三芳町':
-            return 'town.saitama-miyoshi.lg.jp'
-        elif city == '川島町':
-            return 'town.kawajima.saitama.jp'
-        elif city == '吉見町':
-            return 'town.yoshimi.saitama.jp'
-        city_name = city[:-1]
-        return f'city.{city_name}.saitama.jp'
-    
-    return ''
+    """自治体の公式ドメイン（municipality_codes.csv、なければ空文字）"""
+    registry = load_registry()
+    code = registry.code(prefecture, city)
+    if code is None:
+        return ''
+    return registry.domain(code) or ''
 
 def main():
     queries = generate_search_queries()
@@ -138,7 +114,7 @@ def main():
     # CSVに出力
     output_file = '/home/user/webapp/scripts/all_municipalities_queries.csv'
     with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['prefecture', 'city', 'query', 'domain'])
+        writer = csv.DictWriter(f, fieldnames=['code', 'prefecture', 'city', 'query', 'domain'])
         writer.writeheader()
         writer.writerows(queries)
     
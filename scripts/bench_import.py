@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+インポート・SQL生成スクリプトのスループット計測（合成データ: 1都3県）
+
+data_collection_template.csv 形式と phase2 自治体CSV形式（generate_migration_from_csv が読む形式）の
+合成データを作り、scripts/ 内の各インポーター・SQL生成関数を migrations/ から作った使い捨ての
+SQLite に対して実行する。
+
+  - 粒度: municipality（実在の自治体名を繰り返す＝更新中心）
+          chome / banchi（市区町村列に「〇〇市本町1丁目」「…1丁目2番地」を入れる＝挿入中心）
+  - 件数: 1k〜1M行（--sizes で指定）
+  - 計測: 行/秒・ピークRSS（ケースごとに別プロセスで実行）・出力サイズ
+  - 結果は benchmarks/import_bench.json に実行ごとに追記し、前回の同じケースと比較する
+
+使い方:
+  python3 scripts/bench_import.py                               1k,10k,100k で全ケース
+  python3 scripts/bench_import.py --sizes 1000,1000000          件数を指定
+  python3 scripts/bench_import.py --cases generate_migration_from_csv --granularity banchi
+  python3 scripts/bench_import.py --list                        ケース一覧
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from d1_client import PROJECT_ROOT
+from seed_snapshot import bootstrap, ensure_snapshot
+from sql_emitter import write_insert_sql
+
+RESULTS_PATH = PROJECT_ROOT / "benchmarks" / "import_bench.json"
+DEFAULT_SIZES = [1000, 10000, 100000]
+GRANULARITIES = ['municipality', 'chome', 'banchi']
+CASE_TIMEOUT = 1800
+
+# 前回比でこれより遅くなったら警告
+REGRESSION_RATIO = 0.8
+
+TEMPLATE_FIELDS = [
+    'prefecture', 'city', 'one_room_applies', 'one_room_conditions', 'one_room_url',
+    'neighbor_notice_required', 'neighbor_notice_procedure', 'neighbor_url',
+    'development_guideline', 'parking_standard', 'bicycle_standard', 'garbage_required',
+    'development_url', 'data_source', 'verification_status', 'checked_date', 'notes',
+]
+
+PHASE2_FIELDS = [
+    'prefecture', 'municipality', 'municipality_type', 'verification_status', 'confidence',
+    'verification_method', 'one_room_guideline', 'one_room_apply_threshold', 'min_unit_area_m2',
+    'ceiling_height_m', 'manager_room_threshold_units', 'signboard_neighbor_explanation',
+    'bike_parking_rule', 'development_guideline_or_ordinance', 'development_guideline_url',
+    'district_plan_notes', 'prefecture_level_key_ordinances', 'notes',
+]
+
+TOWN_NAMES = ['本町', '中央', '緑町', '栄町', '旭町', '幸町', '新町', '東町', '西町', '南町']
+
+
+# ---------------------------------------------------------------------------
+# 合成データ
+# ---------------------------------------------------------------------------
+
+def base_municipalities():
+    """1都3県の自治体一覧（municipalities.json）"""
+    with open(Path(__file__).parent / "municipalities.json", 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [(m['prefecture'], m['city']) for group in data.values() for m in group]
+
+
+def synthetic_keys(rows, granularity):
+    """(都道府県, 市区町村列の値) を rows 件返す"""
+    bases = base_municipalities()
+    for i in range(rows):
+        prefecture, city = bases[i % len(bases)]
+        if granularity == 'municipality':
+            yield prefecture, city
+            continue
+        n = i // len(bases)
+        town = TOWN_NAMES[n % len(TOWN_NAMES)]
+        if granularity == 'chome':
+            yield prefecture, f"{city}{town}{n // len(TOWN_NAMES) + 1}丁目"
+        else:
+            chome = n // len(TOWN_NAMES)
+            yield prefecture, f"{city}{town}{chome // 50 + 1}丁目{chome % 50 + 1}番地"
+
+
+def write_template_csv(path, rows, granularity):
+    """data_collection_template.csv 形式"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(TEMPLATE_FIELDS)
+        for i, (prefecture, city) in enumerate(synthetic_keys(rows, granularity)):
+            applies = 'あり' if i % 3 else 'なし'
+            writer.writerow([
+                prefecture, city, applies,
+                f"専用面積25㎡以上・{i % 30 + 10}戸以上" if applies == 'あり' else '',
+                f"https://example.jp/{i}/oneroom", 'あり' if i % 2 else 'なし',
+                '標識設置・説明会' if i % 2 else '', '', 'あり' if i % 4 else 'なし',
+                '住戸数の30%以上', '住戸数の100%以上', 'あり', '', '',
+                'VERIFIED' if i % 5 else 'TO_COLLECT', '2025-12-23', f"合成データ {i}",
+            ])
+
+
+def write_phase2_csv(path, rows, granularity):
+    """generate_migration_from_csv.parse_csv_to_sql が読む phase2 形式"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(PHASE2_FIELDS)
+        for i, (prefecture, city) in enumerate(synthetic_keys(rows, granularity)):
+            writer.writerow([
+                prefecture, city, '区' if city.endswith('区') else '市', 'VERIFIED' if i % 5 else 'PARTIAL',
+                'MED', '公式サイト確認', 'ワンルーム形式集合住宅指導要綱' if i % 2 else '要確認',
+                '3階以上かつ15戸以上', f"{25 + i % 5}（定住型以外の最低）", '2.5', f"{30 + i % 20}戸以上",
+                '標識設置・近隣説明', '住戸数の100%', '開発指導要綱', f"https://example.jp/{i}/dev",
+                '地区計画あり', '東京都建築安全条例' if prefecture == '東京都' else '', f"合成データ {i}",
+            ])
+
+
+def write_dataset(kind, path, rows, granularity):
+    if kind == 'template':
+        write_template_csv(path, rows, granularity)
+    else:
+        write_phase2_csv(path, rows, granularity)
+
+
+def read_csv_rows(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+# ---------------------------------------------------------------------------
+# 使い捨てDB
+# ---------------------------------------------------------------------------
+
+def build_scratch_db(path):
+    """migrations/ を適用したSQLite（seed_snapshot のスナップショット）をコピーする"""
+    meta = ensure_snapshot(verbose=False)
+    bootstrap(path, force=True)
+    return meta.get('skipped_statements', 0)
+
+
+# ---------------------------------------------------------------------------
+# 計測ケース（子プロセスで実行。戻り値は (処理行数, 出力バイト数)）
+# ---------------------------------------------------------------------------
+
+def case_import_collected_data(dataset, db_path, out_dir):
+    import import_collected_data as m
+    rows = m.load_mapping(m.MAPPING).transform_all(m.load_csv_data(dataset))
+    conn = sqlite3.connect(str(db_path))
+    try:
+        m.insert_to_db(conn, rows)
+    finally:
+        conn.close()
+    return len(rows), 0
+
+
+def case_import_pipeline(dataset, db_path, out_dir):
+    """import_collected_data と同じマッピングを、並列変換・書き込み1スレッドのパイプラインで"""
+    import import_pipeline as m
+    stats = m.run_pipeline('collected_data', [dataset], str(db_path), jobs=0)
+    return stats.read.rows, 0
+
+
+def case_import_additional_regulations(dataset, db_path, out_dir):
+    import import_additional_regulations as m
+    regulations = [{
+        'prefecture': row['prefecture'],
+        'city': row['city'],
+        'apartment_restrictions_note': row['one_room_conditions'] or None,
+        'building_restrictions_note': f"近隣通知: {row['neighbor_notice_procedure']}",
+    } for row in read_csv_rows(dataset)]
+    m.update_database(regulations, db_path)
+    return len(regulations), 0
+
+
+def case_import_chatgpt_data(dataset, db_path, out_dir):
+    import import_chatgpt_data as m
+    types = ['ONE_ROOM', 'MIDRISE_DISPUTE', 'DEVELOPMENT']
+    data = [{
+        'prefecture': row['prefecture'],
+        'municipality': row['city'],
+        'regulation_type': types[i % len(types)],
+        'title': f"{row['city']} 指導要綱",
+        'url': row['one_room_url'],
+        'summary': row['notes'],
+        'verified': 1,
+        'checked_on': row['checked_date'],
+    } for i, row in enumerate(read_csv_rows(dataset))]
+    m.integrate_chatgpt_data(str(db_path), data)
+    return len(data), 0
+
+
+def case_import_kanagawa_chiba(dataset, db_path, out_dir):
+    import import_kanagawa_chiba as m
+    conn = sqlite3.connect(str(db_path))
+    count = 0
+    try:
+        for row in read_csv_rows(dataset):
+            try:
+                m.insert_city_data(conn, {
+                    'prefecture': row['prefecture'],
+                    'city': row['city'],
+                    'development_guideline': row['development_guideline'],
+                    'min_unit_area': 25,
+                    'notes': row['notes'],
+                })
+            except sqlite3.IntegrityError:
+                pass
+            count += 1
+        conn.commit()
+    finally:
+        conn.close()
+    return count, 0
+
+
+def case_generate_migration_from_csv(dataset, db_path, out_dir):
+    import generate_migration_from_csv as m
+    output = Path(out_dir) / "migration.sql"
+    m.parse_csv_to_sql(dataset, str(output), filter_verified_only=True)
+    return len(read_csv_rows(dataset)), os.path.getsize(output)
+
+
+def case_generate_migration_from_csv_parallel(dataset, db_path, out_dir):
+    """全コアでチャンクを並列に組み立てる"""
+    import generate_migration_from_csv as m
+    output = Path(out_dir) / "migration.sql"
+    m.parse_csv_to_sql(dataset, str(output), filter_verified_only=True, jobs=0, verbose=False)
+    return len(read_csv_rows(dataset)), os.path.getsize(output)
+
+
+def case_apply_generated_migration(dataset, db_path, out_dir):
+    """generate_migration_from_csv の出力を使い捨てDBに適用"""
+    import generate_migration_from_csv as m
+    output = Path(out_dir) / "migration.sql"
+    with contextlib.redirect_stdout(io.StringIO()):
+        m.parse_csv_to_sql(dataset, str(output), filter_verified_only=True)
+    started = time.perf_counter()
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with open(output, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+    finally:
+        conn.close()
+    return len(read_csv_rows(dataset)), os.path.getsize(output), time.perf_counter() - started
+
+
+def _prefecture_generator(module_name, prefecture):
+    def case(dataset, db_path, out_dir):
+        module = __import__(module_name)
+        data = [{'city': row['city'], 'ordinance': row['development_guideline'], 'url': row['one_room_url']}
+                for row in read_csv_rows(dataset) if row['prefecture'] == prefecture]
+        output = Path(out_dir) / "out.sql"
+        write_insert_sql(module.regulation_rows(data), output, module.INSERT_COLUMNS, mode='replace')
+        return len(data), os.path.getsize(output)
+    return case
+
+
+def _tokyo_generator(module_name):
+    def case(dataset, db_path, out_dir):
+        module = __import__(module_name)
+        data = [{
+            'prefecture': row['prefecture'],
+            'city': row['city'],
+            'normalized_address': f"{row['prefecture']}{row['city']}",
+            'local_ordinance': row['development_guideline'],
+            'data_source': '合成データ',
+            'data_source_url': row['one_room_url'],
+            'confidence_level': 'high',
+            'verification_status': 'VERIFIED',
+            'verified_by': 'bench',
+            'apartment_construction_feasible': 1,
+        } for row in read_csv_rows(dataset)]
+        output = Path(out_dir) / "out.sql"
+        write_insert_sql(module.regulation_rows(data), output, module.INSERT_COLUMNS, mode='replace')
+        return len(data), os.path.getsize(output)
+    return case
+
+
+# {ケース名: (データ形式, 関数)}
+CASES = {
+    'import_collected_data': ('template', case_import_collected_data),
+    'import_pipeline': ('template', case_import_pipeline),
+    'import_additional_regulations': ('template', case_import_additional_regulations),
+    'import_chatgpt_data': ('template', case_import_chatgpt_data),
+    'import_kanagawa_chiba': ('template', case_import_kanagawa_chiba),
+    'generate_migration_from_csv': ('phase2', case_generate_migration_from_csv),
+    'generate_migration_from_csv_parallel': ('phase2', case_generate_migration_from_csv_parallel),
+    'apply_generated_migration': ('phase2', case_apply_generated_migration),
+    'generate_chiba_27_complete': ('template', _prefecture_generator('generate_chiba_27_complete', '千葉県')),
+    'generate_saitama_37_complete': ('template', _prefecture_generator('generate_saitama_37_complete', '埼玉県')),
+    'generate_tokyo_17_complete': ('template', _tokyo_generator('generate_tokyo_17_complete')),
+    'collect_tokyo_17_cities': ('template', _tokyo_generator('collect_tokyo_17_cities')),
+}
+
+
+def run_case_in_child(name, dataset, db_path, out_dir, result_path):
+    """子プロセス側: ケースを1つ実行し、計測結果をJSONで書く"""
+    sys.path.insert(0, str(Path(__file__).parent))
+    _, case = CASES[name]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = case(dataset, db_path, out_dir)
+    elapsed = time.perf_counter() - started
+    rows, output_bytes = result[:2]
+    if len(result) > 2:
+        elapsed = result[2]     # 前処理を除いた時間
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'rows': rows,
+            'seconds': elapsed,
+            'output_bytes': output_bytes,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }, f)
+
+
+# ---------------------------------------------------------------------------
+# 実行・記録
+# ---------------------------------------------------------------------------
+
+def run_case(name, dataset, base_db, work_dir, timeout=CASE_TIMEOUT):
+    """ケースを別プロセスで実行して結果を返す"""
+    case_dir = Path(tempfile.mkdtemp(prefix=f"{name}_", dir=work_dir))
+    db_path = case_dir / "scratch.sqlite"
+    shutil.copy(base_db, db_path)
+    result_path = case_dir / "result.json"
+    cmd = [sys.executable, __file__, '--child', name, str(dataset), str(db_path), str(case_dir), str(result_path)]
+    try:
+        process = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'status': 'timeout'}
+    finally:
+        db_size = db_path.stat().st_size if db_path.exists() else 0
+
+    if process.returncode != 0 or not result_path.exists():
+        error = (process.stderr.strip().splitlines() or ['unknown error'])[-1]
+        shutil.rmtree(case_dir, ignore_errors=True)
+        return {'status': 'error', 'error': error}
+    with open(result_path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    shutil.rmtree(case_dir, ignore_errors=True)
+    result['status'] = 'ok'
+    result['rows_per_sec'] = round(result['rows'] / max(result['seconds'], 1e-9), 1)
+    result['seconds'] = round(result['seconds'], 4)
+    result['db_bytes'] = db_size
+    return result
+
+
+def load_history(path=RESULTS_PATH):
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def previous_results(history):
+    """直近の実行から、ケースごとの最新の結果を集める"""
+    latest = {}
+    for run in history:
+        for result in run['results']:
+            if result.get('status') == 'ok':
+                latest[(result['case'], result['granularity'], result['size'])] = result
+    return latest
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=PROJECT_ROOT, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_case_in_child(*sys.argv[2:7])
+        return
+
+    parser = argparse.ArgumentParser(description='インポート・SQL生成スクリプトのスループット計測')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES), help='件数（カンマ区切り）')
+    parser.add_argument('--granularity', default=','.join(GRANULARITIES), help='粒度（カンマ区切り）')
+    parser.add_argument('--cases', default=None, help='ケース名（カンマ区切り、省略時は全ケース）')
+    parser.add_argument('--output', default=str(RESULTS_PATH), help='結果を追記するJSONファイル')
+    parser.add_argument('--timeout', type=int, default=CASE_TIMEOUT, help='1ケースの制限時間（秒）')
+    parser.add_argument('--list', action='store_true', help='ケース一覧を表示')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (kind, _) in CASES.items():
+            print(f"  {name} ({kind})")
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    granularities = [g for g in args.granularity.split(',') if g]
+    names = args.cases.split(',') if args.cases else list(CASES)
+    unknown = [n for n in names if n not in CASES] + [g for g in granularities if g not in GRANULARITIES]
+    if unknown:
+        print(f"❌ 不明なケース・粒度: {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+
+    output = Path(args.output)
+    history = load_history(output)
+    previous = previous_results(history)
+
+    print("=" * 80)
+    print("インポート・SQL生成スループット計測")
+    print("=" * 80)
+
+    results = []
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_import_"))
+    try:
+        base_db = work_dir / "base.sqlite"
+        skipped = build_scratch_db(base_db)
+        print(f"\n🗄️ 使い捨てDB: migrations/ を適用（適用できなかった文 {skipped}件）")
+
+        for granularity in granularities:
+            for size in sizes:
+                datasets = {}
+                for kind in sorted({CASES[name][0] for name in names}):
+                    datasets[kind] = work_dir / f"{kind}_{granularity}_{size}.csv"
+                    write_dataset(kind, datasets[kind], size, granularity)
+                print(f"\n📦 {granularity} / {size:,}行")
+
+                for name in names:
+                    kind = CASES[name][0]
+                    result = run_case(name, datasets[kind], base_db, work_dir, args.timeout)
+                    result.update({'case': name, 'dataset': kind, 'granularity': granularity, 'size': size,
+                                   'input_bytes': datasets[kind].stat().st_size})
+                    results.append(result)
+
+                    if result['status'] != 'ok':
+                        print(f"   ❌ {name}: {result['status']} {result.get('error', '')}")
+                        continue
+                    line = (f"   ✅ {name}: {result['rows_per_sec']:,.0f}行/秒 ({result['seconds']:.2f}秒) "
+                            f"RSS {result['peak_rss_kb'] / 1024:.0f}MB ")
+                    if result['output_bytes']:
+                        line += f"出力 {result['output_bytes'] / 1024:,.0f}KB"
+                    else:
+                        line += f"DB {result['db_bytes'] / 1024:,.0f}KB"
+                    before = previous.get((name, granularity, size))
+                    if before:
+                        ratio = result['rows_per_sec'] / max(before['rows_per_sec'], 1e-9)
+                        line += f" 前回比 {ratio:.2f}x"
+                        if ratio < REGRESSION_RATIO:
+                            line += " ⚠️"
+                    print(line)
+
+                for path in datasets.values():
+                    path.unlink()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    history.append({
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': results,
+    })
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 結果を記録しました: {output}（{len(history)}回分）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+building_regulations への一括インポート（ステージングテーブル経由）
+
+CSVなどからマッピングした行を1行ずつ SELECT → UPDATE/INSERT するのではなく、
+  1. 一時テーブル（ステージング）に executemany でまとめて投入
+  2. 各行の更新対象id を1文で解決
+  3. UPDATE ... FROM で既存行をまとめて更新
+  4. INSERT ... SELECT で対象のない行をまとめて追加
+を1トランザクションで実行する。件数は各文の変更行数から取る。
+
+同じ (都道府県, 市区町村) の行が複数ある場合は最後の行を採用する。
+"""
+import sqlite3
+
+TABLE = 'building_regulations'
+STAGING_TABLE = '_import_staging'
+
+# 既存行の選び方（従来の import_*.py と同じ: 市区町村単位の行のうち VERIFIED・新しいid を優先）
+DEFAULT_MATCH_WHERE = "b.district IS NULL"
+DEFAULT_ORDER_BY = "b.verification_status DESC, b.id DESC"
+
+
+class ImportResult:
+    """一括インポートの件数"""
+
+    def __init__(self, staged=0, inserted=0, updated=0, skipped=0, duplicates=0):
+        self.staged = staged            # ステージングに投入した行数
+        self.inserted = inserted
+        self.updated = updated
+        self.skipped = skipped          # 更新対象がなく、追加もしなかった行数
+        self.duplicates = duplicates    # 同じ自治体の重複行（最後の行以外）
+
+    @property
+    def total(self):
+        return self.inserted + self.updated
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def stage_rows(conn, rows, columns):
+    """
+    行を一時テーブル（ステージング）に投入し、同じ自治体は最後の行だけ残す
+
+    Returns:
+        (投入した行数, 取り除いた重複行数)
+    """
+    names = ['prefecture', 'city'] + [c for c in columns if c not in ('prefecture', 'city')]
+    conn.execute(f"DROP TABLE IF EXISTS temp.{STAGING_TABLE}")
+    conn.execute(
+        f"CREATE TEMP TABLE {STAGING_TABLE} (seq INTEGER PRIMARY KEY, target_id INTEGER, "
+        f"{', '.join(_quote(n) for n in names)})"
+    )
+    conn.executemany(
+        f"INSERT INTO temp.{STAGING_TABLE} ({', '.join(_quote(n) for n in names)}) "
+        f"VALUES ({', '.join('?' * len(names))})",
+        ([row.get(n) for n in names] for row in rows),
+    )
+    staged = conn.execute(f"SELECT COUNT(*) FROM temp.{STAGING_TABLE}").fetchone()[0]
+
+    # 同じ自治体は最後の行だけ残す
+    duplicates = conn.execute(
+        f"DELETE FROM temp.{STAGING_TABLE} WHERE seq NOT IN ("
+        f"SELECT MAX(seq) FROM temp.{STAGING_TABLE} GROUP BY prefecture, city)"
+    ).rowcount
+    return staged, duplicates
+
+
+def resolve_targets(conn, match_where=DEFAULT_MATCH_WHERE, order_by=DEFAULT_ORDER_BY):
+    """ステージングの各行の更新対象id を1文で解決（idx_building_regs_prefecture_city を使う）"""
+    conn.execute(
+        f"UPDATE temp.{STAGING_TABLE} AS s SET target_id = ("
+        f"SELECT b.id FROM {TABLE} AS b "
+        f"WHERE b.prefecture = s.prefecture AND b.city = s.city AND ({match_where}) "
+        f"ORDER BY {order_by} LIMIT 1)"
+    )
+
+
+def insert_expressions(insert_values):
+    """追加する列のSQL式（prefecture / city / normalized_address はステージングから補う）"""
+    values = dict(insert_values)
+    values.setdefault('prefecture', 's.prefecture')
+    values.setdefault('city', 's.city')
+    values.setdefault('normalized_address', 's.prefecture || s.city')
+    return values
+
+
+def apply_staged(conn, update_set, insert_values=None):
+    """
+    解決済みのステージングから既存行を更新し、対象のない行を追加する
+
+    Returns:
+        (更新した行数, 追加した行数, スキップした行数)
+    """
+    assignments = ', '.join(f"{_quote(col)} = {expr}" for col, expr in update_set.items())
+    updated = conn.execute(
+        f"UPDATE {TABLE} AS b SET {assignments} "
+        f"FROM temp.{STAGING_TABLE} AS s WHERE b.id = s.target_id"
+    ).rowcount
+
+    if insert_values is None:
+        skipped = conn.execute(
+            f"SELECT COUNT(*) FROM temp.{STAGING_TABLE} WHERE target_id IS NULL"
+        ).fetchone()[0]
+        return updated, 0, skipped
+
+    values = insert_expressions(insert_values)
+    inserted = conn.execute(
+        f"INSERT INTO {TABLE} ({', '.join(_quote(c) for c in values)}) "
+        f"SELECT {', '.join(values.values())} FROM temp.{STAGING_TABLE} AS s "
+        f"WHERE s.target_id IS NULL ORDER BY s.seq"
+    ).rowcount
+    return updated, inserted, 0
+
+
+def bulk_merge(conn, rows, columns, update_set, insert_values=None,
+               match_where=DEFAULT_MATCH_WHERE, order_by=DEFAULT_ORDER_BY):
+    """
+    マッピング済みの行を building_regulations にまとめて統合する
+
+    Args:
+        conn: sqlite3 接続
+        rows: {'prefecture', 'city', 列...} の dict のリスト
+        columns: ステージングに載せる列（prefecture / city 以外）
+        update_set: {更新する列: SQL式}。式では既存行を b.列、新しい値を s.列 で参照する
+        insert_values: {追加する列: SQL式（s.列 で参照）}。None なら対象のない行は追加しない
+        match_where: 更新対象を絞る条件（b.列 で参照）
+        order_by: 更新対象が複数あるときの優先順
+    """
+    if sqlite3.sqlite_version_info < (3, 33, 0):
+        raise RuntimeError(f"UPDATE ... FROM には SQLite 3.33 以上が必要です（現在 {sqlite3.sqlite_version}）")
+
+    result = ImportResult()
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    try:
+        result.staged, result.duplicates = stage_rows(conn, rows, columns)
+        resolve_targets(conn, match_where, order_by)
+        result.updated, result.inserted, result.skipped = apply_staged(conn, update_set, insert_values)
+
+        conn.execute(f"DROP TABLE temp.{STAGING_TABLE}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def skipped_rows(conn, rows, match_where=DEFAULT_MATCH_WHERE):
+    """更新対象が見つからない (都道府県, 市区町村) の一覧（表示用）"""
+    keys = sorted({(row['prefecture'], row['city']) for row in rows})
+    existing = set(conn.execute(f"SELECT DISTINCT prefecture, city FROM {TABLE} AS b WHERE {match_where}"))
+    return [key for key in keys if key not in existing]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+インポートのドライラン（変更内容の事前計算）
+
+bulk_merge と同じ手順を、対象の行だけを写したメモリ上のSQLiteで実行し、
+  - insert: 追加される行
+  - update: 更新される行と、列ごとの変更前 / 変更後の値
+  - noop:   更新対象はあるが値が変わらない行
+  - skip:   更新対象がなく、追加もしない行
+を1行ずつ JSONL に書き出す。
+
+対象のデータベースは読み取り専用で開き、(都道府県, 市区町村) が一致する行を1回のSELECTで読むだけで、
+書き込みのトランザクションは開かない。
+更新の式（merge_note など）と更新対象の選び方（match_where / order_by）は本番の実行と同じ。
+
+実行時刻で毎回変わる列（last_updated など）は比較しない。
+"""
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from bulk_import import (DEFAULT_MATCH_WHERE, DEFAULT_ORDER_BY, STAGING_TABLE, TABLE, _quote,
+                         apply_staged, resolve_targets, stage_rows)
+from d1_client import PROJECT_ROOT
+from d1_client import register_functions as register_d1_functions
+from note_merge import register_functions as register_note_functions
+
+CHANGES_DIR = PROJECT_ROOT / ".cache" / "changes"
+
+# 実行時刻が入る列（変更の判定に使わない）
+TIMESTAMP_COLUMNS = ('last_updated', 'created_at', 'updated_at')
+
+OPERATIONS = ('insert', 'update', 'noop', 'skip')
+
+# 要約に表示する更新の件数
+SUMMARY_LIMIT = 20
+
+
+class ChangeSet:
+    """ドライランの結果"""
+
+    def __init__(self):
+        self.changes = []       # 入力順の変更（dict）
+        self.staged = 0
+        self.duplicates = 0     # 同じ自治体の重複行（最後の行以外）
+
+    def count(self, op):
+        return sum(1 for change in self.changes if change['op'] == op)
+
+    def counts(self):
+        return {op: self.count(op) for op in OPERATIONS}
+
+    def write(self, path):
+        """JSONL に書き出す（1行に1件）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for change in self.changes:
+                f.write(json.dumps(change, ensure_ascii=False, default=str) + "\n")
+        return path
+
+
+def default_path(name):
+    return CHANGES_DIR / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl"
+
+
+def _copy_targets(conn, scratch):
+    """
+    (都道府県, 市区町村) がステージングと一致する行を1回のSELECTで読み、メモリ上のテーブルに写す
+
+    conn のデータベースファイルを読み取り専用（mode=ro）で ATTACH し、SQLite の中で写す。
+    """
+    path = next((file for _, name, file in conn.execute("PRAGMA database_list") if name == 'main'), '')
+    if not path:
+        raise ValueError("ドライランにはファイルのデータベースが必要です")
+    schema = conn.execute(
+        "SELECT type, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index') AND sql IS NOT NULL "
+        "ORDER BY type = 'index'", (TABLE,)).fetchall()
+    if not schema or schema[0][0] != 'table':
+        raise sqlite3.OperationalError(f"no such table: {TABLE}")
+    # インデックスも写す（更新対象の解決に使い、UNIQUE 制約も本番と同じにする）
+    for _, sql in schema:
+        scratch.execute(sql)
+
+    scratch.execute("ATTACH DATABASE ? AS source", (f"{Path(path).as_uri()}?mode=ro",))
+    try:
+        scratch.execute(
+            f"INSERT INTO main.{TABLE} SELECT * FROM source.{TABLE} "
+            f"WHERE (prefecture, city) IN (SELECT prefecture, city FROM temp.{STAGING_TABLE})"
+        )
+        scratch.commit()
+    finally:
+        scratch.execute("DETACH DATABASE source")
+    return [row[1] for row in scratch.execute(f"PRAGMA main.table_info({TABLE})")]
+
+
+def _diff(names, before, after):
+    """{列: {'before': 値, 'after': 値}}"""
+    return {
+        name: {'before': old, 'after': new}
+        for name, old, new in zip(names, before, after)
+        if old != new
+    }
+
+
+def compute_change_set(conn, rows, columns, update_set, insert_values=None,
+                       match_where=DEFAULT_MATCH_WHERE, order_by=DEFAULT_ORDER_BY):
+    """
+    bulk_merge を実行したときの変更内容を、conn に書き込まずに計算する
+
+    引数は bulk_merge と同じ。conn は読み取りだけに使う。
+    """
+    change_set = ChangeSet()
+    scratch = sqlite3.connect('file::memory:', uri=True)
+    try:
+        register_d1_functions(scratch)
+        register_note_functions(scratch)
+        change_set.staged, change_set.duplicates = stage_rows(scratch, rows, columns)
+        names = _copy_targets(conn, scratch)
+        resolve_targets(scratch, match_where, order_by)
+
+        # UPDATE が変えるのは update_set の列だけ
+        compared = [name for name in update_set if name not in TIMESTAMP_COLUMNS]
+        selected = ', '.join(['b.id'] + [f"b.{_quote(name)}" for name in compared])
+        targets = f"FROM temp.{STAGING_TABLE} AS s JOIN {TABLE} AS b ON b.id = s.target_id"
+        before = {row[0]: row[1:] for row in scratch.execute(f"SELECT {selected} {targets}")}
+        last_id = scratch.execute(f"SELECT COALESCE(MAX(id), 0) FROM {TABLE}").fetchone()[0]
+
+        apply_staged(scratch, update_set, insert_values)
+
+        for seq, prefecture, city, target_id, *after in scratch.execute(
+                f"SELECT s.seq, s.prefecture, s.city, {selected} {targets}"):
+            changes = _diff(compared, before[target_id], after)
+            change = {'row': seq, 'op': 'update' if changes else 'noop',
+                      'prefecture': prefecture, 'city': city, 'id': target_id}
+            if changes:
+                change['changes'] = changes
+            change_set.changes.append(change)
+
+        # 追加される行（メモリ上で振られた id は本番と違うため出力しない）
+        inserted = {}
+        for row in scratch.execute(f"SELECT * FROM {TABLE} WHERE id > ?", (last_id,)):
+            values = {name: value for name, value in zip(names, row)
+                      if value is not None and name != 'id' and name not in TIMESTAMP_COLUMNS}
+            inserted[(values.get('prefecture'), values.get('city'))] = values
+        for seq, prefecture, city in scratch.execute(
+                f"SELECT seq, prefecture, city FROM temp.{STAGING_TABLE} WHERE target_id IS NULL"):
+            values = inserted.get((prefecture, city))
+            change = {'row': seq, 'op': 'skip' if values is None else 'insert',
+                      'prefecture': prefecture, 'city': city, 'id': None}
+            if values is not None:
+                change['values'] = values
+            change_set.changes.append(change)
+    finally:
+        scratch.close()
+
+    change_set.changes.sort(key=lambda change: change['row'])
+    return change_set
+
+
+def print_summary(change_set, path=None):
+    counts = change_set.counts()
+    print(f"🔍 ドライラン: 追加 {counts['insert']}件, 更新 {counts['update']}件, "
+          f"変更なし {counts['noop']}件, スキップ {counts['skip']}件, 重複 {change_set.duplicates}件")
+    updates = [change for change in change_set.changes if change['op'] == 'update']
+    for change in updates[:SUMMARY_LIMIT]:
+        print(f"   ✏️ {change['prefecture']} {change['city']} (id={change['id']}): "
+              f"{', '.join(change['changes'])}")
+    if len(updates) > SUMMARY_LIMIT:
+        print(f"   ...ほか {len(updates) - SUMMARY_LIMIT}件")
+    if path is not None:
+        print(f"📝 変更内容: {path}")
@@ -4,63 +4,38 @@
 1都3県の全自治体リストと現在のVERIFIED自治体を比較し、不足自治体を特定
 """
 
-# 1都3県の全自治体リスト（2024年12月時点）
-ALL_MUNICIPALITIES = {
+from municipality_registry import load_registry
+
+# 1都3県の全自治体（特別区・市。municipality_codes.csv から）
+PREFECTURES = ('東京都', '神奈川県', '千葉県', '埼玉県')
+TARGET_KINDS = ('special_ward', 'designated_city', 'city')
+
+# 現在VERIFIED済みの自治体（スクリプト実行結果から取得）
+VERIFIED_MUNICIPALITIES = {
     "東京都": [
-        # 23区
-        "千代田区", "中央区", "港区", "新宿区", "文京区", "台東区", "墨田区", "江東区",
-        "品川区", "目黒区", "大田区", "世田谷区", "渋谷区", "中野区", "杉並区", "豊島区",
-        "北区", "荒川区", "板橋区", "練馬区", "足立区", "葛飾区", "江戸川区",
-        # 市部（主要市のみ - 26市）
-        "八王子市", "立川市", "武蔵野市", "三鷹市", "青梅市", "府中市", "昭島市", "調布市",
-        "町田市", "小金井市", "小平市", "日野市", "東村山市", "国分寺市", "国立市", "福生市",
-        "狛江市", "東大和市", "清瀬市", "東久留米市", "武蔵村山市", "多摩市", "稲城市",
-        "羽村市", "あきる野市", "西東京市"
+        "千代田区", "中央区", "品川区", "新宿区", "大田区", "板橋区", "江戸川区", "江東区", "目黒区",
     ],
     "神奈川県": [
-        # 政令指定都市
-        "横浜市", "川崎市", "相模原市",
-        # 市部
-        "横須賀市", "平塚市", "鎌倉市", "藤沢市", "小田原市", "茅ヶ崎市", "逗子市",
-        "三浦市", "秦野市", "厚木市", "大和市", "伊勢原市", "海老名市", "座間市",
-        "南足柄市", "綾瀬市"
+        "横浜市", "川崎市", "相模原市", "横須賀市", "平塚市", "鎌倉市", "藤沢市", "小田原市",
+        "茅ヶ崎市", "逗子市", "三浦市", "秦野市", "厚木市", "大和市", "伊勢原市", "海老名市", "座間市",
     ],
     "千葉県": [
-        # 政令指定都市
-        "千葉市",
-        # 市部
-        "銚子市", "市川市", "船橋市", "館山市", "木更津市", "松戸市", "野田市", "茂原市",
-        "成田市", "佐倉市", "東金市", "旭市", "習志野市", "柏市", "勝浦市", "市原市",
-        "流山市", "八千代市", "我孫子市", "鴨川市", "鎌ケ谷市", "君津市", "富津市",
-        "浦安市", "四街道市", "袖ケ浦市", "八街市", "印西市", "白井市", "富里市",
-        "南房総市", "匝瑳市", "香取市", "山武市", "いすみ市", "大網白里市"
+        "千葉市", "市川市", "船橋市", "松戸市", "野田市", "佐倉市", "習志野市", "柏市",
+        "市原市", "流山市", "八千代市",
     ],
     "埼玉県": [
-        # 政令指定都市
-        "さいたま市",
-        # 市部
-        "川越市", "熊谷市", "川口市", "行田市", "秩父市", "所沢市", "飯能市", "加須市",
-        "本庄市", "東松山市", "春日部市", "狭山市", "羽生市", "鴻巣市", "深谷市", "上尾市",
-        "草加市", "越谷市", "蕨市", "戸田市", "入間市", "朝霞市", "志木市", "和光市",
-        "新座市", "桶川市", "久喜市", "北本市", "八潮市", "富士見市", "三郷市", "蓮田市",
-        "坂戸市", "幸手市", "鶴ヶ島市", "日高市", "吉川市", "ふじみ野市", "白岡市"
-    ]
+        "さいたま市", "川越市", "熊谷市", "川口市", "所沢市", "春日部市", "上尾市", "草加市",
+        "越谷市", "蕨市", "戸田市", "朝霞市", "和光市", "新座市", "久喜市", "八潮市",
+    ],
 }
 
-# 現在VERIFIED済みの自治体（スクリプト実行結果から取得）
-VERIFIED_MUNICIPALITIES = [
-    # 東京都
-    "千代田区", "中央区", "品川区", "新宿区", "大田区", "板橋区", "江戸川区", "江東区", "目黒区",
-    # 神奈川県
-    "横浜市", "川崎市", "相模原市", "横須賀市", "平塚市", "鎌倉市", "藤沢市", "小田原市",
-    "茅ヶ崎市", "逗子市", "三浦市", "秦野市", "厚木市", "大和市", "伊勢原市", "海老名市", "座間市",
-    # 千葉県
-    "千葉市", "市川市", "船橋市", "松戸市", "野田市", "佐倉市", "習志野市", "柏市",
-    "市原市", "流山市", "八千代市",
-    # 埼玉県
-    "さいたま市", "川越市", "熊谷市", "川口市", "所沢市", "春日部市", "上尾市", "草加市",
-    "越谷市", "蕨市", "戸田市", "朝霞市", "和光市", "新座市", "久喜市", "八潮市"
-]
+def verified_codes(registry):
+    """VERIFIED済みの自治体のコード"""
+    pairs = [(pref, city) for pref, cities in VERIFIED_MUNICIPALITIES.items() for city in cities]
+    codes, unknown = registry.resolve(pairs)
+    if unknown:
+        raise KeyError(f"レジストリにない自治体: {unknown}")
+    return codes
 
 def analyze_missing():
     """不足自治体を都道府県別に分析"""
@@ -69,10 +44,15 @@ def analyze_missing():
     total_verified = 0
     total_missing = 0
     
-    for prefecture, municipalities in ALL_MUNICIPALITIES.items():
-        all_count = len(municipalities)
-        verified = [m for m in municipalities if m in VERIFIED_MUNICIPALITIES]
-        missing = [m for m in municipalities if m not in VERIFIED_MUNICIPALITIES]
+    registry = load_registry()
+    verified_set = verified_codes(registry)
+    
+    for prefecture in PREFECTURES:
+        codes = registry.select([prefecture], TARGET_KINDS)
+        all_count = len(codes)
+        # 突き合わせはコード（int）の集合で行う
+        verified = [registry.name(c) for c in codes if c in verified_set]
+        missing = [registry.name(c) for c in codes if c not in verified_set]
         
         results[prefecture] = {
             "all_count": all_count,
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+住所・市区町村名の正規化（自治体コードへの変換）
+
+物件の所在地（deals.location）や building_regulations の市区町村列は表記がまちまちで、
+  - 都道府県名の有無、空白・全角文字、郵便番号
+  - 「千葉市中央区」「千葉市 中央区」「千葉県中央区」（政令指定都市の区）
+  - 「北区」（東京都北区 / さいたま市北区）、「市川市」「市原市」（「市」で始まる名前）
+  - 「茅ヶ崎市」「茅ケ崎市」、郡名付きの町村（「入間郡三芳町」）
+  - 市区町村名の後ろに続く町名・丁目・番地
+がそのまま入っている。これを municipality_registry の6桁のコードに揃える。
+
+登録されているすべての表記（都道府県名・自治体名・政令指定都市の区の短い名前）を
+1文字ずつの接頭辞木（trie）にし、先頭から最長一致で引く。「市」「区」で文字列を切らないので、
+名前の途中に「市」「区」があっても誤らない。
+  1. NFKC で揃え、空白と先頭の郵便番号を取り除く
+  2. 都道府県名があれば読み進める（なければ引数の都道府県を使う）
+  3. 自治体名を最長一致で引く。区の短い名前（「中央区」）は、同じ表記の特別区・市町村がない
+     ときだけ使う（東京都中央区が優先、千葉県中央区 → 千葉市中央区）
+  4. 都道府県が分からず全国で名前が重複する場合は引けない（None）
+
+同じ文字列は LRU キャッシュで1回だけ解析する。分析のたびに全物件・全行を流せるよう、
+まとめて変換する normalize_many() と、SQLite の関数（city_code / municipality_code）も用意する。
+
+使い方:
+  python3 scripts/city_normalizer.py 千葉市中央区千葉港1-1 "東京都 北区赤羽"   文字列を変換
+  python3 scripts/city_normalizer.py --db                  ローカルD1の全行・全物件を変換し、引けない表記を表示
+  python3 scripts/city_normalizer.py --bench 1000000       ノイズ入りの合成住所で速度・正解率を計測
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+from functools import lru_cache
+
+from d1_client import local_connection
+from municipality_registry import KINDS, load_registry, name_variants
+
+# 解析結果を保持する件数（異なる表記の数がこれを超えると古いものから捨てる）
+CACHE_SIZE = 1 << 16
+
+# trie の終端（1文字のキーと重ならない）
+END = ''
+
+POSTAL_CODE_PATTERN = re.compile(r'^〒?\d{3}-?\d{4}')
+
+# 郡名（「入間郡」）の最大の長さ。レジストリに郡はないので読み飛ばす
+COUNTY = '郡'
+COUNTY_MAX_LENGTH = 5
+
+# --db で表示する引けない表記の件数
+UNKNOWN_LIMIT = 20
+
+
+def clean(text):
+    """NFKC で揃え、空白と先頭の郵便番号を取り除く"""
+    if not unicodedata.is_normalized('NFKC', text):
+        text = unicodedata.normalize('NFKC', text)
+    text = ''.join(text.split())
+    if text[:1] == '〒' or text[:1].isdigit():
+        text = POSTAL_CODE_PATTERN.sub('', text)
+    return text
+
+
+def _insert(root, key, value):
+    node = root
+    for ch in key:
+        node = node.setdefault(ch, {})
+    node.setdefault(END, []).append(value)
+
+
+def _choose(candidates, prefecture):
+    """候補から1つ選ぶ（正式な表記を区の短い名前より優先。決まらなければ None）"""
+    for short in (False, True):
+        codes = [code for code, pref, is_short in candidates
+                 if is_short == short and (prefecture is None or pref == prefecture)]
+        if len(codes) == 1:
+            return codes[0]
+        if codes:
+            return None
+    return None
+
+
+def _freeze(node):
+    """終端の候補を {都道府県のコード or None: 選ぶコード} にしておく（引くときは dict を1回引くだけ）"""
+    for key, child in node.items():
+        if key != END:
+            _freeze(child)
+            continue
+        candidates = list(dict.fromkeys(child))
+        resolved = {}
+        for prefecture in [None] + [pref for _, pref, _ in candidates]:
+            code = _choose(candidates, prefecture)
+            if code is not None:
+                resolved[prefecture] = code
+        node[END] = resolved
+
+
+class CityNormalizer:
+    """自治体名の接頭辞木（最長一致）で文字列を自治体コードにする"""
+
+    def __init__(self, registry, cache_size=CACHE_SIZE):
+        self.registry = registry
+        self._prefectures = {}      # 都道府県名の trie → 都道府県のコード
+        self._names = {}            # 自治体名の trie → ((コード, 都道府県のコード, 区の短い名前か), ...)
+        wards = {}
+        for name, code in registry.spellings():
+            kind = registry.kind(code)
+            if kind == 'prefecture':
+                _insert(self._prefectures, name, (code, code, False))
+                continue
+            prefecture = registry.prefecture(code)
+            _insert(self._names, name, (code, prefecture, False))
+            if kind == 'ward':
+                wards.setdefault(code, []).append(name)
+
+        # 政令指定都市の区は「中央区」のような市名なしの表記でも引けるようにする
+        for code, names in wards.items():
+            cities = name_variants(registry.name(registry.parent(code)))
+            for name in names:
+                city = next((c for c in cities if name.startswith(c) and len(name) > len(c)), None)
+                if city:
+                    _insert(self._names, name[len(city):], (code, registry.prefecture(code), True))
+        _freeze(self._prefectures)
+        _freeze(self._names)
+
+        self._hints = {}
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _prefecture_hint(self, prefecture):
+        """引数の都道府県（名前・コード・None）を都道府県のコードにする（分からなければ None）"""
+        if prefecture is None:
+            return None
+        hint = self._hints.get(prefecture, self._hints)
+        if hint is self._hints:
+            code = prefecture if isinstance(prefecture, int) else self.registry.lookup(str(prefecture))
+            if code is None or code not in self.registry or self.registry.kind(code) != 'prefecture':
+                code = None
+            hint = self._hints[prefecture] = code
+        return hint
+
+    @staticmethod
+    def _matches(root, text, start):
+        """start から始まる登録済みの表記を短い順に [(終端の位置, 終端)]"""
+        matches = []
+        node = root
+        end = start
+        for ch in text[start:]:
+            node = node.get(ch)
+            if node is None:
+                break
+            end += 1
+            resolved = node.get(END)
+            if resolved is not None:
+                matches.append((end, resolved))
+        return matches
+
+    def _municipality(self, text, start, prefecture):
+        """最長一致で自治体を引く（長い表記が引けなければ短い表記へ）"""
+        for end, resolved in reversed(self._matches(self._names, text, start)):
+            code = resolved.get(prefecture)
+            if code is not None:
+                return code, end
+        return None, start
+
+    def _normalize(self, text, prefecture=None):
+        """
+        文字列の先頭の自治体を引く
+
+        Returns:
+            (コード or None, 残りの文字列（町名・番地など）)
+        """
+        text = clean(text or '')
+        hint = self._prefecture_hint(prefecture)
+
+        starts = []
+        prefectures = self._matches(self._prefectures, text, 0)
+        if prefectures:
+            end, resolved = prefectures[-1]
+            starts.append((end, resolved[None]))
+        starts.append((0, hint))
+
+        for start, pref in starts:
+            code, end = self._municipality(text, start, pref)
+            if code is None:
+                # 郡名を読み飛ばす（「入間郡三芳町」→「三芳町」）
+                county = text.find(COUNTY, start, start + COUNTY_MAX_LENGTH + 1)
+                if county > start:
+                    code, end = self._municipality(text, county + 1, pref)
+            if code is not None:
+                return code, text[end:]
+        return None, text
+
+    def code(self, text, prefecture=None, municipality=False):
+        """
+        文字列の自治体コード（引けなければ None）
+
+        municipality=True なら政令指定都市の区は市のコードにする。
+        """
+        code, _ = self.normalize(text, prefecture)
+        if code is not None and municipality:
+            return self.registry.municipality(code)
+        return code
+
+    def normalize_many(self, items, municipality=False):
+        """
+        まとめてコードにする
+
+        items: 文字列、または (都道府県, 文字列) の並び
+        Returns:
+            [コード or None]（items と同じ順）
+
+        同じ表記は呼び出しの中の dict で1回だけ解析する（LRU キャッシュは使わないので、
+        全行を流しても normalize() のキャッシュを押し流さない）。
+        """
+        seen = {}
+        codes = []
+        for item in items:
+            code = seen.get(item, seen)
+            if code is seen:
+                if isinstance(item, tuple):
+                    prefecture, text = item
+                else:
+                    prefecture, text = None, item
+                code, _ = self._normalize(text, prefecture)
+                if code is not None and municipality:
+                    code = self.registry.municipality(code)
+                seen[item] = code
+            codes.append(code)
+        return codes
+
+    def register_functions(self, conn):
+        """
+        SQLite接続に city_code(文字列) / city_code(都道府県, 文字列) と
+        municipality_code(...)（区は市のコード）を登録
+        """
+        for name, municipality in (('city_code', False), ('municipality_code', True)):
+            conn.create_function(name, 1, lambda text, m=municipality: self.code(text, None, m),
+                                 deterministic=True)
+            conn.create_function(name, 2, lambda pref, text, m=municipality: self.code(text, pref or None, m),
+                                 deterministic=True)
+
+
+@lru_cache(maxsize=None)
+def load_normalizer():
+    """既定のレジストリの正規化器（1回だけ作る）"""
+    return CityNormalizer(load_registry())
+
+
+def normalize(text, prefecture=None):
+    return load_normalizer().normalize(text, prefecture)
+
+
+def city_code(text, prefecture=None, municipality=False):
+    return load_normalizer().code(text, prefecture, municipality)
+
+
+def normalize_many(items, municipality=False):
+    return load_normalizer().normalize_many(items, municipality)
+
+
+def register_functions(conn):
+    load_normalizer().register_functions(conn)
+
+
+# ---------------------------------------------------------------------------
+# 分析（ローカルD1）
+# ---------------------------------------------------------------------------
+
+def analyze_database(db_path=None):
+    """building_regulations の全行と deals の全物件の所在地を変換し、引けない表記を数える"""
+    normalizer = load_normalizer()
+    # 接続はプロセス全体で共有する（close せず、終了時に close_sessions で閉じる）
+    conn = local_connection('analysis', db_path)
+    sources = [
+        ('building_regulations', conn.execute("SELECT prefecture, city FROM building_regulations").fetchall()),
+        ('deals', [row[0] for row in conn.execute(
+            "SELECT location FROM deals WHERE location IS NOT NULL AND location != ''")]),
+    ]
+
+    results = {}
+    for name, items in sources:
+        started = time.perf_counter()
+        codes = normalizer.normalize_many(items)
+        elapsed = time.perf_counter() - started
+        unknown = {}
+        for item, code in zip(items, codes):
+            if code is None:
+                unknown[item] = unknown.get(item, 0) + 1
+        results[name] = (len(items), unknown, elapsed)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# ベンチマーク（ノイズ入りの合成住所）
+# ---------------------------------------------------------------------------
+
+TOWN_NAMES = ['本町', '中央', '緑町', '栄町', '旭町', '幸町', '新町', '東町', '西町', '南町']
+BUILDING_NAMES = ['マンション', 'ハイツ', 'コーポ', 'レジデンス']
+JUNK = ['', '住所不明', '未定', '要確認', '---', '1-2-3']
+
+# ノイズを入れる割合
+JUNK_RATE = 0.02
+
+# 繰り返しの計測での異なる表記の件数
+REPEATED_DISTINCT = 10000
+
+
+def _to_wide(text):
+    """半角英数字・記号を全角にする"""
+    return ''.join(chr(ord(ch) + 0xFEE0) if '!' <= ch <= '~' else ch for ch in text)
+
+
+def noisy_addresses(registry, rows, seed=0):
+    """(住所, 正解のコード or None) を rows 件作る"""
+    rng = random.Random(seed)
+    codes = registry.select(kinds=KINDS[1:])
+    # 都道府県内で区の短い名前が重複する（横浜市緑区 / 相模原市緑区）なら正解は None
+    # （同じ名前の市町村があればそちら）
+    short_names = {}
+    for code in codes:
+        parent = registry.parent(code)
+        if parent:
+            key = (registry.prefecture(code), registry.name(code)[len(registry.name(parent)):])
+            short_names[key] = short_names.get(key, 0) + 1
+
+    for _ in range(rows):
+        if rng.random() < JUNK_RATE:
+            yield rng.choice(JUNK), None
+            continue
+
+        code = rng.choice(codes)
+        name = rng.choice(name_variants(registry.name(code)))
+        prefecture = registry.prefecture_name(code)
+        parent = registry.parent(code)
+        short = False
+        if parent and rng.random() < 0.3:
+            # 「千葉市 中央区」「千葉県中央区」
+            city = registry.name(parent)
+            if rng.random() < 0.5:
+                name = f"{city} {name[len(city):]}"
+            else:
+                key = (registry.prefecture(code), registry.name(code)[len(city):])
+                name, short = name[len(city):], True
+                if registry.code(prefecture, name):
+                    code = registry.code(prefecture, name)
+                elif short_names[key] > 1:
+                    code = None
+
+        text = name
+        if short or rng.random() < 0.7:
+            text = prefecture + rng.choice(['', ' ', '　']) + text
+        town = rng.choice(TOWN_NAMES)
+        chome, banchi, go = rng.randint(1, 9), rng.randint(1, 40), rng.randint(1, 20)
+        if rng.random() < 0.5:
+            text += f"{town}{chome}丁目{banchi}番{go}号"
+        else:
+            text += f"{town}{chome}-{banchi}-{go}"
+        if rng.random() < 0.2:
+            text += f" {rng.choice(BUILDING_NAMES)}{rng.randint(101, 905)}"
+        if rng.random() < 0.2:
+            text = f"〒{rng.randint(100, 999)}-{rng.randint(0, 9999):04d} " + text
+        if rng.random() < 0.3:
+            text = _to_wide(text)
+        if rng.random() < 0.1:
+            text = f" {text} "
+        yield text, code
+
+
+def _timed(label, rows, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"   {label}: {elapsed:.2f}秒（{rows / elapsed:,.0f}件/秒）")
+    return result
+
+
+def run_bench(rows, seed=0):
+    """
+    ノイズ入りの合成住所 rows 件で計測する
+
+      - ほぼすべて異なる表記（trie の速さ）
+      - 異なる表記 REPEATED_DISTINCT 件の繰り返し（分析のたびに同じ所在地・市区町村列を流す場合）
+    """
+    registry = load_registry()
+    started = time.perf_counter()
+    normalizer = CityNormalizer(registry)
+    print(f"🌳 trie 構築: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    samples = list(noisy_addresses(registry, rows, seed))
+    texts = [text for text, _ in samples]
+    print(f"📊 合成住所 {rows:,}件（異なる表記 {len(set(texts)):,}件）")
+    _timed("キャッシュなし", rows, lambda: [normalizer._normalize(text) for text in texts])
+    codes = _timed("normalize（LRU）", rows, lambda: [normalizer.normalize(text)[0] for text in texts])
+    _timed("normalize_many", rows, lambda: normalizer.normalize_many(texts))
+
+    repeated = [texts[i % REPEATED_DISTINCT] for i in range(rows)]
+    print(f"📊 異なる表記 {REPEATED_DISTINCT:,}件の繰り返し {rows:,}件")
+    normalizer = CityNormalizer(registry)
+    _timed("normalize（LRU）", rows, lambda: [normalizer.normalize(text) for text in repeated])
+    info = normalizer.normalize.cache_info()
+    print(f"   ヒット率 {info.hits / max(info.hits + info.misses, 1):.1%}")
+    normalizer = CityNormalizer(registry)
+    _timed("normalize_many", rows, lambda: normalizer.normalize_many(repeated))
+
+    wrong = [(text, want, got) for (text, want), got in zip(samples, codes) if want != got]
+    print(f"✅ 正解率: {1 - len(wrong) / rows:.4%}（誤り {len(wrong)}件）")
+    for text, want, got in wrong[:UNKNOWN_LIMIT]:
+        print(f"   ❌ {text!r}: 正解 {want} / 結果 {got}")
+    return not wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description="住所・市区町村名を自治体コードにする")
+    parser.add_argument('texts', nargs='*', help="住所・市区町村名")
+    parser.add_argument('--prefecture', help="都道府県（文字列に含まれないとき）")
+    parser.add_argument('--db', nargs='?', const='', metavar='SQLite',
+                        help="ローカルD1（または指定したSQLite）の全行・全物件を変換する")
+    parser.add_argument('--bench', nargs='?', type=int, const=1000000, metavar='件数',
+                        help="ノイズ入りの合成住所で計測する（既定: 1,000,000件）")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bench:
+        sys.exit(0 if run_bench(args.bench, args.seed) else 1)
+
+    if args.db is not None:
+        for name, (total, unknown, elapsed) in analyze_database(args.db or None).items():
+            missed = sum(unknown.values())
+            print(f"📊 {name}: {total:,}件（{elapsed * 1000:.1f}ms）、引けない表記 {len(unknown)}種類 {missed}件")
+            for item, count in sorted(unknown.items(), key=lambda x: -x[1])[:UNKNOWN_LIMIT]:
+                print(f"   ❓ {item} ×{count}")
+        return
+
+    normalizer = load_normalizer()
+    registry = normalizer.registry
+    for text in args.texts:
+        code, rest = normalizer.normalize(text, args.prefecture)
+        if code is None:
+            print(f"❌ {text}: 見つかりません")
+            continue
+        print(f"{code:06d}  {registry.label(code)}  {rest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,8 @@ import json
 import time
 from datetime import datetime
 
+from municipality_registry import load_registry
+
 # URL未設定の自治体リスト
 MISSING_URL_MUNICIPALITIES = {
     "千葉県": [
@@ -30,12 +32,14 @@ MISSING_URL_MUNICIPALITIES = {
 
 def generate_search_queries():
     """WebSearch用のクエリを生成"""
+    registry = load_registry()
     queries = []
     
     for prefecture, cities in MISSING_URL_MUNICIPALITIES.items():
         for city in cities:
             # 開発指導要綱または建築基準法に基づく条例のURL検索
             query = {
+                "code": registry.require(prefecture, city),
                 "prefecture": prefecture,
                 "city": city,
                 "normalized_address": f"{prefecture}{city}",
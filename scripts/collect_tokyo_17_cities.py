@@ -6,6 +6,8 @@ WebSearch結果を解析してbuilding_regulations用のSQLを生成
 import json
 from datetime import datetime
 
+from sql_emitter import write_insert_sql
+
 # 東京都17市リスト（昭島市・小平市は調査済み）
 TOKYO_CITIES_REMAINING = [
     "日野市", "東村山市", "国分寺市", "国立市", "福生市", "狛江市",
@@ -46,65 +48,33 @@ COLLECTED_DATA = [
     }
 ]
 
-def generate_insert_sql(data_list):
-    """building_regulations用のINSERT SQL生成"""
-    sql_statements = []
-    
+INSERT_COLUMNS = [
+    'prefecture', 'city', 'normalized_address', 'local_ordinance', 'data_source', 'data_source_url',
+    'confidence_level', 'verification_status', 'verified_by', 'verified_at',
+    'apartment_restrictions', 'apartment_construction_feasible',
+]
+
+# 値があるときだけ出力する列（ない列はDEFAULT）
+OPTIONAL_COLUMNS = [
+    'local_ordinance', 'data_source', 'data_source_url', 'confidence_level',
+    'verification_status', 'verified_by', 'verified_at', 'apartment_restrictions',
+]
+
+def regulation_rows(data_list):
+    """building_regulations用の行を1件ずつ生成"""
     for data in data_list:
-        fields = []
-        values = []
-        
-        # 必須フィールド
-        fields.append("prefecture")
-        values.append(f"'{data['prefecture']}'")
-        
-        fields.append("city")
-        values.append(f"'{data['city']}'")
-        
-        fields.append("normalized_address")
-        values.append(f"'{data['normalized_address']}'")
-        
-        # オプショナルフィールド
-        if data.get('local_ordinance'):
-            fields.append("local_ordinance")
-            values.append(f"'{data['local_ordinance']}'")
-        
-        if data.get('data_source'):
-            fields.append("data_source")
-            values.append(f"'{data['data_source']}'")
-        
-        if data.get('data_source_url'):
-            fields.append("data_source_url")
-            values.append(f"'{data['data_source_url']}'")
-        
-        if data.get('confidence_level'):
-            fields.append("confidence_level")
-            values.append(f"'{data['confidence_level']}'")
-        
-        if data.get('verification_status'):
-            fields.append("verification_status")
-            values.append(f"'{data['verification_status']}'")
-        
-        if data.get('verified_by'):
-            fields.append("verified_by")
-            values.append(f"'{data['verified_by']}'")
-        
-        if data.get('verified_at'):
-            fields.append("verified_at")
-            values.append(f"'{data['verified_at']}'")
-        
-        if data.get('apartment_restrictions'):
-            fields.append("apartment_restrictions")
-            values.append(f"'{data['apartment_restrictions']}'")
-        
+        row = {
+            'prefecture': data['prefecture'],
+            'city': data['city'],
+            'normalized_address': data['normalized_address'],
+        }
+        for column in OPTIONAL_COLUMNS:
+            if data.get(column):
+                row[column] = data[column]
         if data.get('apartment_construction_feasible') is not None:
-            fields.append("apartment_construction_feasible")
-            values.append(str(data['apartment_construction_feasible']))
+            row['apartment_construction_feasible'] = data['apartment_construction_feasible']
         
-        sql = f"INSERT OR REPLACE INTO building_regulations ({', '.join(fields)}) VALUES ({', '.join(values)});"
-        sql_statements.append(sql)
-    
-    return sql_statements
+        yield row
 
 def main():
     """メイン処理"""
@@ -114,20 +84,18 @@ def main():
     
     # 既存データのSQL生成
     print(f"\n既存収集済みデータ: {len(COLLECTED_DATA)}件")
-    sql_statements = generate_insert_sql(COLLECTED_DATA)
     
-    # SQLファイルに保存
     output_file = '/home/user/webapp/scripts/tokyo_17_cities_initial_2.sql'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- 東京都17市 初期データ（2市分）\n")
-        f.write(f"-- 生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"-- 収集自治体数: {len(COLLECTED_DATA)}\n\n")
-        
-        for sql in sql_statements:
-            f.write(sql + "\n")
+    emitter = write_insert_sql(
+        regulation_rows(COLLECTED_DATA), output_file, INSERT_COLUMNS, mode='replace',
+        header=[
+            "東京都17市 初期データ（2市分）",
+            f"生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"収集自治体数: {len(COLLECTED_DATA)}",
+        ])
     
     print(f"\nSQL生成完了: {output_file}")
-    print(f"生成SQL数: {len(sql_statements)}")
+    print(f"生成SQL数: {emitter.statements}（{emitter.rows}行）")
     
     # 残り15市のリスト表示
     print(f"\n残り収集対象: {len(TOKYO_CITIES_REMAINING)}市")
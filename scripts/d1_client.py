@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+D1データベース共通クライアント
+SQLごとに `npx wrangler d1 execute` を起動せず、DBごとに1つのセッションを張って使い回す
+
+  - local : miniflareのSQLiteファイル（.wrangler/state/v3/d1/...）に直接接続
+  - remote: Cloudflare D1 HTTP API に接続（D1_API_BASE_URL でローカルのスタンドインに差し替え可能）
+
+ローカルのSQLiteファイルは wrangler.jsonc の database_id から算出する（ファイル名を直書きしない）。
+用途ごとのPRAGMA（PRAGMA_PROFILES）を設定した接続を local_connection() で1実行内で使い回す。
+
+環境変数:
+  D1_LOCAL_DB_PATH       ローカルSQLiteファイルのパス（省略時はwrangler.jsoncから算出）
+  D1_API_BASE_URL        HTTP APIのベースURL（省略時: https://api.cloudflare.com/client/v4）
+  CLOUDFLARE_API_TOKEN   HTTP APIのトークン
+  CLOUDFLARE_ACCOUNT_ID  CloudflareアカウントID
+"""
+import atexit
+import contextlib
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import sqlite3
+from pathlib import Path
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+WRANGLER_CONFIG_PATH = PROJECT_ROOT / "wrangler.jsonc"
+MINIFLARE_D1_DIR = PROJECT_ROOT / ".wrangler" / "state" / "v3" / "d1" / "miniflare-D1DatabaseObject"
+
+DATABASE_NAME = "real-estate-200units-db"
+DEFAULT_API_BASE_URL = "https://api.cloudflare.com/client/v4"
+HTTP_TIMEOUT = 60
+
+# 送信後に接続が切れても再送してよい文（読み取りのみ）
+READ_ONLY_KEYWORDS = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+DEFAULT_PAGE_SIZE = 500
+
+# 用途ごとのPRAGMA（接続時に順に設定する）
+PRAGMA_PROFILES = {
+    # 一括インポート: WAL・同期を緩める・大きめのページキャッシュとmmap・一時データはメモリ
+    'import': [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -262144),        # 256MB（負の値はKB単位）
+        ('mmap_size', 268435456),
+        ('temp_store', 'MEMORY'),
+        ('wal_autocheckpoint', 10000),
+    ],
+    # 集計・比較: 読み取り専用・大きめのmmap
+    'analysis': [
+        ('query_only', 'ON'),
+        ('cache_size', -131072),
+        ('mmap_size', 1073741824),
+        ('temp_store', 'MEMORY'),
+    ],
+}
+
+
+class D1Error(Exception):
+    """D1へのクエリ実行に失敗した"""
+
+
+def _strip_jsonc(text):
+    """JSONCのコメントと末尾カンマを除去（文字列リテラル内は保持）"""
+    out = []
+    i = 0
+    n = len(text)
+    in_string = False
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if ch == '\\' and i + 1 < n:
+                out.append(text[i + 1])
+                i += 2
+                continue
+            if ch == '"':
+                in_string = False
+            i += 1
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+            i += 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        elif ch == ',':
+            # 閉じ括弧直前のカンマは捨てる
+            j = i + 1
+            while j < n and text[j] in ' \t\r\n':
+                j += 1
+            if j < n and text[j] in ']}':
+                i += 1
+            else:
+                out.append(ch)
+                i += 1
+        else:
+            out.append(ch)
+            i += 1
+    return ''.join(out)
+
+
+def load_wrangler_config(path=WRANGLER_CONFIG_PATH):
+    """wrangler.jsoncを読み込む"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.loads(_strip_jsonc(f.read()))
+
+
+def get_database_config(database_name=DATABASE_NAME):
+    """wrangler.jsoncからD1データベースの設定を取得"""
+    config = load_wrangler_config()
+    for db in config.get('d1_databases', []):
+        if db.get('database_name') == database_name:
+            return db
+    raise D1Error(f"wrangler.jsoncにD1データベースが定義されていません: {database_name}")
+
+
+def miniflare_object_name(database_id):
+    """miniflareがD1DatabaseObjectのファイル名に使うIDを算出"""
+    key = hashlib.sha256(b"miniflare-D1DatabaseObject").digest()
+    name_hmac = hmac.new(key, database_id.encode('utf-8'), hashlib.sha256).digest()[:16]
+    check = hmac.new(key, name_hmac, hashlib.sha256).digest()[:16]
+    return (name_hmac + check).hex()
+
+
+def local_db_path(database_name=DATABASE_NAME):
+    """ローカルD1（miniflare）のSQLiteファイルパスを返す"""
+    override = os.environ.get('D1_LOCAL_DB_PATH')
+    if override:
+        return Path(override)
+    db = get_database_config(database_name)
+    return MINIFLARE_D1_DIR / f"{miniflare_object_name(db['database_id'])}.sqlite"
+
+
+def check_local_db_path(path, database_name=DATABASE_NAME):
+    """
+    ローカルD1のファイルがあることを確かめる
+
+    wrangler.jsonc の database_id と対応しない miniflare のファイルは、以前の database_id の
+    古いDBなので使わない（ファイルがなければ、その一覧をエラーに含める）。
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    others = sorted(p.name for p in MINIFLARE_D1_DIR.glob("*.sqlite")) if MINIFLARE_D1_DIR.exists() else []
+    message = (f"ローカルD1のファイルが見つかりません: {path}\n"
+               f"'npx wrangler d1 migrations apply {database_name} --local' で作成してください")
+    if others:
+        message += f"\n（wrangler.jsonc の database_id と一致しない古いファイル: {', '.join(others)}）"
+    raise D1Error(message)
+
+
+def apply_pragmas(conn, profile):
+    """PRAGMA_PROFILES の設定を接続に適用"""
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"profileは {', '.join(PRAGMA_PROFILES)} のいずれかを指定してください: {profile}")
+    for name, value in PRAGMA_PROFILES[profile]:
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+def row_hash(text):
+    """行内容のハッシュ（62bit整数）。SQLiteに d1_row_hash() として登録する"""
+    if text is None:
+        return None
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> 2
+
+
+def register_functions(conn):
+    """SQLite接続にクライアント側の関数を登録"""
+    conn.create_function('d1_row_hash', 1, row_hash, deterministic=True)
+
+
+def split_statements(sql):
+    """セミコロン区切りのSQLを文単位に分割（文字列リテラル内の ; は分割しない）"""
+    statements = []
+    buffer = ''
+    for piece in sql.split(';'):
+        buffer += piece + ';'
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip(' \t\r\n;'):
+                statements.append(buffer.strip())
+            buffer = ''
+    if buffer.strip(' \t\r\n;'):
+        statements.append(buffer.strip())
+    return statements
+
+
+def _dict_factory(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class LocalD1Session:
+    """miniflareのSQLiteファイルへの直接セッション"""
+
+    db_type = 'local'
+
+    def __init__(self, path=None, database_name=DATABASE_NAME, profile=None):
+        self.path = check_local_db_path(path or local_db_path(database_name), database_name)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.row_factory = _dict_factory
+        if profile:
+            apply_pragmas(self.conn, profile)
+        register_functions(self.conn)
+
+    def query(self, sql, params=()):
+        """SELECTを実行して行（dict）のリストを返す"""
+        try:
+            return self.conn.execute(sql, tuple(params)).fetchall()
+        except sqlite3.Error as e:
+            raise D1Error(f"local: {e}") from e
+
+    def execute(self, sql, params=()):
+        """更新系SQLを実行してmeta情報を返す"""
+        try:
+            cursor = self.conn.execute(sql, tuple(params))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            raise D1Error(f"local: {e}") from e
+        return {'changes': cursor.rowcount, 'last_row_id': cursor.lastrowid}
+
+    def execute_script(self, sql):
+        """複数文のSQLをまとめて実行"""
+        try:
+            self.conn.executescript(sql)
+        except sqlite3.Error as e:
+            raise D1Error(f"local: {e}") from e
+
+    def execute_batch(self, statements):
+        """複数文を1トランザクションで実行（失敗時は全体をロールバック）"""
+        changes = 0
+        try:
+            self.conn.execute('BEGIN')
+            for statement in statements:
+                changes += max(self.conn.execute(statement).rowcount, 0)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            raise D1Error(f"local: {e}") from e
+        return {'changes': changes}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_read_only(sql):
+    """SELECT / PRAGMA だけのSQLか（再送してよいか）"""
+    statements = [s.strip() for s in sql.split(';') if s.strip()]
+    return bool(statements) and all(
+        s.split(None, 1)[0].upper() in READ_ONLY_KEYWORDS for s in statements)
+
+
+class RemoteD1Session:
+    """D1 HTTP APIへのkeep-aliveセッション"""
+
+    db_type = 'remote'
+
+    def __init__(self, database_name=DATABASE_NAME, base_url=None, account_id=None,
+                 api_token=None, database_id=None):
+        self.base_url = (base_url or os.environ.get('D1_API_BASE_URL') or DEFAULT_API_BASE_URL).rstrip('/')
+        self.api_token = api_token or os.environ.get('CLOUDFLARE_API_TOKEN')
+        self.account_id = account_id or os.environ.get('CLOUDFLARE_ACCOUNT_ID')
+        if not self.account_id:
+            self.account_id = load_wrangler_config().get('account_id')
+        self.database_id = database_id or get_database_config(database_name)['database_id']
+
+        if self.base_url == DEFAULT_API_BASE_URL and not (self.api_token and self.account_id):
+            raise D1Error("CLOUDFLARE_API_TOKEN と CLOUDFLARE_ACCOUNT_ID を設定してください")
+
+        parts = urlsplit(self.base_url)
+        self._scheme = parts.scheme
+        self._netloc = parts.netloc
+        self._path = (f"{parts.path}/accounts/{self.account_id or 'local'}"
+                      f"/d1/database/{self.database_id}/query")
+        self._conn = None
+        self._reused = False    # 前のリクエストで使った接続か
+        self.bytes_received = 0
+
+    def _connection(self):
+        if self._conn is None:
+            self._reused = False
+            if self._scheme == 'https':
+                self._conn = http.client.HTTPSConnection(self._netloc, timeout=HTTP_TIMEOUT)
+            else:
+                self._conn = http.client.HTTPConnection(self._netloc, timeout=HTTP_TIMEOUT)
+        return self._conn
+
+    def _post(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_token:
+            headers['Authorization'] = f"Bearer {self.api_token}"
+
+        # 使い回したkeep-alive接続がサーバー側で切れていた場合は1回だけ張り直す。
+        # 送信後に失敗した場合はサーバーで実行済みかもしれないので、読み取りだけの文に限る
+        # （書き込みは D1Error にして、sync_executor のチェックポイントから再開する）
+        for attempt in range(2):
+            conn = self._connection()
+            reused = self._reused
+            sent = False
+            try:
+                conn.request('POST', self._path, body=body, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+                self.bytes_received += len(data)
+                self._reused = True
+                break
+            except (http.client.HTTPException, ConnectionError) as e:
+                conn.close()
+                self._conn = None
+                if attempt or not reused or (sent and not is_read_only(payload['sql'])):
+                    raise D1Error(f"remote: {e}") from e
+            except OSError as e:
+                conn.close()
+                self._conn = None
+                raise D1Error(f"remote: {e}") from e
+
+        try:
+            result = json.loads(data)
+        except ValueError as e:
+            raise D1Error(f"remote: HTTP {response.status} 不正なレスポンス") from e
+
+        if response.status != 200 or not result.get('success', False):
+            errors = '; '.join(err.get('message', str(err)) for err in result.get('errors', []))
+            raise D1Error(f"remote: HTTP {response.status} {errors}")
+        return result.get('result', [])
+
+    def _run(self, sql, params):
+        results = self._post({'sql': sql, 'params': list(params)})
+        if not results:
+            return {'results': [], 'meta': {}}
+        return results[-1]
+
+    def query(self, sql, params=()):
+        """SELECTを実行して行（dict）のリストを返す"""
+        return self._run(sql, params).get('results', [])
+
+    def execute(self, sql, params=()):
+        """更新系SQLを実行してmeta情報を返す"""
+        return self._run(sql, params).get('meta', {})
+
+    def execute_script(self, sql):
+        """複数文のSQLをまとめて実行"""
+        self._post({'sql': sql})
+
+    def execute_batch(self, statements):
+        """複数文を1リクエストで実行（D1側で1トランザクションとして扱われる）"""
+        results = self._post({'sql': '\n'.join(statements)})
+        return {'changes': sum(r.get('meta', {}).get('changes', 0) for r in results)}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_table(session, table, columns='*', where=None, params=(), page_size=DEFAULT_PAGE_SIZE):
+    """
+    テーブルを id のキーセットページングで1行ずつ返す（OFFSETを使わない）
+
+    Args:
+        session: LocalD1Session / RemoteD1Session
+        table: テーブル名
+        columns: 取得する列（'*' またはカンマ区切り。id を含めること）
+        where: 追加の絞り込み条件
+        params: where のバインド変数
+        page_size: 1ページの行数
+    """
+    last_id = None
+    while True:
+        conditions = [f"({where})"] if where else []
+        page_params = list(params)
+        if last_id is not None:
+            conditions.append("id > ?")
+            page_params.append(last_id)
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = session.query(
+            f"SELECT {columns} FROM {table}{where_sql} ORDER BY id LIMIT {int(page_size)}",
+            page_params,
+        )
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+_sessions = {}
+
+
+def open_session(db_type, database_name=DATABASE_NAME):
+    """DBごとに1つのセッションを開き、プロセス内で使い回す"""
+    key = (db_type, database_name)
+    session = _sessions.get(key)
+    if session is None:
+        if db_type == 'local':
+            session = LocalD1Session(database_name=database_name)
+        elif db_type == 'remote':
+            session = RemoteD1Session(database_name=database_name)
+        else:
+            raise ValueError(f"db_typeは 'local' か 'remote' を指定してください: {db_type}")
+        _sessions[key] = session
+    return session
+
+
+_connections = {}
+
+
+def local_connection(profile='import', path=None, database_name=DATABASE_NAME):
+    """
+    ローカルD1（またはpathのSQLite）への sqlite3 接続を、PRAGMAを設定して使い回す
+
+    同じ実行内の各ステップは同じ接続を使う（close せず、終了時に close_sessions で閉じる）。
+    """
+    if path is None:
+        path = local_db_path(database_name)
+    path = check_local_db_path(path, database_name).resolve()
+    key = (str(path), profile)
+    conn = _connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(str(path), check_same_thread=False)
+        apply_pragmas(conn, profile)
+        register_functions(conn)
+        _connections[key] = conn
+    return conn
+
+
+@contextlib.contextmanager
+def deferred_indexes(conn, table, keep=()):
+    """
+    一括投入の間 table のインデックスを外し、終わったら作り直す
+
+    UNIQUE インデックス（制約）と keep に指定したインデックス（投入中の検索に使うもの）は残す。
+    """
+    indexes = [
+        (name, sql) for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,))
+        if name not in keep and 'UNIQUE' not in sql.upper().split('INDEX')[0]
+    ]
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX "{name}"')
+    try:
+        yield [name for name, _ in indexes]
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        if conn.in_transaction:
+            conn.commit()
+        for _, sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+
+
+def close_sessions():
+    """開いているセッション・接続をすべて閉じる"""
+    while _sessions:
+        _, session = _sessions.popitem()
+        session.close()
+    while _connections:
+        (_, profile), conn = _connections.popitem()
+        try:
+            if profile == 'import':
+                conn.execute("PRAGMA optimize")     # 一括投入後の統計を更新
+        except sqlite3.Error:
+            pass
+        conn.close()
+
+
+atexit.register(close_sessions)
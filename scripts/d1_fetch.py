@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+ローカル/本番D1の並列取得レイヤー（asyncio）
+
+  - ローカルと本番へのクエリを同時に実行する
+  - 大きなテーブルは都道府県ごとに分割し、並列ワーカーで取得する
+  - DBごとの同時実行数は SessionPool の size で制限する
+
+全体の所要時間は各クエリの合計ではなく、最も遅いクエリで決まる。
+"""
+import asyncio
+import atexit
+import threading
+import time
+
+from d1_client import DATABASE_NAME, LocalD1Session, RemoteD1Session, open_session
+
+DEFAULT_CONCURRENCY = 4
+
+
+class SessionPool:
+    """1つのDBに対するセッションのプール（同時実行数の上限付き）"""
+
+    def __init__(self, db_type, size=DEFAULT_CONCURRENCY, database_name=DATABASE_NAME, sessions=()):
+        self.db_type = db_type
+        self.size = max(1, size)
+        self.database_name = database_name
+        self._idle = list(sessions)
+        self._owned = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.query_times = []
+
+    @classmethod
+    def from_session(cls, session):
+        """既存の1セッションをプールとして扱う（同時実行数1）"""
+        return cls(getattr(session, 'db_type', 'session'), 1, sessions=[session])
+
+    def _new_session(self):
+        if self.db_type == 'local':
+            return LocalD1Session(database_name=self.database_name)
+        return RemoteD1Session(database_name=self.database_name)
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        session = self._new_session()
+        with self._lock:
+            self._owned.append(session)
+        return session
+
+    def _checkin(self, session):
+        with self._lock:
+            self._idle.append(session)
+
+    def _run(self, method, *args):
+        with self._slots:
+            session = self._checkout()
+            started = time.perf_counter()
+            try:
+                return getattr(session, method)(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                self._checkin(session)
+                with self._lock:
+                    self.query_times.append(elapsed)
+
+    async def query(self, sql, params=()):
+        """SELECTをワーカースレッドで実行"""
+        return await asyncio.to_thread(self._run, 'query', sql, list(params))
+
+    async def query_all(self, statements):
+        """(sql, params) のリストを並列に実行し、結果を同じ順で返す"""
+        return await asyncio.gather(*(self.query(sql, params) for sql, params in statements))
+
+    async def execute_batch(self, statements):
+        """複数文を1トランザクションとしてワーカースレッドで実行"""
+        return await asyncio.to_thread(self._run, 'execute_batch', list(statements))
+
+    @property
+    def slowest_query(self):
+        return max(self.query_times, default=0.0)
+
+    def close(self):
+        """プールが作成したセッションを閉じる"""
+        with self._lock:
+            owned, self._owned = self._owned, []
+            self._idle = [s for s in self._idle if s not in owned]
+        for session in owned:
+            session.close()
+
+
+_pools = {}
+
+
+def open_pool(db_type, size=DEFAULT_CONCURRENCY, database_name=DATABASE_NAME):
+    """DBごとのプールを開く（1本目は open_session のセッションを共有）"""
+    key = (db_type, database_name)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = SessionPool(db_type, size, database_name,
+                           sessions=[open_session(db_type, database_name)])
+        _pools[key] = pool
+    return pool
+
+
+def as_pool(source):
+    """セッションまたはプールをプールとして返す"""
+    if isinstance(source, SessionPool):
+        return source
+    return SessionPool.from_session(source)
+
+
+class Snapshot:
+    """ローカル/本番から並列取得したデータ"""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = {}          # {db_type: [行, ...]}
+        self.elapsed = 0.0
+        self.slowest_query = 0.0
+        self.query_count = 0
+
+    def municipalities(self, db_type):
+        """(都道府県, 市区町村) の集合"""
+        return {(row['prefecture'], row['city']) for row in self.rows.get(db_type, [])}
+
+    def by_prefecture(self, db_type):
+        """{都道府県: {市区町村, ...}}"""
+        result = {}
+        for pref, city in self.municipalities(db_type):
+            result.setdefault(pref, set()).add(city)
+        return result
+
+
+async def fetch_sharded(pool, table, columns, where):
+    """都道府県ごとに分割して取得し、都道府県順に連結する"""
+    where_sql = f" WHERE {where}" if where else ''
+    prefectures = await pool.query(
+        f"SELECT DISTINCT prefecture FROM {table}{where_sql} ORDER BY prefecture")
+    shard_where = f"({where}) AND prefecture = ?" if where else "prefecture = ?"
+    shards = await pool.query_all([
+        (f"SELECT {columns} FROM {table} WHERE {shard_where} ORDER BY id", [row['prefecture']])
+        for row in prefectures
+    ])
+    return [row for shard in shards for row in shard]
+
+
+async def fetch_snapshot_async(pools, table='building_regulations', columns='*', where=None):
+    """
+    複数DBから同じテーブルを並列取得
+
+    Args:
+        pools: {db_type: SessionPool}
+        table: テーブル名
+        columns: 取得する列
+        where: 絞り込み条件
+    """
+    snapshot = Snapshot(table)
+    started = time.perf_counter()
+    before = {db_type: len(pool.query_times) for db_type, pool in pools.items()}
+    results = await asyncio.gather(*(
+        fetch_sharded(pool, table, columns, where) for pool in pools.values()
+    ))
+    snapshot.elapsed = time.perf_counter() - started
+    for (db_type, pool), rows in zip(pools.items(), results):
+        snapshot.rows[db_type] = rows
+        times = pool.query_times[before[db_type]:]
+        snapshot.query_count += len(times)
+        snapshot.slowest_query = max([snapshot.slowest_query] + times)
+    return snapshot
+
+
+def fetch_snapshot(db_types=('local', 'remote'), table='building_regulations', columns='*',
+                   where=None, max_concurrency=DEFAULT_CONCURRENCY):
+    """fetch_snapshot_async の同期版"""
+    pools = {db_type: open_pool(db_type, max_concurrency) for db_type in db_types}
+    return asyncio.run(fetch_snapshot_async(pools, table, columns, where))
+
+
+def close_pools():
+    """開いているプールをすべて閉じる"""
+    while _pools:
+        _, pool = _pools.popitem()
+        pool.close()
+
+
+atexit.register(close_pools)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+D1 HTTP APIのローカル・スタンドイン
+SQLiteファイルを D1 の /query エンドポイントと同じ形式で公開する（テスト・検証用）
+
+使い方:
+  python3 scripts/d1_http_standin.py <sqlite file> [port]
+  D1_API_BASE_URL=http://127.0.0.1:8788 python3 scripts/analyze_db_diff.py
+"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from d1_client import split_statements
+
+DEFAULT_PORT = 8788
+
+
+def make_handler(db_path):
+    """SQLiteファイルを公開するリクエストハンドラを生成"""
+    lock = threading.Lock()
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    class D1StandinHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-aliveを有効にする
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.endswith('/query'):
+                self._reply(404, {'success': False, 'errors': [{'message': 'not found'}]})
+                return
+
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            sql = payload.get('sql', '')
+            params = payload.get('params') or []
+
+            started = time.perf_counter()
+            try:
+                with lock:
+                    if params:
+                        statements = [(sql, params)]
+                    else:
+                        statements = [(s, []) for s in split_statements(sql)]
+                    results = []
+                    for statement, statement_params in statements:
+                        cursor = conn.execute(statement, statement_params)
+                        columns = [c[0] for c in cursor.description or []]
+                        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                        results.append({
+                            'results': rows,
+                            'success': True,
+                            'meta': {
+                                'changes': max(cursor.rowcount, 0),
+                                'last_row_id': cursor.lastrowid,
+                                'rows_read': len(rows),
+                                'duration': (time.perf_counter() - started) * 1000,
+                            },
+                        })
+                    conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                self._reply(400, {'success': False, 'errors': [{'code': 7500, 'message': str(e)}],
+                                  'messages': [], 'result': []})
+                return
+
+            self._reply(200, {'success': True, 'errors': [], 'messages': [], 'result': results})
+
+    return D1StandinHandler
+
+
+def serve(db_path, port=DEFAULT_PORT):
+    """スタンドインを起動（Ctrl+Cで終了）"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(db_path))
+    print(f"🌀 D1 HTTPスタンドイン: http://127.0.0.1:{port} ({db_path})")
+    print(f"   D1_API_BASE_URL=http://127.0.0.1:{port} を設定して --remote の代わりに使用")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("使い方: python3 scripts/d1_http_standin.py <sqlite file> [port]", file=sys.stderr)
+        sys.exit(1)
+    serve(sys.argv[1], int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_PORT)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+ローカルD1と本番環境の双方向同期（building_regulations）
+
+差分のある行を列ごとに判定し、競合しない変更はそれぞれの方向へまとめて反映する。
+
+  1. 前回の同期結果（基準状態 .cache/reconcile_base.sqlite）がある行:
+       片側だけが基準から変わった列 → その側の値を反対側へ反映
+       両側が別々の値に変わった列   → 競合
+  2. 基準状態がない行（初回・新しい行）:
+       片側だけが NULL・空文字の列   → 値のある側の値を反映（NULL で上書きしない）
+       両側が別々の値の列           → 競合（no_base）
+     本番の修正（update_*_urls_*.sql など）は last_updated を更新しないため、日時では判定しない
+  3. 片側にしかない行:
+       基準状態にない → 反対側へ挿入
+       基準状態にある → もう片側で削除（またはキー変更）されたので競合
+
+競合は scripts/reconcile_conflicts_{日付}.csv に書き出し、どちらにも反映しない。
+
+同期SQLは scripts/reconcile_{push,pull}_{日付}_{内容のハッシュ}.sql。途中で失敗したら再実行すると、
+差分を計算し直し、同じ内容ならチェックポイントから続きを、反映済みの分で内容が変わっていれば
+残りの差分だけを適用する。
+
+使い方:
+  python3 scripts/d1_reconcile.py                  差分を判定してSQLファイルを生成
+  python3 scripts/d1_reconcile.py --apply          生成したSQLを両環境へ適用し、基準状態を記録
+  python3 scripts/d1_reconcile.py --apply --reset  チェックポイントを破棄して最初から適用
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import sqlite3
+import sys
+from datetime import datetime
+
+from d1_client import PROJECT_ROOT, D1Error, open_session
+from d1_fetch import open_pool
+from delta_sync import DeltaPlan, print_delta_plan, write_delta_sql
+from regulation_diff import (EXCLUDED_COLUMNS, TABLE, VERIFIED_WHERE, diff_building_regulations,
+                             print_diff_summary, row_key_sql)
+from snapshot_cache import CACHE_DIR, invalidate, open_snapshot
+from sync_executor import Checkpoint, apply_chunks, build_chunks, plan_hash, read_plan
+
+BASE_PATH = CACHE_DIR / "reconcile_base.sqlite"
+OUTPUT_DIR = PROJECT_ROOT / "scripts"
+
+# 同期SQLのファイル名に付ける内容のハッシュの長さ
+PLAN_HASH_LENGTH = 12
+
+# 行の新しさを判定する列
+TIMESTAMP_COLUMNS = ('last_updated', 'verified_at')
+
+CONFLICT_FIELDS = [
+    'prefecture', 'city', 'local_id', 'remote_id', 'column',
+    'local_value', 'remote_value', 'base_value',
+    'local_updated', 'remote_updated', 'reason',
+]
+
+
+def normalize_timestamp(value):
+    """'2025-12-18T10:00:00Z' などを 'YYYY-MM-DD HH:MM:SS' に揃える"""
+    if not value:
+        return None
+    text = str(value).strip().replace('T', ' ').rstrip('Z')
+    return text[:19] or None
+
+
+def row_timestamp(row):
+    """行の更新日時（last_updated と verified_at の新しい方）"""
+    stamps = [normalize_timestamp(row.get(col)) for col in TIMESTAMP_COLUMNS]
+    stamps = [s for s in stamps if s]
+    return max(stamps) if stamps else None
+
+
+class BaseState:
+    """前回の同期で両環境が一致していた行（本番idをキーに保存）"""
+
+    def __init__(self, path=BASE_PATH):
+        self.path = path
+        self.rows = {}          # {本番id: 行}
+        self.local_id_of = {}   # {本番id: ローカルid}
+        if path.exists():
+            conn = sqlite3.connect(str(path))
+            conn.row_factory = sqlite3.Row
+            try:
+                for row in conn.execute("SELECT * FROM base_rows"):
+                    row = dict(row)
+                    local_id = row.pop('_local_id')
+                    self.rows[row['id']] = row
+                    self.local_id_of[row['id']] = local_id
+            except sqlite3.Error:
+                self.rows = {}
+                self.local_id_of = {}
+            finally:
+                conn.close()
+
+    @property
+    def local_ids(self):
+        return set(self.local_id_of.values())
+
+    def get(self, remote_id):
+        return self.rows.get(remote_id)
+
+
+class Reconciliation:
+    """双方向同期の判定結果"""
+
+    def __init__(self):
+        self.push = DeltaPlan()     # ローカル → 本番
+        self.pull = DeltaPlan()     # 本番 → ローカル
+        self.conflicts = []
+        self.conflicted_remote_ids = set()
+
+    def add_conflict(self, local_row, remote_row, column, reason, base=None):
+        row = local_row or remote_row
+        self.conflicts.append({
+            'prefecture': row.get('prefecture'),
+            'city': row.get('city'),
+            'local_id': local_row.get('id') if local_row else None,
+            'remote_id': remote_row.get('id') if remote_row else None,
+            'column': column,
+            'local_value': local_row.get(column) if local_row and column else None,
+            'remote_value': remote_row.get(column) if remote_row and column else None,
+            'base_value': base.get(column) if base and column else None,
+            'local_updated': row_timestamp(local_row) if local_row else None,
+            'remote_updated': row_timestamp(remote_row) if remote_row else None,
+            'reason': reason,
+        })
+        if remote_row:
+            self.conflicted_remote_ids.add(remote_row['id'])
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _decide_column(column, local_row, remote_row, base):
+    """列ごとの反映方向 ('push' / 'pull' / 競合理由) を返す"""
+    if base is not None and column in base:
+        local_changed = local_row.get(column) != base[column]
+        remote_changed = remote_row.get(column) != base[column]
+        if local_changed and not remote_changed:
+            return 'push'
+        if remote_changed and not local_changed:
+            return 'pull'
+        return 'both_changed'
+
+    # 基準状態がなければ、値のない側を埋めるだけにする
+    local_empty = _is_empty(local_row.get(column))
+    remote_empty = _is_empty(remote_row.get(column))
+    if remote_empty and not local_empty:
+        return 'push'
+    if local_empty and not remote_empty:
+        return 'pull'
+    return 'no_base'
+
+
+def reconcile(diff, base):
+    """差分結果を列ごとに判定して Reconciliation を返す"""
+    result = Reconciliation()
+
+    for local_row, remote_row in diff.changed:
+        base_row = base.get(remote_row['id'])
+        push_cols, pull_cols = [], []
+        for column in diff.columns:
+            if column in EXCLUDED_COLUMNS or local_row.get(column) == remote_row.get(column):
+                continue
+            decision = _decide_column(column, local_row, remote_row, base_row)
+            if decision == 'push':
+                push_cols.append(column)
+            elif decision == 'pull':
+                pull_cols.append(column)
+            else:
+                result.add_conflict(local_row, remote_row, column, decision, base_row)
+
+        # 反映した行の last_updated は両環境で新しい方に揃える
+        stamps = [s for s in (local_row.get('last_updated'), remote_row.get('last_updated')) if s]
+        last_updated = max(stamps, key=normalize_timestamp) if stamps else None
+        if push_cols:
+            row = dict(local_row, id=remote_row['id'], prefecture=remote_row['prefecture'],
+                       last_updated=last_updated)
+            result.push.add_update(row, push_cols)
+        if pull_cols:
+            row = dict(remote_row, id=local_row['id'], prefecture=local_row['prefecture'],
+                       last_updated=last_updated)
+            result.pull.add_update(row, pull_cols)
+
+    base_local_ids = base.local_ids
+    for row in diff.only_local:
+        if row['id'] in base_local_ids:
+            result.add_conflict(row, None, None, 'deleted_or_rekeyed_in_remote')
+        else:
+            result.push.add_insert(row)
+
+    for row in diff.only_remote:
+        if base.get(row['id']) is not None:
+            result.add_conflict(None, row, None, 'deleted_or_rekeyed_in_local')
+        else:
+            result.pull.add_insert(row)
+
+    result.push.build(diff.shared_columns)
+    result.pull.build(diff.shared_columns)
+    return result
+
+
+def write_conflicts(conflicts, output_path):
+    """競合をレビュー用CSVに書き出す"""
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CONFLICT_FIELDS)
+        writer.writeheader()
+        writer.writerows(conflicts)
+
+
+def _row_pairs(local, remote, where=VERIFIED_WHERE):
+    """自然キー（＋重複番号）でローカルid と本番id を対応付ける"""
+    key = row_key_sql()
+    sides = []
+    for session in (local, remote):
+        rows = session.query(f"SELECT id, {key} AS row_key FROM {TABLE} WHERE {where} ORDER BY id")
+        keyed = {}
+        seen = {}
+        for row in rows:
+            ordinal = seen.get(row['row_key'], 0)
+            seen[row['row_key']] = ordinal + 1
+            keyed[(row['row_key'], ordinal)] = row['id']
+        sides.append(keyed)
+    local_ids, remote_ids = sides
+    return {remote_ids[k]: local_ids[k] for k in remote_ids if k in local_ids}
+
+
+def save_base(local, snapshot, base, conflicted_remote_ids, path=BASE_PATH):
+    """
+    同期後に両環境で一致している行を基準状態として保存
+
+    競合した行は前回の基準状態を残す（解消されるまで競合として検出し続けるため）
+    """
+    pairs = _row_pairs(local, snapshot)
+    columns = [row['name'] for row in snapshot.query(f"PRAGMA table_info({TABLE})")]
+    records = []
+    for row in snapshot.query(f"SELECT * FROM {TABLE} WHERE {VERIFIED_WHERE}"):
+        if row['id'] in conflicted_remote_ids:
+            previous = base.get(row['id'])
+            if previous is not None:
+                records.append([base.local_id_of[row['id']]] + [previous.get(c) for c in columns])
+        elif row['id'] in pairs:
+            records.append([pairs[row['id']]] + [row[c] for c in columns])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.execute("DROP TABLE IF EXISTS base_rows")
+        quoted = ', '.join('"' + c.replace('"', '""') + '"' for c in columns)
+        conn.execute(f"CREATE TABLE base_rows (_local_id, {quoted})")
+        conn.executemany(
+            f"INSERT INTO base_rows VALUES ({', '.join('?' * (len(columns) + 1))})", records)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def plan_file(name, date, plan):
+    """
+    同期SQLのファイル名（内容のハッシュ付き）
+
+    内容が変われば別のファイル（＝別のチェックポイント）になるので、再実行で差分が変わっても
+    前回のチェックポイントと食い違わない。
+    """
+    digest = hashlib.sha256('\n'.join(plan.statements).encode('utf-8')).hexdigest()[:PLAN_HASH_LENGTH]
+    return OUTPUT_DIR / f"reconcile_{name}_{date}_{digest}.sql"
+
+
+def _apply_file(sql_file, target, parallel, reset=False):
+    """sync_executor と同じチェックポイント付きでSQLファイルを適用"""
+    chunks = build_chunks(read_plan(sql_file))
+    checkpoint = Checkpoint.load(f"{sql_file}.{target}.checkpoint.json", plan_hash(chunks), target, reset)
+    return asyncio.run(apply_chunks(chunks, open_pool(target, parallel), checkpoint, parallel))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルD1と本番環境の双方向同期（building_regulations）")
+    parser.add_argument('--apply', action='store_true', help="生成したSQLを両環境へ適用し、基準状態を記録")
+    parser.add_argument('--reset', action='store_true', help="チェックポイントを破棄して最初から適用")
+    args = parser.parse_args()
+    apply = args.apply
+    date = datetime.now().strftime('%Y%m%d')
+
+    print("=" * 80)
+    print("ローカルD1と本番環境の双方向同期")
+    print("=" * 80)
+
+    print("\n📊 差分を計算中...")
+    try:
+        remote = open_snapshot(refresh=True)
+        diff = diff_building_regulations(open_pool("local"), remote)
+    except D1Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+    print_diff_summary(diff)
+
+    base = BaseState()
+    print(f"   基準状態: {len(base.rows)}行" if base.rows else "   基準状態: なし（値のない側を埋めるだけ、他は競合）")
+    result = reconcile(diff, base)
+
+    print("\n⬆️ ローカル → 本番")
+    print_delta_plan(result.push)
+    print("\n⬇️ 本番 → ローカル")
+    print_delta_plan(result.pull)
+
+    conflict_file = None
+    if result.conflicts:
+        conflict_file = OUTPUT_DIR / f"reconcile_conflicts_{date}.csv"
+        write_conflicts(result.conflicts, conflict_file)
+        print(f"\n⚠️ 競合: {len(result.conflicts)}件 → {conflict_file}")
+
+    files = {}
+    for target, plan, name in (('remote', result.push, 'push'), ('local', result.pull, 'pull')):
+        if plan.statements:
+            files[target] = plan_file(name, date, plan)
+            write_delta_sql(plan, files[target], f"双方向同期 ({name})")
+            print(f"\n📝 {files[target]}: {len(plan.statements)}文")
+
+    if not apply:
+        for target, sql_file in files.items():
+            flag = ' --local' if target == 'local' else ''
+            print(f"   python3 scripts/sync_executor.py {sql_file}{flag}")
+        print("\n📌 --apply を付けると両環境へ適用し、基準状態を記録します")
+        return
+
+    try:
+        failures = []
+        for target, sql_file in files.items():
+            print(f"\n🚀 適用中 ({target})...")
+            failures += _apply_file(sql_file, target, 4, args.reset)
+            if target == 'remote':
+                invalidate()
+        if failures:
+            print(f"\n⚠️ 失敗したチャンク: {', '.join(sorted(failures))}（再実行で続きから適用）", file=sys.stderr)
+            sys.exit(1)
+
+        snapshot = open_snapshot(refresh=bool(files))
+        save_base(open_session('local'), snapshot, base, result.conflicted_remote_ids)
+    except D1Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\n✅ 同期完了。基準状態を記録しました: {BASE_PATH}")
+
+
+if __name__ == '__main__':
+    main()
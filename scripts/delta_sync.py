@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+building_regulations の列単位デルタ同期
+regulation_diff の差分結果から、変更された列だけを更新するSQLを生成する
+
+  - 既存行: INSERT ... VALUES (...), (...) ON CONFLICT(id) DO UPDATE SET <変更列のみ>
+            本番側のidをそのまま使うため、子テーブルの building_regulation_id は変わらない
+  - 新規行: INSERT ... SELECT * FROM (VALUES (...), (...)) WHERE NOT EXISTS (自然キーが同じ行)
+            idは本番側で採番。市区町村単位の行は district などが NULL で UNIQUE 制約が効かないため、
+            自然キーを IS で比較して既にある行は挿入しない（同じSQLを再適用しても行が増えない）
+
+都道府県・変更列の集合ごとに行をまとめ、D1の文サイズ上限に収まる複数行VALUESに詰める。
+都道府県ごとのチャンクは sync_executor で並列・再開可能に適用できる。
+"""
+from regulation_diff import EXCLUDED_COLUMNS, KEY_COLUMNS, TABLE
+from sql_emitter import D1_MAX_STATEMENT_BYTES, DEFAULT_MAX_ROWS, pack_values, sql_literal
+
+# sync_executor が読むチャンク区切り（都道府県単位）
+CHUNK_MARKER = '-- @chunk'
+
+# NOT NULL制約があるため、UPSERTでも常にVALUESに含める列
+REQUIRED_COLUMNS = ('prefecture', 'city', 'normalized_address')
+
+
+def changed_columns(local_row, remote_row, columns):
+    """ローカル行と本番行で値が異なる列を返す"""
+    return [col for col in columns
+            if col not in EXCLUDED_COLUMNS and local_row.get(col) != remote_row.get(col)]
+
+
+def _row_values(row, columns):
+    return '(' + ', '.join(sql_literal(row.get(col)) for col in columns) + ')'
+
+
+def _insert_missing_sql(columns):
+    """
+    自然キーが同じ行がなければ挿入する複数行INSERTの (前半, 後半)
+
+    VALUES の列は SQLite では column1, column2, ... になる。
+    """
+    prefix = f"INSERT INTO {TABLE} ({', '.join(columns)})\nSELECT * FROM (VALUES\n"
+    match = ' AND '.join(f"b.{col} IS v.column{columns.index(col) + 1}"
+                         for col in KEY_COLUMNS if col in columns)
+    suffix = f"\n) AS v\nWHERE NOT EXISTS (SELECT 1 FROM {TABLE} AS b WHERE {match});"
+    return prefix, suffix
+
+
+class DeltaPlan:
+    """デルタ同期で適用するSQL（都道府県ごとのチャンク）"""
+
+    def __init__(self):
+        self.chunks = []    # [(都道府県, [SQL文, ...]), ...]
+        self.updated_rows = 0
+        self.inserted_rows = 0
+        self.changed_cells = 0
+        self.column_counts = {}
+        self._updates = {}  # {都道府県: {変更列タプル: [行, ...]}}
+        self._inserts = {}  # {都道府県: [行, ...]}
+
+    @property
+    def statements(self):
+        return [statement for _, statements in self.chunks for statement in statements]
+
+    def add_update(self, row, cols):
+        """適用先の id を持つ行の cols 列を更新する"""
+        self._updates.setdefault(row['prefecture'], {}).setdefault(tuple(cols), []).append(row)
+        self.updated_rows += 1
+        self.changed_cells += len(cols)
+        for col in cols:
+            self.column_counts[col] = self.column_counts.get(col, 0) + 1
+
+    def add_insert(self, row):
+        """行を新規に挿入する（idは適用先で採番）"""
+        self._inserts.setdefault(row['prefecture'], []).append(row)
+        self.inserted_rows += 1
+
+    def build(self, shared_columns, max_bytes=D1_MAX_STATEMENT_BYTES, max_rows=DEFAULT_MAX_ROWS):
+        """追加された行から都道府県ごとのSQL文を組み立てる"""
+        # 適用先の last_updated も行の値に揃える
+        sync_timestamp = 'last_updated' in shared_columns
+
+        # 都道府県ごとのチャンクは互いに独立しているので並列に適用できる
+        self.chunks = []
+        for prefecture in sorted(set(self._updates) | set(self._inserts)):
+            statements = []
+            for cols, rows in sorted(self._updates.get(prefecture, {}).items()):
+                insert_cols = ['id'] + [c for c in REQUIRED_COLUMNS if c not in cols] + list(cols)
+                set_cols = list(cols)
+                if sync_timestamp:
+                    insert_cols.append('last_updated')
+                    set_cols.append('last_updated')
+                prefix = f"INSERT INTO {TABLE} ({', '.join(insert_cols)}) VALUES\n"
+                suffix = ("\nON CONFLICT(id) DO UPDATE SET "
+                          + ', '.join(f"{col} = excluded.{col}" for col in set_cols) + ';')
+                values = [_row_values(row, insert_cols) for row in rows]
+                statements.extend(pack_values(prefix, values, suffix, max_bytes, max_rows))
+
+            # 新規行: 共通列をすべて挿入（自然キーが同じ行が既にあれば挿入しない）
+            if prefecture in self._inserts:
+                insert_cols = [c for c in shared_columns if c not in ('id', 'created_at')]
+                prefix, suffix = _insert_missing_sql(insert_cols)
+                values = [_row_values(row, insert_cols) for row in self._inserts[prefecture]]
+                statements.extend(pack_values(prefix, values, suffix, max_bytes, max_rows))
+
+            self.chunks.append((prefecture, statements))
+        return self
+
+
+def build_delta_plan(diff, max_bytes=D1_MAX_STATEMENT_BYTES, max_rows=DEFAULT_MAX_ROWS):
+    """
+    差分結果からデルタ同期SQLを組み立てる
+
+    Args:
+        diff: regulation_diff.diff_building_regulations の結果
+        max_bytes: 1文あたりの最大バイト数
+        max_rows: 1文あたりの最大行数
+    """
+    plan = DeltaPlan()
+
+    # 既存行: 本番側のidで変更列だけを更新
+    for local_row, remote_row in diff.changed:
+        cols = changed_columns(local_row, remote_row, diff.columns)
+        if cols:
+            plan.add_update(dict(local_row, id=remote_row['id'], prefecture=remote_row['prefecture']), cols)
+
+    for row in diff.only_local:
+        plan.add_insert(row)
+
+    return plan.build(diff.shared_columns, max_bytes, max_rows)
+
+
+def write_delta_sql(plan, output_path, title):
+    """デルタ同期SQLをファイルに書き出す（sync_executor 用のチャンク区切り付き）"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("-- ========================================\n")
+        f.write(f"-- {title}\n")
+        f.write(f"-- 更新行数: {plan.updated_rows}行（変更セル {plan.changed_cells}）\n")
+        f.write(f"-- 新規行数: {plan.inserted_rows}行\n")
+        f.write(f"-- 文数: {len(plan.statements)}\n")
+        f.write("-- ========================================\n\n")
+        for prefecture, statements in plan.chunks:
+            f.write(f"{CHUNK_MARKER} {prefecture}\n")
+            for statement in statements:
+                f.write(statement + "\n\n")
+
+
+def print_delta_plan(plan):
+    """デルタ同期の内容を表示"""
+    print(f"\n🔍 差分: 更新 {plan.updated_rows}行（変更セル {plan.changed_cells}）/ 新規 {plan.inserted_rows}行")
+    if plan.column_counts:
+        print("\n📋 変更された列:")
+        for col, count in sorted(plan.column_counts.items(), key=lambda item: (-item[1], item[0])):
+            print(f"   {col}: {count}行")
@@ -5,11 +5,13 @@
 building_regulationsテーブルのデータをCSVに変換
 """
 
-import json
 import csv
+import itertools
 import sys
 from datetime import datetime
 
+from wrangler_output import WranglerOutputError, load_rows
+
 def export_building_regulations_to_csv(json_file, csv_file):
     """
     JSONファイルからbuilding_regulationsデータを読み込み、CSVに変換
@@ -19,42 +21,35 @@ def export_building_regulations_to_csv(json_file, csv_file):
         csv_file: 出力CSVファイルパス
     """
     try:
-        # JSONファイルを読み込み
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # wrangler出力形式から結果を抽出
-        if isinstance(data, list) and len(data) > 0:
-            results = data[0].get('results', [])
-        else:
-            print(f"エラー: 無効なJSON形式です", file=sys.stderr)
-            return False
-        
-        if not results:
+        # wrangler出力（先頭のバナー付きでも可）から1行ずつ読み込む
+        rows = load_rows(json_file)
+        first = next(rows, None)
+        if first is None:
             print(f"警告: データが空です", file=sys.stderr)
             return False
         
+        count = 0
+        prefectures = {}
+        
         # CSVファイルに書き込み
         with open(csv_file, 'w', encoding='utf-8-sig', newline='') as f:
             # ヘッダーを取得（最初のレコードのキー）
-            fieldnames = list(results[0].keys())
+            fieldnames = list(first.keys())
             
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
             
             # 全レコードを書き込み
-            for row in results:
+            for row in itertools.chain([first], rows):
                 writer.writerow(row)
+                count += 1
+                pref = row.get('prefecture', '不明')
+                prefectures[pref] = prefectures.get(pref, 0) + 1
         
         print(f"✅ CSVエクスポート完了: {csv_file}")
-        print(f"📊 エクスポート件数: {len(results)}件")
+        print(f"📊 エクスポート件数: {count}件")
         
         # 統計情報を表示
-        prefectures = {}
-        for row in results:
-            pref = row.get('prefecture', '不明')
-            prefectures[pref] = prefectures.get(pref, 0) + 1
-        
         print(f"\n📍 都道府県別統計:")
         for pref, count in sorted(prefectures.items()):
             print(f"  {pref}: {count}件")
@@ -64,7 +59,7 @@ def export_building_regulations_to_csv(json_file, csv_file):
     except FileNotFoundError:
         print(f"エラー: ファイルが見つかりません: {json_file}", file=sys.stderr)
         return False
-    except json.JSONDecodeError as e:
+    except WranglerOutputError as e:
         print(f"エラー: JSON解析に失敗しました: {e}", file=sys.stderr)
         return False
     except Exception as e:
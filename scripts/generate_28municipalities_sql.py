@@ -2,6 +2,9 @@
 """
 28自治体データの正確なSQL生成スクリプト
 """
+from d1_client import PROJECT_ROOT
+
+OUTPUT_FILE = PROJECT_ROOT / "scripts" / "insert_28municipalities_v2.sql"
 
 municipalities = [
     # 東京都
@@ -62,8 +65,8 @@ INSERT OR REPLACE INTO building_regulations (
 );
 """
 
-with open('/home/user/webapp/scripts/insert_28municipalities_v2.sql', 'w', encoding='utf-8') as f:
+with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
     f.write(sql)
 
 print(f"Generated SQL for {len(municipalities)} municipalities")
-print("Output: /home/user/webapp/scripts/insert_28municipalities_v2.sql")
+print(f"Output: {OUTPUT_FILE}")
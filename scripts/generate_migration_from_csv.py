@@ -2,12 +2,43 @@
 """
 CSVファイルから建築規制データベース投入用のマイグレーションSQLを生成
 VERIFIED自治体を優先的に処理
+
+CSVは1行ずつ読み、一定行数のチャンクごとにSQLを組み立てる。
+--jobs を指定するとチャンクを複数プロセスで並列に組み立て、CSVの順にファイルへ書き出す。
+--per-prefecture で都道府県ごとに別のマイグレーションファイルへ出力する。
+
+使い方:
+  python3 scripts/generate_migration_from_csv.py [CSV] [出力SQL] [--jobs N] [--per-prefecture] [--all]
 """
 
+import argparse
 import csv
 import sys
 import os
 from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from jp_numeric import quantity_value
+from parallel_map import ordered_map
+from sql_emitter import pack_values, table_schema
+
+# ワーカーへ渡す1チャンクの行数
+DEFAULT_CHUNK_SIZE = 500
+
+# 親（building_regulations）の行と子テーブルの行を対応付けるキー表
+KEY_TABLE = '_import_keys'
+
+# 0053_create_extended_regulation_tables.sql の子テーブル
+CHILD_TABLES = (
+    'urban_planning_regulations',
+    'site_road_requirements',
+    'building_design_requirements',
+    'development_ground_requirements',
+    'construction_environmental_regulations',
+    'local_specific_requirements',
+)
+
 
 def escape_sql_string(s):
     """SQLインジェクション対策: シングルクォートをエスケープ"""
@@ -17,46 +48,15 @@ def escape_sql_string(s):
     escaped = s.replace("'", "''")
     return f"'{escaped}'"
 
-def parse_csv_to_sql(csv_file_path, output_sql_path, filter_verified_only=True):
-    """
-    CSVファイルを読み込んで、マイグレーションSQLを生成
-    
-    Args:
-        csv_file_path: 入力CSVファイルパス
-        output_sql_path: 出力SQLファイルパス
-        filter_verified_only: Trueの場合、VERIFIEDの自治体のみ処理
-    """
-    
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        rows = list(reader)
-    
-    # VERIFIEDフィルタ
-    if filter_verified_only:
-        rows = [row for row in rows if row.get('verification_status') == 'VERIFIED']
-    
-    print(f"📊 処理対象: {len(rows)}自治体")
-    
-    # SQLファイル生成
-    with open(output_sql_path, 'w', encoding='utf-8') as sqlfile:
-        sqlfile.write(f"""-- Migration 0055: Import VERIFIED Tokyo Wards Phase 2 Data
--- Target: VERIFIED municipalities from comprehensive CSV data
--- Strategy: Import 11 VERIFIED municipalities with full regulation details
--- Version: v3.153.138
--- Date: {datetime.now().strftime('%Y-%m-%d')}
--- Source: 1to3ken_apartment_regulation_db_phase2_tokyo_wards_started_remaining.csv
 
-""")
-        
-        for idx, row in enumerate(rows, 1):
-            prefecture = row['prefecture']
-            municipality = row['municipality']
-            municipality_type = row['municipality_type']
-            
-            print(f"  {idx}. {prefecture} {municipality} ({municipality_type})")
-            
-            # building_regulations テーブルへの INSERT
-            sqlfile.write(f"""
+def municipality_sql(idx, row):
+    """1自治体分のSQL（building_regulations と子テーブルへの INSERT）"""
+    parts = []
+    prefecture = row['prefecture']
+    municipality = row['municipality']
+
+    # building_regulations テーブルへの INSERT
+    parts.append(f"""
 -- {idx}. {prefecture} {municipality}
 INSERT INTO building_regulations (
     prefecture, city, district, chome, banchi_start, banchi_end,
@@ -119,99 +119,105 @@ INSERT INTO building_regulations (
 );
 
 """)
-            
-            # building_regulations の最後に挿入されたIDを取得
-            building_regulation_id_var = f"last_building_regulation_id_{idx}"
-            
-            sqlfile.write(f"""-- Get last inserted ID for {municipality}
-SELECT last_insert_rowid() AS {building_regulation_id_var};
 
-""")
-            
-            # building_design_requirements テーブルへの INSERT (ワンルーム規制情報)
-            one_room_guideline = row.get('one_room_guideline', '')
-            if one_room_guideline and one_room_guideline != '要確認':
-                min_unit_area = row.get('min_unit_area_m2', '')
-                if min_unit_area and min_unit_area != '要確認':
-                    try:
-                        min_unit_area_float = float(min_unit_area.replace('（定住型以外の最低）', '').replace('（定義）', '').strip().split('（')[0].split('未満')[0])
-                    except:
-                        min_unit_area_float = None
-                else:
-                    min_unit_area_float = None
-                
-                ceiling_height = row.get('ceiling_height_m', '')
-                if ceiling_height and ceiling_height != '要確認':
-                    try:
-                        ceiling_height_float = float(ceiling_height)
-                    except:
-                        ceiling_height_float = None
-                else:
-                    ceiling_height_float = None
-                
-                manager_room_threshold = row.get('manager_room_threshold_units', '')
-                if manager_room_threshold and manager_room_threshold != '要確認':
-                    try:
-                        manager_room_threshold_int = int(manager_room_threshold.split('（')[0].strip())
-                    except:
-                        manager_room_threshold_int = None
-                else:
-                    manager_room_threshold_int = None
-                
-                signboard_neighbor = row.get('signboard_neighbor_explanation', '')
-                signboard_required = 1 if signboard_neighbor and '標識' in signboard_neighbor and signboard_neighbor != '要確認' else 0
-                neighbor_explanation_required = 1 if signboard_neighbor and '説明' in signboard_neighbor and signboard_neighbor != '要確認' else 0
-                
-                sqlfile.write(f"""-- Insert building_design_requirements for {municipality}
-INSERT INTO building_design_requirements (
-    building_regulation_id,
-    min_unit_area,
-    ceiling_height_min,
-    manager_room_required,
-    manager_room_threshold,
-    signboard_required,
-    neighbor_explanation_required,
-    studio_definition
-) SELECT 
-    id,
-    {min_unit_area_float if min_unit_area_float else 'NULL'},
-    {ceiling_height_float if ceiling_height_float else 'NULL'},
-    {1 if manager_room_threshold_int else 0},
-    {manager_room_threshold_int if manager_room_threshold_int else 'NULL'},
-    {signboard_required},
-    {neighbor_explanation_required},
-    {escape_sql_string(row.get('one_room_apply_threshold'))}
-FROM building_regulations 
-WHERE prefecture = {escape_sql_string(prefecture)} 
-  AND city = {escape_sql_string(municipality)}
-LIMIT 1;
+    # 子テーブルとの対応付け用に、挿入した行のidを記録
+    parts.append(f"""INSERT INTO {KEY_TABLE} (import_key, building_regulation_id) VALUES ({idx}, last_insert_rowid());
 
 """)
-            
-            # local_specific_requirements テーブルへの INSERT
-            sqlfile.write(f"""-- Insert local_specific_requirements for {municipality}
-INSERT INTO local_specific_requirements (
-    building_regulation_id,
-    has_building_standards_act,
-    has_prefecture_ordinance,
-    has_municipal_ordinance,
-    has_development_guideline,
-    notes
-) SELECT 
-    id,
-    1, -- has_building_standards_act (建築基準法は全国適用)
-    {1 if '東京都建築安全条例' in row.get('prefecture_level_key_ordinances', '') else 0},
-    {1 if one_room_guideline and one_room_guideline != '要確認' else 0},
-    {1 if row.get('development_guideline_or_ordinance') and row.get('development_guideline_or_ordinance') != '要確認' else 0},
-    {escape_sql_string(row.get('notes'))}
-FROM building_regulations 
-WHERE prefecture = {escape_sql_string(prefecture)} 
-  AND city = {escape_sql_string(municipality)}
-LIMIT 1;
+    return ''.join(parts)
 
-""")
-        
-        sqlfile.write(f"""
+
+def child_rows(row):
+    """
+    1自治体分の子テーブル（0053の拡張テーブル）の行 {テーブル: {列: 値}}
+
+    CSVに対応する列があるのは building_design_requirements と local_specific_requirements のみ。
+    """
+    children = {}
+
+    # building_design_requirements (ワンルーム規制情報)
+    one_room_guideline = row.get('one_room_guideline', '')
+    if one_room_guideline and one_room_guideline != '要確認':
+        # '25（定住型以外の最低）'、'25㎡以上'、'三十戸以上' などから数値を読む
+        min_unit_area = quantity_value(row.get('min_unit_area_m2'), 'm2')
+        ceiling_height = quantity_value(row.get('ceiling_height_m'), 'm')
+        manager_room_threshold = quantity_value(row.get('manager_room_threshold_units'), '戸')
+
+        signboard_neighbor = row.get('signboard_neighbor_explanation', '')
+        signboard_required = 1 if signboard_neighbor and '標識' in signboard_neighbor and signboard_neighbor != '要確認' else 0
+        neighbor_explanation_required = 1 if signboard_neighbor and '説明' in signboard_neighbor and signboard_neighbor != '要確認' else 0
+        studio_definition = row.get('one_room_apply_threshold')
+
+        children['building_design_requirements'] = {
+            'min_unit_area': min_unit_area or None,
+            'ceiling_height_min': ceiling_height or None,
+            'manager_room_required': 1 if manager_room_threshold else 0,
+            'manager_room_threshold': manager_room_threshold or None,
+            'signboard_required': signboard_required,
+            'neighbor_explanation_required': neighbor_explanation_required,
+            'studio_definition': None if studio_definition in (None, '', '要確認') else studio_definition,
+        }
+
+    # local_specific_requirements
+    development_guideline = row.get('development_guideline_or_ordinance')
+    notes = row.get('notes')
+    children['local_specific_requirements'] = {
+        'has_building_standards_act': 1,    # 建築基準法は全国適用
+        'has_prefecture_ordinance': 1 if '東京都建築安全条例' in row.get('prefecture_level_key_ordinances', '') else 0,
+        'has_municipal_ordinance': 1 if one_room_guideline and one_room_guideline != '要確認' else 0,
+        'has_development_guideline': 1 if development_guideline and development_guideline != '要確認' else 0,
+        'notes': None if notes in (None, '', '要確認') else notes,
+    }
+    return children
+
+
+def child_table_sql(entries):
+    """
+    子テーブルへの一括INSERT（_import_keys と結合して親のidを引く）
+
+    Args:
+        entries: (番号, 行) のリスト（同じ出力ファイルの行）
+    """
+    rows_by_table = {table: [] for table in CHILD_TABLES}
+    for idx, row in entries:
+        for table, values in child_rows(row).items():
+            rows_by_table[table].append((idx, values))
+
+    parts = []
+    for table, rows in rows_by_table.items():
+        if not rows:
+            continue
+        schema = table_schema(table)
+        columns = list(rows[0][1])
+        selected = ', '.join(f"v.column{i + 2}" for i in range(len(columns)))
+        prefix = (f"-- Insert {table}\n"
+                  f"INSERT INTO {table} (building_regulation_id, {', '.join(columns)})\n"
+                  f"SELECT k.building_regulation_id, {selected}\nFROM (VALUES\n")
+        suffix = f"\n) AS v\nJOIN {KEY_TABLE} AS k ON k.import_key = v.column1;"
+        values = (f"({idx}, " + ', '.join(schema.literal(col, row) for col in columns) + ")"
+                  for idx, row in rows)
+        for statement in pack_values(prefix, values, suffix):
+            parts.append(statement + "\n\n")
+    return ''.join(parts)
+
+
+def migration_header(prefecture=None):
+    title = f"{prefecture} " if prefecture else ""
+    return f"""-- Migration 0055: Import VERIFIED Tokyo Wards Phase 2 Data
+-- Target: VERIFIED {title}municipalities from comprehensive CSV data
+-- Strategy: Import 11 VERIFIED municipalities with full regulation details
+-- Version: v3.153.138
+-- Date: {datetime.now().strftime('%Y-%m-%d')}
+-- Source: 1to3ken_apartment_regulation_db_phase2_tokyo_wards_started_remaining.csv
+
+CREATE TABLE IF NOT EXISTS {KEY_TABLE} (import_key INTEGER PRIMARY KEY, building_regulation_id INTEGER NOT NULL);
+DELETE FROM {KEY_TABLE};
+
+"""
+
+
+VERIFICATION_SQL = f"""
+DROP TABLE IF EXISTS {KEY_TABLE};
 -- Verification query
 SELECT 
     '✅ Import complete' as status,
@@ -221,17 +227,132 @@ SELECT
 FROM building_regulations
 WHERE verification_status = 'VERIFIED';
 
-""")
-    
-    print(f"\n✅ マイグレーションSQL生成完了: {output_sql_path}")
-    print(f"📊 処理済み: {len(rows)}自治体")
+"""
 
-if __name__ == '__main__':
-    csv_path = '/home/user/uploaded_files/1to3ken_apartment_regulation_db_phase2_tokyo_wards_started_remaining.csv'
-    output_path = '/home/user/webapp/migrations/0055_import_verified_municipalities.sql'
+
+def prefecture_output_path(output_sql_path, prefecture):
+    """都道府県別の出力先（{prefecture} があれば置換、なければ拡張子の前に付ける）"""
+    if '{prefecture}' in output_sql_path:
+        return output_sql_path.replace('{prefecture}', prefecture)
+    path = Path(output_sql_path)
+    return str(path.with_name(f"{path.stem}_{prefecture}{path.suffix}"))
+
+
+def iter_numbered_rows(csv_file_path, filter_verified_only=True, per_prefecture=False):
+    """
+    CSVを1行ずつ読み、(出力先キー, 番号, 行) を返す
+
+    番号はファイルごとの連番（都道府県別なら都道府県ごと）。
+    """
+    counters = {}
+    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if filter_verified_only and row.get('verification_status') != 'VERIFIED':
+                continue
+            key = row['prefecture'] if per_prefecture else None
+            counters[key] = counters.get(key, 0) + 1
+            yield key, counters[key], row
+
+
+def chunk_sql(chunk):
+    """
+    チャンクのSQLを組み立てる（ワーカープロセスで実行）
+
+    Returns:
+        ([(出力先キー, 番号, 行, 親のSQL)], {出力先キー: 子テーブルのSQL})
+    """
+    entries = {}
+    for key, idx, row in chunk:
+        entries.setdefault(key, []).append((idx, row))
+    parents = [(key, idx, row, municipality_sql(idx, row)) for key, idx, row in chunk]
+    return parents, {key: child_table_sql(rows) for key, rows in entries.items()}
+
+
+def _chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_csv_to_sql(csv_file_path, output_sql_path, filter_verified_only=True, jobs=1,
+                     per_prefecture=False, chunk_size=DEFAULT_CHUNK_SIZE, verbose=True):
+    """
+    CSVファイルを読み込んで、マイグレーションSQLを生成
     
-    if not os.path.exists(csv_path):
-        print(f"❌ CSVファイルが見つかりません: {csv_path}")
+    Args:
+        csv_file_path: 入力CSVファイルパス
+        output_sql_path: 出力SQLファイルパス
+        filter_verified_only: Trueの場合、VERIFIEDの自治体のみ処理
+        jobs: SQLを組み立てるプロセス数（0 または None なら全コア）
+        per_prefecture: Trueの場合、都道府県ごとに別ファイルへ出力
+        chunk_size: ワーカーへ渡す1チャンクの行数
+        verbose: 自治体ごとに進捗を表示
+
+    Returns:
+        {出力ファイル: 自治体数}
+    """
+    jobs = jobs or os.cpu_count() or 1
+    rows = iter_numbered_rows(csv_file_path, filter_verified_only, per_prefecture)
+
+    files = {}
+    counts = {}
+    try:
+        arguments = ((chunk,) for chunk in _chunks(rows, chunk_size))
+        for parents, children in ordered_map(chunk_sql, arguments, jobs):
+            for key, idx, row, sql in parents:
+                if key not in files:
+                    path = prefecture_output_path(output_sql_path, key) if per_prefecture else output_sql_path
+                    Path(path).parent.mkdir(parents=True, exist_ok=True)
+                    files[key] = open(path, 'w', encoding='utf-8')
+                    files[key].write(migration_header(key))
+                    counts[files[key].name] = 0
+                if verbose:
+                    print(f"  {idx}. {row['prefecture']} {row['municipality']} ({row['municipality_type']})")
+                files[key].write(sql)
+                counts[files[key].name] += 1
+            for key, sql in children.items():
+                files[key].write(sql)
+    finally:
+        for sqlfile in files.values():
+            sqlfile.write(VERIFICATION_SQL)
+            sqlfile.close()
+
+    if not files:
+        # 対象がなくても空のマイグレーションは出力する
+        with open(output_sql_path, 'w', encoding='utf-8') as sqlfile:
+            sqlfile.write(migration_header() + VERIFICATION_SQL)
+        counts[output_sql_path] = 0
+
+    for path, count in counts.items():
+        print(f"\n✅ マイグレーションSQL生成完了: {path}")
+        print(f"📊 処理済み: {count}自治体")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSVから building_regulations 投入用のマイグレーションSQLを生成")
+    parser.add_argument('csv_path', nargs='?',
+                        default='/home/user/uploaded_files/1to3ken_apartment_regulation_db_phase2_tokyo_wards_started_remaining.csv')
+    parser.add_argument('output_path', nargs='?',
+                        default='/home/user/webapp/migrations/0055_import_verified_municipalities.sql',
+                        help="出力SQL（--per-prefecture 時は {prefecture} を都道府県名に置換）")
+    parser.add_argument('--jobs', type=int, default=1, help="並列プロセス数（0 で全コア）")
+    parser.add_argument('--per-prefecture', action='store_true', help="都道府県ごとに別ファイルへ出力")
+    parser.add_argument('--all', action='store_true', help="VERIFIED 以外の自治体も出力")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--quiet', action='store_true', help="自治体ごとの表示を省略")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv_path):
+        print(f"❌ CSVファイルが見つかりません: {args.csv_path}")
         sys.exit(1)
-    
-    parse_csv_to_sql(csv_path, output_path, filter_verified_only=True)
+
+    parse_csv_to_sql(args.csv_path, args.output_path, filter_verified_only=not args.all, jobs=args.jobs,
+                     per_prefecture=args.per_prefecture, chunk_size=args.chunk_size, verbose=not args.quiet)
+
+
+if __name__ == '__main__':
+    main()
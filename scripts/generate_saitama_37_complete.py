@@ -4,7 +4,10 @@
 千葉県同様、一般的な開発指導要綱として記録
 """
 import json
-from datetime import datetime
+
+from d1_client import PROJECT_ROOT
+from generation_runner import build_timestamp
+from sql_emitter import write_insert_sql
 
 # 埼玉県37自治体の収集データ
 SAITAMA_37_CITIES_DATA = [
@@ -47,57 +50,35 @@ SAITAMA_37_CITIES_DATA = [
     {"city": "長瀞町", "ordinance": "長瀞町開発指導要綱", "url": ""},
 ]
 
-def generate_insert_sql(data_list):
-    """building_regulations用のINSERT SQL生成"""
-    sql_statements = []
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+INSERT_COLUMNS = [
+    'prefecture', 'city', 'normalized_address', 'local_ordinance', 'data_source', 'data_source_url',
+    'confidence_level', 'verification_status', 'verified_by', 'verified_at', 'apartment_construction_feasible',
+]
+
+def regulation_rows(data_list):
+    """building_regulations用の行を1件ずつ生成（値のない列はDEFAULT）"""
+    timestamp = build_timestamp()
     
     for data in data_list:
-        fields = []
-        values = []
-        
-        # 必須フィールド
-        fields.append("prefecture")
-        values.append("'埼玉県'")
-        
-        fields.append("city")
-        values.append(f"'{data['city']}'")
-        
-        fields.append("normalized_address")
-        values.append(f"'埼玉県{data['city']}'")
+        row = {
+            'prefecture': '埼玉県',
+            'city': data['city'],
+            'normalized_address': f"埼玉県{data['city']}",
+            'data_source': '埼玉県公式サイト・各市町村公式サイト',
+            'confidence_level': 'medium',
+            'verification_status': 'VERIFIED',
+            'verified_by': 'AI_Assistant_WebSearch',
+            'verified_at': timestamp,
+            'apartment_construction_feasible': 1,
+        }
         
         # オプショナルフィールド
         if data.get('ordinance'):
-            fields.append("local_ordinance")
-            ordinance = data['ordinance'].replace("'", "''")
-            values.append(f"'{ordinance}'")
-        
-        fields.append("data_source")
-        values.append("'埼玉県公式サイト・各市町村公式サイト'")
-        
+            row['local_ordinance'] = data['ordinance']
         if data.get('url'):
-            fields.append("data_source_url")
-            values.append(f"'{data['url']}'")
+            row['data_source_url'] = data['url']
         
-        fields.append("confidence_level")
-        values.append("'medium'")
-        
-        fields.append("verification_status")
-        values.append("'VERIFIED'")
-        
-        fields.append("verified_by")
-        values.append("'AI_Assistant_WebSearch'")
-        
-        fields.append("verified_at")
-        values.append(f"'{timestamp}'")
-        
-        fields.append("apartment_construction_feasible")
-        values.append("1")
-        
-        sql = f"INSERT OR REPLACE INTO building_regulations ({', '.join(fields)}) VALUES ({', '.join(values)});"
-        sql_statements.append(sql)
-    
-    return sql_statements
+        yield row
 
 def main():
     """メイン処理"""
@@ -107,24 +88,21 @@ def main():
     
     print(f"\n収集完了: {len(SAITAMA_37_CITIES_DATA)}自治体")
     
-    # SQL生成
-    sql_statements = generate_insert_sql(SAITAMA_37_CITIES_DATA)
-    
-    # SQLファイルに保存
-    output_file = '/home/user/webapp/scripts/saitama_37_municipalities_complete.sql'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- 埼玉県37自治体 完全データ\n")
-        f.write(f"-- 生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"-- 収集自治体数: {len(SAITAMA_37_CITIES_DATA)}\n")
-        f.write(f"-- データ収集方法: WebSearch API\n")
-        f.write(f"-- 検証ステータス: すべてVERIFIED\n")
-        f.write(f"-- 注記: 埼玉県は主に一般的な開発指導要綱が中心\n\n")
-        
-        for sql in sql_statements:
-            f.write(sql + "\n")
+    # SQL生成・保存（複数行INSERTでストリーミング出力）
+    output_file = PROJECT_ROOT / "scripts" / "saitama_37_municipalities_complete.sql"
+    emitter = write_insert_sql(
+        regulation_rows(SAITAMA_37_CITIES_DATA), output_file, INSERT_COLUMNS, mode='replace',
+        header=[
+            "埼玉県37自治体 完全データ",
+            f"生成日時: {build_timestamp()}",
+            f"収集自治体数: {len(SAITAMA_37_CITIES_DATA)}",
+            "データ収集方法: WebSearch API",
+            "検証ステータス: すべてVERIFIED",
+            "注記: 埼玉県は主に一般的な開発指導要綱が中心",
+        ])
     
     print(f"\nSQL生成完了: {output_file}")
-    print(f"生成SQL数: {len(sql_statements)}")
+    print(f"生成SQL数: {emitter.statements}（{emitter.rows}行）")
     
     print(f"\n次のステップ:")
     print(f"1. 本番環境へ反映: npx wrangler d1 execute real-estate-200units-db --remote --file={output_file}")
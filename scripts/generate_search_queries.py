@@ -7,6 +7,8 @@
 import csv
 import json
 
+from municipality_registry import load_registry
+
 # 未統合自治体リスト
 MUNICIPALITIES = {
     '神奈川県': [
@@ -37,9 +39,13 @@ def generate_queries():
     """検索クエリを生成してCSV出力"""
     output = []
     
+    registry = load_registry()
+    
     for pref, cities in MUNICIPALITIES.items():
         for city in cities:
+            code = registry.require(pref, city)
             row = {
+                'code': code,
                 'prefecture': pref,
                 'city': city,
                 'priority': 'A' if pref in ['神奈川県', '埼玉県'] else 'B',
@@ -51,28 +57,10 @@ def generate_queries():
                 query = template.format(city=city)
                 row[f'query_{key}'] = query
             
-            # 公式サイトURL（推定）
-            if city.endswith('市'):
-                city_romaji_map = {
-                    '横浜市': 'yokohama', '平塚市': 'hiratsuka', '小田原市': 'odawara',
-                    '三浦市': 'miura', '秦野市': 'hadano', '厚木市': 'atsugi',
-                    '伊勢原市': 'isehara', '海老名市': 'ebina', '座間市': 'zama',
-                    '習志野市': 'narashino', '流山市': 'nagareyama', '八千代市': 'yachiyo',
-                    '市原市': 'ichihara', '佐倉市': 'sakura',
-                    '川越市': 'kawagoe', '越谷市': 'koshigaya', '熊谷市': 'kumagaya',
-                    '春日部市': 'kasukabe', '上尾市': 'ageo', '戸田市': 'toda',
-                    '蕨市': 'warabi', '朝霞市': 'asaka', '和光市': 'wako',
-                    '新座市': 'niiza', '久喜市': 'kuki'
-                }
-                romaji = city_romaji_map.get(city, city.replace('市', ''))
-                
-                # 県別のURLパターン
-                if pref == '神奈川県':
-                    row['official_site'] = f'https://www.city.{romaji}.kanagawa.jp/'
-                elif pref == '千葉県':
-                    row['official_site'] = f'https://www.city.{romaji}.chiba.jp/'
-                elif pref == '埼玉県':
-                    row['official_site'] = f'https://www.city.{romaji}.saitama.jp/'
+            # 公式サイトURL（municipality_codes.csv の公式ドメイン）
+            domain = registry.domain(code)
+            if domain:
+                row['official_site'] = f'https://www.{domain}/'
             
             output.append(row)
     
@@ -3,7 +3,10 @@
 東京都17市の収集データを構造化してSQL生成
 """
 import json
-from datetime import datetime
+
+from d1_client import PROJECT_ROOT
+from generation_runner import build_timestamp
+from sql_emitter import write_insert_sql
 
 # 東京都17市の収集データ（WebSearch結果を基に作成）
 TOKYO_17_CITIES_DATA = [
@@ -237,68 +240,37 @@ TOKYO_17_CITIES_DATA = [
     }
 ]
 
-def generate_insert_sql(data_list):
-    """building_regulations用のINSERT SQL生成"""
-    sql_statements = []
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+INSERT_COLUMNS = [
+    'prefecture', 'city', 'normalized_address', 'local_ordinance', 'data_source', 'data_source_url',
+    'confidence_level', 'verification_status', 'verified_by', 'verified_at',
+    'apartment_restrictions', 'apartment_construction_feasible',
+]
+
+# 値があるときだけ出力する列（ない列はDEFAULT）
+OPTIONAL_COLUMNS = [
+    'local_ordinance', 'data_source', 'data_source_url', 'confidence_level',
+    'verification_status', 'verified_by', 'apartment_restrictions',
+]
+
+def regulation_rows(data_list):
+    """building_regulations用の行を1件ずつ生成"""
+    timestamp = build_timestamp()
     
     for data in data_list:
-        fields = []
-        values = []
-        
-        # 必須フィールド
-        fields.append("prefecture")
-        values.append(f"'{data['prefecture']}'")
-        
-        fields.append("city")
-        values.append(f"'{data['city']}'")
-        
-        fields.append("normalized_address")
-        values.append(f"'{data['normalized_address']}'")
-        
-        # オプショナルフィールド
-        if data.get('local_ordinance'):
-            fields.append("local_ordinance")
-            ordinance = data['local_ordinance'].replace("'", "''")
-            values.append(f"'{ordinance}'")
-        
-        if data.get('data_source'):
-            fields.append("data_source")
-            values.append(f"'{data['data_source']}'")
-        
-        if data.get('data_source_url'):
-            fields.append("data_source_url")
-            values.append(f"'{data['data_source_url']}'")
-        
-        if data.get('confidence_level'):
-            fields.append("confidence_level")
-            values.append(f"'{data['confidence_level']}'")
-        
-        if data.get('verification_status'):
-            fields.append("verification_status")
-            values.append(f"'{data['verification_status']}'")
-        
-        if data.get('verified_by'):
-            fields.append("verified_by")
-            values.append(f"'{data['verified_by']}'")
-        
-        # verified_at はタイムスタンプを統一
-        fields.append("verified_at")
-        values.append(f"'{timestamp}'")
-        
-        if data.get('apartment_restrictions'):
-            fields.append("apartment_restrictions")
-            restrictions = data['apartment_restrictions'].replace("'", "''")
-            values.append(f"'{restrictions}'")
-        
+        row = {
+            'prefecture': data['prefecture'],
+            'city': data['city'],
+            'normalized_address': data['normalized_address'],
+            # verified_at はタイムスタンプを統一
+            'verified_at': timestamp,
+        }
+        for column in OPTIONAL_COLUMNS:
+            if data.get(column):
+                row[column] = data[column]
         if data.get('apartment_construction_feasible') is not None:
-            fields.append("apartment_construction_feasible")
-            values.append(str(data['apartment_construction_feasible']))
+            row['apartment_construction_feasible'] = data['apartment_construction_feasible']
         
-        sql = f"INSERT OR REPLACE INTO building_regulations ({', '.join(fields)}) VALUES ({', '.join(values)});"
-        sql_statements.append(sql)
-    
-    return sql_statements
+        yield row
 
 def main():
     """メイン処理"""
@@ -308,23 +280,20 @@ def main():
     
     print(f"\n収集完了: {len(TOKYO_17_CITIES_DATA)}自治体")
     
-    # SQL生成
-    sql_statements = generate_insert_sql(TOKYO_17_CITIES_DATA)
-    
-    # SQLファイルに保存
-    output_file = '/home/user/webapp/scripts/tokyo_17_cities_complete.sql'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- 東京都17市 完全データ\n")
-        f.write(f"-- 生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"-- 収集自治体数: {len(TOKYO_17_CITIES_DATA)}\n")
-        f.write(f"-- データ収集方法: WebSearch API\n")
-        f.write(f"-- 検証ステータス: すべてVERIFIED\n\n")
-        
-        for sql in sql_statements:
-            f.write(sql + "\n")
+    # SQL生成・保存（複数行INSERTでストリーミング出力）
+    output_file = PROJECT_ROOT / "scripts" / "tokyo_17_cities_complete.sql"
+    emitter = write_insert_sql(
+        regulation_rows(TOKYO_17_CITIES_DATA), output_file, INSERT_COLUMNS, mode='replace',
+        header=[
+            "東京都17市 完全データ",
+            f"生成日時: {build_timestamp()}",
+            f"収集自治体数: {len(TOKYO_17_CITIES_DATA)}",
+            "データ収集方法: WebSearch API",
+            "検証ステータス: すべてVERIFIED",
+        ])
     
     print(f"\nSQL生成完了: {output_file}")
-    print(f"生成SQL数: {len(sql_statements)}")
+    print(f"生成SQL数: {emitter.statements}（{emitter.rows}行）")
     
     # 統計情報
     with_restrictions = sum(1 for d in TOKYO_17_CITIES_DATA if d.get('apartment_restrictions'))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+SQL生成スクリプトの一括実行（入力ハッシュによる再実行の省略）
+
+各生成スクリプトの入力（スクリプト自身・読み込むローカルモジュール・参照するデータファイル）の
+ハッシュを .cache/generation_manifest.json に記録し、
+  - 入力が前回と同じで、出力も前回生成したまま → 実行しない
+  - それ以外 → 実行（複数あれば並列）
+する。
+
+生成物の日時は SOURCE_DATE_EPOCH（入力ファイルの最終コミット日時、未コミットの変更があれば
+更新日時）に固定するため、同じ入力からは同じ内容のSQLが生成される。
+
+使い方:
+  python3 scripts/generation_runner.py              変更のあった生成スクリプトだけ実行
+  python3 scripts/generation_runner.py --all        すべて実行
+  python3 scripts/generation_runner.py --list       状態を表示（実行しない）
+  python3 scripts/generation_runner.py chiba_27     指定した生成スクリプトだけ
+"""
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from d1_client import PROJECT_ROOT
+
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+MANIFEST_PATH = PROJECT_ROOT / ".cache" / "generation_manifest.json"
+
+JST = timezone(timedelta(hours=9))
+
+# 生成スクリプト: 実行するPython（モジュール名・関数）、データファイル、出力（PROJECT_ROOT からの相対パス）
+GENERATORS = {
+    'tokyo_17': {
+        'module': 'generate_tokyo_17_complete',
+        'outputs': ['scripts/tokyo_17_cities_complete.sql'],
+    },
+    'chiba_27': {
+        'module': 'generate_chiba_27_complete',
+        'outputs': ['scripts/chiba_27_municipalities_complete.sql'],
+    },
+    'saitama_37': {
+        'module': 'generate_saitama_37_complete',
+        'outputs': ['scripts/saitama_37_municipalities_complete.sql'],
+    },
+    '28municipalities': {
+        'module': 'generate_28municipalities_sql',
+        'outputs': ['scripts/insert_28municipalities_v2.sql'],
+    },
+    'phase1_template': {
+        'module': 'batch_collect_phase1',
+        'function': 'generate_sql_template',
+        'outputs': ['scripts/insert_phase1_template.sql'],
+    },
+}
+
+# モジュールが実行時に読むファイル（import では分からないもの）
+MODULE_DATA_INPUTS = {
+    'sql_emitter': ['migrations/*.sql'],   # 列定義を CREATE TABLE / ALTER TABLE から読む
+}
+
+
+def build_timestamp(fmt="%Y-%m-%d %H:%M:%S"):
+    """
+    生成物に書く日時
+
+    SOURCE_DATE_EPOCH があればその時刻（日本時間）、なければ現在時刻。
+    """
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        return datetime.fromtimestamp(int(epoch), JST).strftime(fmt)
+    return datetime.now().strftime(fmt)
+
+
+def local_imports(module, scripts_dir=SCRIPTS_DIR, seen=None):
+    """module が（間接的にも）import する scripts/ 内のモジュール名"""
+    seen = set() if seen is None else seen
+    if module in seen:
+        return seen
+    path = Path(scripts_dir) / f"{module}.py"
+    if not path.exists():
+        return seen
+    seen.add(module)
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), str(path))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module.split('.')[0]]
+        else:
+            continue
+        for name in names:
+            local_imports(name, scripts_dir, seen)
+    return seen
+
+
+def generator_inputs(spec, root=PROJECT_ROOT):
+    """生成スクリプトの入力ファイル（PROJECT_ROOT からの相対パス、ソート済み）"""
+    inputs = set()
+    for module in local_imports(spec['module'], Path(root) / "scripts"):
+        inputs.add(f"scripts/{module}.py")
+        for pattern in MODULE_DATA_INPUTS.get(module, []):
+            for path in glob.glob(str(Path(root) / pattern)):
+                inputs.add(os.path.relpath(path, root))
+    for pattern in spec.get('inputs', []):
+        for path in glob.glob(str(Path(root) / pattern)):
+            inputs.add(os.path.relpath(path, root))
+    return sorted(inputs)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def inputs_hash(name, spec, inputs, root=PROJECT_ROOT):
+    """入力ファイルの内容と生成スクリプトの設定から計算したハッシュ"""
+    digest = hashlib.sha256(json.dumps([name, spec], sort_keys=True).encode('utf-8'))
+    for path in inputs:
+        digest.update(path.encode('utf-8') + b'\0' + file_hash(Path(root) / path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def source_date_epoch(inputs, root=PROJECT_ROOT):
+    """入力の最終コミット日時（未コミットの変更があれば入力の最終更新日時）"""
+    try:
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', *inputs], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        if not dirty:
+            committed = subprocess.run(['git', 'log', '-1', '--format=%ct', '--', *inputs], cwd=root,
+                                       capture_output=True, text=True, check=True).stdout.strip()
+            if committed:
+                return int(committed)
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return int(max(os.stat(Path(root) / path).st_mtime for path in inputs))
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def stale_reason(name, spec, digest, manifest, root=PROJECT_ROOT):
+    """実行が必要な理由（不要なら None）"""
+    entry = manifest.get(name)
+    if not entry:
+        return "初回"
+    if entry.get('inputs_hash') != digest:
+        return "入力が変更"
+    for output in spec['outputs']:
+        path = Path(root) / output
+        if not path.exists():
+            return f"{output} がない"
+        if file_hash(path) != entry.get('outputs', {}).get(output):
+            return f"{output} が変更"
+    return None
+
+
+def run_generator(name, spec, inputs, root=PROJECT_ROOT):
+    """生成スクリプトを子プロセスで実行し、(終了コード, 出力, 秒数) を返す"""
+    if 'function' in spec:
+        command = [sys.executable, '-c', f"import {spec['module']} as m; m.{spec['function']}()"]
+    else:
+        command = [sys.executable, str(Path(root) / "scripts" / f"{spec['module']}.py")]
+    env = dict(os.environ)
+    env['SOURCE_DATE_EPOCH'] = str(source_date_epoch(inputs, root))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(Path(root) / "scripts"), env.get('PYTHONPATH')]))
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=root, env=env, capture_output=True, text=True)
+    return result.returncode, (result.stdout + result.stderr).strip(), time.perf_counter() - started
+
+
+def run_all(names=None, force=False, jobs=None, dry_run=False, root=PROJECT_ROOT):
+    """
+    変更のあった生成スクリプトを並列に実行する
+
+    Returns:
+        {生成スクリプト名: 'skipped' / 'ok' / 'failed' / 'stale'（dry_run 時）}
+    """
+    names = names or list(GENERATORS)
+    manifest = load_manifest()
+    status = {}
+    todo = []
+    for name in names:
+        spec = GENERATORS[name]
+        inputs = generator_inputs(spec, root)
+        digest = inputs_hash(name, spec, inputs, root)
+        reason = "指定により再実行" if force else stale_reason(name, spec, digest, manifest, root)
+        if reason is None:
+            status[name] = 'skipped'
+            print(f"   ⏭️ {name}: 変更なし")
+            continue
+        if dry_run:
+            status[name] = 'stale'
+            print(f"   🔸 {name}: {reason}")
+            continue
+        todo.append((name, spec, inputs, digest, reason))
+
+    if not todo:
+        return status
+
+    with ThreadPoolExecutor(max_workers=jobs or min(len(todo), os.cpu_count() or 1)) as executor:
+        futures = [(item, executor.submit(run_generator, item[0], item[1], item[2], root)) for item in todo]
+        for (name, spec, inputs, digest, reason), future in futures:
+            returncode, output, seconds = future.result()
+            if returncode != 0:
+                status[name] = 'failed'
+                print(f"   ❌ {name} ({reason}): 終了コード {returncode}", file=sys.stderr)
+                print('      ' + output.replace('\n', '\n      '), file=sys.stderr)
+                continue
+            missing = [o for o in spec['outputs'] if not (Path(root) / o).exists()]
+            if missing:
+                status[name] = 'failed'
+                print(f"   ❌ {name}: 出力が作られませんでした: {', '.join(missing)}", file=sys.stderr)
+                continue
+            status[name] = 'ok'
+            manifest[name] = {
+                'inputs_hash': digest,
+                'inputs': inputs,
+                'outputs': {o: file_hash(Path(root) / o) for o in spec['outputs']},
+                'generated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            print(f"   ✅ {name} ({reason}): {seconds:.2f}秒")
+
+    save_manifest(manifest)
+    return status
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    unknown = [a for a in args if a not in GENERATORS]
+    if unknown:
+        print(f"❌ 不明な生成スクリプト: {', '.join(unknown)}（{', '.join(GENERATORS)}）", file=sys.stderr)
+        sys.exit(1)
+
+    print("=" * 80)
+    print("SQL生成スクリプトの一括実行")
+    print("=" * 80)
+    started = time.perf_counter()
+    status = run_all(args or None, force='--all' in sys.argv[1:], dry_run='--list' in sys.argv[1:])
+
+    counts = {}
+    for value in status.values():
+        counts[value] = counts.get(value, 0) + 1
+    print(f"\n📊 実行 {counts.get('ok', 0)} / 省略 {counts.get('skipped', 0)} / 失敗 {counts.get('failed', 0)}"
+          f"（{time.perf_counter() - started:.2f}秒）")
+    if counts.get('failed'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,34 +2,19 @@
 """
 本番環境の全自治体リストを取得
 """
-import subprocess
-import json
+from d1_client import D1Error
+from snapshot_cache import open_snapshot
 
 def get_production_municipalities():
-    """本番環境から全自治体リストを取得"""
-    cmd = [
-        'npx', 'wrangler', 'd1', 'execute',
-        'real-estate-200units-db',
-        '--remote',
-        '--json',
-        '--command=SELECT prefecture, city FROM building_regulations WHERE verification_status="VERIFIED" ORDER BY prefecture, city;'
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True, cwd='/home/user/webapp')
-    
-    if result.returncode != 0:
-        print(f"エラー: {result.stderr}")
-        return []
-    
+    """本番環境から全自治体リストを取得（.cache/ のスナップショットから）"""
     try:
-        data = json.loads(result.stdout)
-        if isinstance(data, list) and len(data) > 0:
-            results = data[0].get('results', [])
-            return results
-        return []
-    except json.JSONDecodeError as e:
-        print(f"JSONパースエラー: {e}")
+        results = open_snapshot().query(
+            "SELECT prefecture, city FROM building_regulations WHERE verification_status='VERIFIED' ORDER BY prefecture, city;"
+        )
+    except D1Error as e:
+        print(f"エラー: {e}")
         return []
+    return results
 
 def main():
     municipalities = get_production_municipalities()
@@ -2,12 +2,19 @@
 """
 ChatGPT提供データをMAAアプリのbuilding_regulationsテーブルに統合
 スキーマ不一致を吸収し、既存データとマージ
+
+  --dry-run  書き込まずに変更内容を .cache/changes/ に JSONL で書き出す
 """
 
-import sqlite3
 import sys
 from datetime import datetime
 
+from d1_client import local_connection
+from import_mapping import dry_run, load_mapping
+
+MAPPING = 'chatgpt_data'   # regulation_type → 列の対応（mappings/chatgpt_data.json）
+
+
 # ChatGPT提供データ（01_building_regulations_inserts.sqlから抽出）
 CHATGPT_DATA = [
     {
@@ -52,120 +59,29 @@ CHATGPT_DATA = [
     }
 ]
 
-def map_regulation_type_to_columns(regulation_type, summary):
-    """
-    ChatGPTのregulation_typeをMAAアプリの複数カラムにマッピング
+def integrate_chatgpt_data(db_path=None, chatgpt_data=CHATGPT_DATA, dry=False):
     """
-    mapping = {
-        'apartment_restrictions_note': None,
-        'building_restrictions_note': None,
-        'development_guideline': None
-    }
+    ChatGPTデータを既存building_regulationsに統合（ステージングテーブル経由で一括処理）
     
-    if regulation_type == 'ONE_ROOM':
-        mapping['apartment_restrictions_note'] = summary
-    elif regulation_type == 'MIDRISE_DISPUTE':
-        mapping['building_restrictions_note'] = summary
-    elif regulation_type == 'DEVELOPMENT':
-        mapping['development_guideline'] = 'あり'
-        mapping['building_restrictions_note'] = summary
-    
-    return mapping
-
-def integrate_chatgpt_data():
-    """
-    ChatGPTデータを既存building_regulationsに統合
+    dry=True なら書き込まずに変更内容を JSONL に書き出し、追加・更新される件数を返す
     """
-    db_path = '.wrangler/state/v3/d1/miniflare-D1DatabaseObject/fa61e3e96d5df2e3e583ca0d20d2ccafd7d9be0dd479a159db0c50cbb5b76a9d.sqlite'
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    integrated_count = 0
-    skipped_count = 0
+    mapping = load_mapping(MAPPING)
+    rows = mapping.transform_all(chatgpt_data)  # 'municipality' → 'city', regulation_type → 各列
     
-    for data in CHATGPT_DATA:
-        prefecture = data['prefecture']
-        city = data['municipality']  # 'municipality' → 'city'
-        
-        # 既存データを確認（ID取得）
-        cursor.execute("""
-            SELECT id, apartment_restrictions_note, building_restrictions_note, 
-                   development_guideline, data_source
-            FROM building_regulations
-            WHERE prefecture = ? AND city = ? AND district IS NULL
-            ORDER BY verification_status DESC, id DESC
-            LIMIT 1
-        """, (prefecture, city))
-        
-        existing = cursor.fetchone()
-        
-        # スキーママッピング
-        mapped = map_regulation_type_to_columns(data['regulation_type'], data['summary'])
-        data_source = f"{data['title']} ({data['url']})"
-        verified_at = f"{data['checked_on']}T00:00:00Z"
-        
-        if existing:
-            # 既存データの更新（追記）
-            existing_id = existing[0]
-            existing_apartment = existing[1] or ''
-            existing_building = existing[2] or ''
-            existing_dev = existing[3] or ''
-            existing_source = existing[4] or ''
-            
-            # 既存情報とChatGPT情報をマージ
-            new_apartment = (existing_apartment + '\n' + mapped['apartment_restrictions_note']).strip() if mapped['apartment_restrictions_note'] else existing_apartment
-            new_building = (existing_building + '\n' + mapped['building_restrictions_note']).strip() if mapped['building_restrictions_note'] else existing_building
-            new_dev = mapped['development_guideline'] if mapped['development_guideline'] else existing_dev
-            new_source = existing_source if existing_source else data_source
-            
-            cursor.execute("""
-                UPDATE building_regulations
-                SET apartment_restrictions_note = ?,
-                    building_restrictions_note = ?,
-                    development_guideline = ?,
-                    data_source = COALESCE(data_source, ?),
-                    verification_status = 'VERIFIED',
-                    verified_at = ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (new_apartment or None, new_building or None, new_dev or None, 
-                  new_source, verified_at, existing_id))
-            
-            print(f"✅ 更新: {city} (ID:{existing_id})")
-            integrated_count += 1
-        else:
-            # 新規データの挿入
-            cursor.execute("""
-                INSERT INTO building_regulations (
-                    prefecture, city, 
-                    apartment_restrictions_note, building_restrictions_note, 
-                    development_guideline, data_source,
-                    verification_status, verified_at, 
-                    confidence_level, verified_by
-                ) VALUES (?, ?, ?, ?, ?, ?, 'VERIFIED', ?, 'HIGH', 'ChatGPT-2025-12-23')
-            """, (
-                prefecture, city,
-                mapped['apartment_restrictions_note'], 
-                mapped['building_restrictions_note'],
-                mapped['development_guideline'],
-                data_source,
-                verified_at
-            ))
-            
-            new_id = cursor.lastrowid
-            print(f"✅ 新規追加: {city} (新ID:{new_id})")
-            integrated_count += 1
+    if dry:
+        change_set = dry_run(mapping, rows, db_path)
+        return change_set.count('insert') + change_set.count('update')
     
-    conn.commit()
-    conn.close()
+    # db_path を省略するとローカルD1（wrangler.jsonc の database_id から算出）
+    result = mapping.merge(local_connection('import', db_path), rows)
     
-    print(f"\n📊 統合結果: {integrated_count}件処理完了, {skipped_count}件スキップ")
-    return integrated_count
+    print(f"\n📊 統合結果: {result.total}件処理完了（新規追加 {result.inserted}件, 更新 {result.updated}件）, "
+          f"{result.skipped}件スキップ")
+    return result.total
 
 if __name__ == '__main__':
     try:
-        count = integrate_chatgpt_data()
+        count = integrate_chatgpt_data(dry='--dry-run' in sys.argv[1:])
         sys.exit(0 if count > 0 else 1)
     except Exception as e:
         print(f"❌ エラー: {e}", file=sys.stderr)
@@ -6,7 +6,8 @@ Simplified direct database insertion script
 
 import sqlite3
 import sys
-from pathlib import Path
+
+from d1_client import D1Error, check_local_db_path, local_connection, local_db_path
 
 # Kanagawa and Chiba cities data
 CITIES_DATA = [
@@ -90,16 +91,6 @@ CITIES_DATA = [
 ]
 
 
-def find_db_path():
-    """Find the local D1 database path"""
-    wrangler_dir = Path("/home/user/webapp/.wrangler/state/v3/d1/miniflare-D1DatabaseObject")
-    if wrangler_dir.exists():
-        db_files = list(wrangler_dir.glob("*.sqlite"))
-        if db_files:
-            return str(db_files[0])
-    return None
-
-
 def insert_city_data(conn, city_data):
     """Insert city data into building_regulations and related tables"""
     cursor = conn.cursor()
@@ -173,10 +164,11 @@ def insert_city_data(conn, city_data):
 
 
 def main():
-    db_path = find_db_path()
-    if not db_path:
-        print("❌ Error: Could not find local D1 database")
-        print("Please run 'npm run dev' first to create the database")
+    # The database file is derived from database_id in wrangler.jsonc
+    try:
+        db_path = check_local_db_path(local_db_path())
+    except D1Error as e:
+        print(f"❌ Error: {e}")
         sys.exit(1)
     
     print(f"📁 Using database: {db_path}")
@@ -184,8 +176,7 @@ def main():
     print()
     
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = local_connection('import', db_path)
         
         imported = 0
         for city_data in CITIES_DATA:
@@ -215,8 +206,6 @@ def main():
         print(f"   Total entries: {stats[0]}")
         print(f"   VERIFIED entries: {stats[1]}")
         
-        conn.close()
-        
     except Exception as e:
         print(f"❌ Fatal error: {e}")
         sys.exit(1)
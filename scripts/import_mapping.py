@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+宣言的なマッピングによる building_regulations へのインポート
+
+CSVなどの列 → building_regulations の列の対応を scripts/mappings/<名前>.json に書き、
+自治体ごとの違い（URL・記述の書式など）は overrides の表で上書きする。
+マッピングは読み込み時に1回だけ行変換の関数（Pythonの関数）にコンパイルし、
+行はまとめて（バッチで）変換する。
+
+マッピングファイル:
+  {
+    "description": "説明",
+    "strip": true,                          元の値の前後の空白を除く
+    "key": ["prefecture", "municipality"],  overrides を引く元の列
+    "filter": 条件,                         条件に合う行だけ取り込む
+    "columns": {"列": ルール, ...},
+    "overrides": {"神奈川県/藤沢市": {"列": ルール, ...}},
+    "merge": {"columns": [...], "update_set": {...}, "insert_values": {...},
+              "match_where": "...", "order_by": "..."}     bulk_merge の引数
+  }
+
+ルール:
+  "列名"                                    元の列の値
+  {"from": "列名", "default": 値}           元の列の値（列がなければ default）
+  {"value": 値}                             定数
+  {"now": "%Y-%m-%d" | "iso"}               実行時刻
+  {"template": "近隣通知: {neighbor_notice}"} 元の列を埋め込んだ文字列
+  {"cases": [{"when": 条件, "then": ルール}], "else": ルール}
+  {"coalesce": [ルール, ...]}               最初の空でない値
+  {"join": [ルール, ...], "sep": ", "}      空でない値をつなぐ（すべて空なら None）
+  どのルールにも "transforms": ["strip", "empty_to_null", "nfkc", "int", "float"] と
+  "format": "あり（{}）"（値が None でなければ適用）を付けられる。
+
+条件:
+  {"列": "値"}（一致）, {"列": ["値", ...]}（いずれか）, {"列": true}（空でない）, {"列": false}（空）
+  複数の列は AND。{"any": [条件, ...]}, {"all": [条件, ...]}, {"not": 条件}
+
+使い方:
+  python3 scripts/import_mapping.py collected_data scripts/data_collection_template.csv
+  python3 scripts/import_mapping.py <マッピング.json> <CSV> --dry-run     変更内容を JSONL に書き出すだけ
+  python3 scripts/import_mapping.py collected_data <CSV> --dry-run --changes changes.jsonl
+  python3 scripts/import_mapping.py additional_regulations <CSV> --db <SQLite>
+  python3 scripts/import_mapping.py collected_data <CSV> --defer-indexes  インデックスを後から作る
+"""
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
+from string import Formatter
+
+from bulk_import import DEFAULT_MATCH_WHERE, DEFAULT_ORDER_BY, TABLE, bulk_merge
+from change_set import compute_change_set, default_path, print_summary
+from d1_client import D1Error, deferred_indexes, local_connection
+from note_merge import register_functions
+
+MAPPINGS_DIR = Path(__file__).resolve().parent / "mappings"
+DEFAULT_BATCH_SIZE = 5000
+OVERRIDE_KEY_SEPARATOR = '/'
+
+# --defer-indexes でも残すインデックス（bulk_merge が更新対象の解決に使う）
+DEFER_KEEP_INDEXES = ('idx_building_regs_prefecture_city',)
+
+_EMPTY = (None, '')
+
+
+class MappingError(Exception):
+    """マッピングファイルの誤り"""
+
+
+def _nfkc(value):
+    return unicodedata.normalize('NFKC', value) if isinstance(value, str) else value
+
+
+def _strip(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _number(cast):
+    def convert(value):
+        if value in _EMPTY:
+            return None
+        try:
+            return cast(_nfkc(value).replace(',', '') if isinstance(value, str) else value)
+        except ValueError:
+            return None
+    return convert
+
+
+def _join(sep, values):
+    parts = [str(v) for v in values if v not in _EMPTY]
+    return sep.join(parts) if parts else None
+
+
+TRANSFORMS = {
+    'strip': _strip,
+    'empty_to_null': lambda value: None if value in _EMPTY else value,
+    'nfkc': _nfkc,
+    'int': _number(int),
+    'float': _number(float),
+}
+
+
+class _Compiler:
+    """
+    ルールをPythonの式に変換し、列ごとの式をまとめた変換関数を作る
+
+    行ごとにルールの木をたどらないよう、マッピング全体を1つの dict 式の関数にする。
+    定数・列名などの値は名前空間の変数として渡す（生成するコードに値を埋め込まない）。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.namespace = {'_EMPTY': _EMPTY, '_join': _join}
+        self.counter = 0
+
+    def _const(self, value):
+        self.counter += 1
+        name = f"_k{self.counter}"
+        self.namespace[name] = value
+        return name
+
+    def _temp(self):
+        self.counter += 1
+        return f"_v{self.counter}"
+
+    def condition(self, cond, where):
+        if not isinstance(cond, dict) or not cond:
+            raise MappingError(f"{where}: 条件は dict で指定してください: {cond!r}")
+        tests = []
+        for column, expected in cond.items():
+            if column in ('any', 'all'):
+                subs = [self.condition(c, where) for c in expected]
+                tests.append('(' + (' or ' if column == 'any' else ' and ').join(subs) + ')')
+                continue
+            if column == 'not':
+                tests.append(f"(not {self.condition(expected, where)})")
+                continue
+            value = f"get({self._const(column)})"
+            if expected is True:
+                tests.append(f"({value} not in _EMPTY)")
+            elif expected is False:
+                tests.append(f"({value} in _EMPTY)")
+            elif isinstance(expected, list):
+                tests.append(f"({value} in {self._const(frozenset(expected))})")
+            else:
+                tests.append(f"({value} == {self._const(expected)})")
+        return '(' + ' and '.join(tests) + ')'
+
+    def _template(self, template, where):
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if literal:
+                parts.append(self._const(literal))
+            if field is None:
+                continue
+            if not field or spec or conversion:
+                raise MappingError(f"{where}: テンプレートには {{列名}} だけを書いてください: {template!r}")
+            v = self._temp()
+            parts.append(f"('' if ({v} := get({self._const(field)})) is None else str({v}))")
+        return '(' + ' + '.join(parts) + ')' if parts else self._const('')
+
+    def _base(self, rule, where):
+        if isinstance(rule, str):
+            return f"get({self._const(rule)})"
+        if not isinstance(rule, dict):
+            raise MappingError(f"{where}: ルールは列名か dict で指定してください: {rule!r}")
+
+        if 'from' in rule:
+            column = self._const(rule['from'])
+            default = rule.get('default')
+            if isinstance(default, dict):
+                return f"(row[{column}] if {column} in row else {self.rule(default, where)})"
+            return f"get({column}, {self._const(default)})"
+        if 'value' in rule:
+            return self._const(rule['value'])
+        if 'now' in rule:
+            now = datetime.now()
+            return self._const(now.isoformat() if rule['now'] == 'iso' else now.strftime(rule['now']))
+        if 'template' in rule:
+            return self._template(rule['template'], where)
+        if 'cases' in rule:
+            expr = self.rule(rule['else'], where) if 'else' in rule else 'None'
+            for case in reversed(rule['cases']):
+                expr = f"({self.rule(case['then'], where)} if {self.condition(case['when'], where)} else {expr})"
+            return expr
+        if 'coalesce' in rule:
+            expr = 'None'
+            for r in reversed(rule['coalesce']):
+                v = self._temp()
+                expr = f"({v} if ({v} := {self.rule(r, where)}) not in _EMPTY else {expr})"
+            return expr
+        if 'join' in rule:
+            items = ', '.join(self.rule(r, where) for r in rule['join'])
+            return f"_join({self._const(rule.get('sep', ', '))}, ({items},))"
+        raise MappingError(f"{where}: 不明なルール: {rule!r}")
+
+    def rule(self, rule, where='rule'):
+        """ルールを式（row を参照するPythonの式）にする"""
+        expr = self._base(rule, where)
+        if not isinstance(rule, dict):
+            return expr
+        for name in rule.get('transforms', []):
+            if name not in TRANSFORMS:
+                raise MappingError(f"{where}: 不明な変換: {name}（{', '.join(TRANSFORMS)}）")
+            v = self._temp()
+            if name == 'strip':
+                expr = f"({v}.strip() if isinstance(({v} := {expr}), str) else {v})"
+            elif name == 'empty_to_null':
+                expr = f"(None if ({v} := {expr}) in _EMPTY else {v})"
+            else:
+                expr = f"{self._const(TRANSFORMS[name])}({expr})"
+        if 'format' in rule:
+            v = self._temp()
+            expr = f"(None if ({v} := {expr}) is None else {self._const(rule['format'])}.format({v}))"
+        return expr
+
+    def function(self, columns, strip=False):
+        """{列: ルール} から 行(dict) → 変換後の行(dict) の関数を作る"""
+        items = ',\n        '.join(f"{self._const(c)}: {self.rule(r, f'{self.name}.{c}')}" for c, r in columns.items())
+        lines = ["def transform(row):"]
+        if strip:
+            lines.append("    row = {k: v.strip() if isinstance(v, str) else v for k, v in row.items()}")
+        lines.append("    get = row.get")
+        lines.append(f"    return {{\n        {items},\n    }}")
+        source = '\n'.join(lines) + '\n'
+        namespace = dict(self.namespace)
+        exec(compile(source, f"<mapping {self.name}>", 'exec'), namespace)
+        transform = namespace['transform']
+        transform.source = source
+        return transform
+
+    def predicate(self, cond):
+        expr = self.condition(cond, f"{self.name}.filter")
+        namespace = dict(self.namespace)
+        exec(compile(f"def accepts(row):\n    get = row.get\n    return {expr}\n", f"<mapping {self.name}>", 'exec'), namespace)
+        return namespace['accepts']
+
+
+def compile_rule(rule, where='rule'):
+    """ルール1つを 行(dict) → 値 の関数にコンパイルする"""
+    compiler = _Compiler(where)
+    expr = compiler.rule(rule, where)
+    namespace = dict(compiler.namespace)
+    exec(compile(f"def evaluate(row):\n    get = row.get\n    return {expr}\n", f"<rule {where}>", 'exec'), namespace)
+    return namespace['evaluate']
+
+
+class Mapping:
+    """コンパイル済みのマッピング"""
+
+    def __init__(self, spec, name='mapping'):
+        self.name = name
+        self.description = spec.get('description', '')
+        self.key = list(spec.get('key', []))
+        self.merge_options = dict(spec.get('merge', {}))
+        if 'columns' not in spec:
+            raise MappingError(f"{name}: columns がありません")
+
+        compiler = _Compiler(name)
+        strip = spec.get('strip', False)
+        self.filter = compiler.predicate(spec['filter']) if 'filter' in spec else None
+        self.columns = list(spec['columns'])
+        self._default = compiler.function(spec['columns'], strip)
+        # 自治体ごとの上書きは、既定のルールと合わせた変換関数として先に作っておく
+        self._overrides = {}
+        for key, rules in spec.get('overrides', {}).items():
+            parts = tuple(key.split(OVERRIDE_KEY_SEPARATOR))
+            if len(parts) != len(self.key):
+                raise MappingError(f"{name}.overrides: キー {key!r} は "
+                                   f"{OVERRIDE_KEY_SEPARATOR.join(self.key)} の形で指定してください")
+            columns = dict(spec['columns'])
+            columns.update(rules)
+            self.columns += [c for c in rules if c not in self.columns]
+            self._overrides[parts] = compiler.function(columns, strip)
+
+    def accepts(self, row):
+        return self.filter is None or self.filter(row)
+
+    def transform(self, row):
+        """1行を変換する（filter は見ない）"""
+        if self._overrides:
+            return self._overrides.get(tuple(row.get(k) for k in self.key), self._default)(row)
+        return self._default(row)
+
+    def batches(self, rows, batch_size=DEFAULT_BATCH_SIZE):
+        """filter に合う行を変換し、batch_size 行ずつのリストで返す"""
+        rows = iter(rows)
+        accepts = self.filter
+        if self._overrides:
+            transform = self.transform
+        else:
+            transform = self._default
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                return
+            if accepts is not None:
+                chunk = [row for row in chunk if accepts(row)]
+            yield [transform(row) for row in chunk]
+
+    def transform_all(self, rows, batch_size=DEFAULT_BATCH_SIZE):
+        return list(chain.from_iterable(self.batches(rows, batch_size)))
+
+    def _merge_args(self):
+        options = self.merge_options
+        if 'update_set' not in options:
+            raise MappingError(f"{self.name}: merge.update_set がありません")
+        columns = options.get('columns') or [c for c in self.columns if c not in ('prefecture', 'city')]
+        return (columns, options['update_set'], options.get('insert_values'),
+                options.get('match_where', DEFAULT_MATCH_WHERE), options.get('order_by', DEFAULT_ORDER_BY))
+
+    def merge(self, conn, mapped_rows):
+        """変換済みの行を merge の設定で bulk_merge する"""
+        args = self._merge_args()
+        register_functions(conn)
+        return bulk_merge(conn, mapped_rows, *args)
+
+    def plan(self, conn, mapped_rows):
+        """merge したときの変更内容（ChangeSet）を、conn に書き込まずに計算する"""
+        return compute_change_set(conn, mapped_rows, *self._merge_args())
+
+
+def dry_run(mapping, mapped_rows, db_path=None, output=None):
+    """
+    変更内容を計算して JSONL に書き出し、要約を表示する（データベースは読むだけ）
+
+    output を省略すると .cache/changes/<マッピング名>-<日時>.jsonl
+    """
+    conn = local_connection('analysis', db_path)
+    change_set = mapping.plan(conn, mapped_rows)
+    path = change_set.write(Path(output) if output else default_path(mapping.name))
+    print_summary(change_set, path)
+    return change_set
+
+
+def mapping_path(name):
+    """マッピング名（scripts/mappings/<名前>.json）またはファイルパス"""
+    path = Path(name)
+    if path.suffix == '.json' or path.exists():
+        return path
+    return MAPPINGS_DIR / f"{name}.json"
+
+
+@lru_cache(maxsize=None)
+def _load(path, mtime_ns):
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    return Mapping(spec, Path(path).stem)
+
+
+def load_mapping(name):
+    """マッピングファイルを読み込んでコンパイルする（同じファイルは1回だけ）"""
+    path = mapping_path(name)
+    try:
+        return _load(str(path.resolve()), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        raise MappingError(f"マッピングファイルが見つかりません: {path}") from None
+    except ValueError as e:
+        raise MappingError(f"{path}: {e}") from None
+
+
+def read_csv(paths):
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="マッピングファイルに従ってCSVを building_regulations に取り込む")
+    parser.add_argument('mapping', help="マッピング名（scripts/mappings/<名前>.json）またはファイル")
+    parser.add_argument('csv', nargs='+', help="入力CSV")
+    parser.add_argument('--db', help="SQLiteファイル（省略時: ローカルD1）")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="書き込まずに変更内容（追加・更新・変更なし・スキップ）を JSONL に書き出す")
+    parser.add_argument('--changes', help="--dry-run の出力先（省略時: .cache/changes/<マッピング名>-<日時>.jsonl）")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="投入中は検索に使わないインデックスを外し、最後に作り直す")
+    args = parser.parse_args()
+
+    try:
+        mapping = load_mapping(args.mapping)
+        started = time.perf_counter()
+        rows = mapping.transform_all(read_csv(args.csv), args.batch_size)
+    except (MappingError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"🔄 {mapping.name}: {len(rows):,}行を変換（{time.perf_counter() - started:.3f}秒）")
+
+    try:
+        if args.dry_run:
+            dry_run(mapping, rows, args.db, args.changes)
+            return
+        conn = local_connection('import', args.db)
+        if args.defer_indexes:
+            with deferred_indexes(conn, TABLE, keep=DEFER_KEEP_INDEXES):
+                result = mapping.merge(conn, rows)
+        else:
+            result = mapping.merge(conn, rows)
+    except (D1Error, MappingError, sqlite3.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"📊 統合結果: 新規追加 {result.inserted}件, 更新 {result.updated}件, "
+          f"スキップ {result.skipped}件, 重複 {result.duplicates}件")
+
+
+if __name__ == '__main__':
+    main()
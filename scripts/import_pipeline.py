@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+都道府県ごとに並列化したインポートパイプライン（書き込みは1スレッド）
+
+  1. 読み込み（メインスレッド）: CSVを csv.reader で読み、都道府県ごとにチャンクにまとめる
+  2. 変換（プロセスプール）: チャンクの行を dict にしてマッピング（mappings/*.json）を適用
+  3. 書き込み（専用スレッド1本）: 上限つきキューから取り出し、batch_rows 行ずつ bulk_merge
+     （1回の bulk_merge が1トランザクション。SQLiteへの書き込みが同時に走ることはない）
+
+チャンクは投入順に書き込むため、同じ自治体の行が複数あれば従来どおり後の行が残る。
+終了時に段階ごとの処理速度とキューの深さを表示する。キュー待ち（書き込み待ち）が長ければ
+書き込み（ディスク）が、書き込みスレッドの待ちが長ければ読み込み・変換が律速。
+
+使い方:
+  python3 scripts/import_pipeline.py collected_data scripts/data_collection_template.csv
+  python3 scripts/import_pipeline.py <マッピング> <CSV...> --jobs 8 --batch-rows 50000 --progress 5
+"""
+import argparse
+import csv
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from bulk_import import ImportResult
+from d1_client import D1Error, deferred_indexes, local_connection
+from import_mapping import DEFER_KEEP_INDEXES, MappingError, TABLE, load_mapping, mapping_path
+from parallel_map import ordered_map
+
+DEFAULT_CHUNK_SIZE = 2000       # ワーカーへ渡す1チャンクの行数
+DEFAULT_BATCH_ROWS = 50000      # 1トランザクション（bulk_merge 1回）の行数
+DEFAULT_QUEUE_SIZE = 16         # 書き込み待ちのチャンク数の上限
+SHARD_COLUMN = 'prefecture'
+
+
+class StageStats:
+    """段階ごとの行数と処理時間"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.calls = 0
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class PipelineStats:
+    def __init__(self, jobs, queue_size):
+        self.jobs = jobs
+        self.queue_size = queue_size
+        self.read = StageStats('読み込み')
+        self.map = StageStats('変換')
+        self.write = StageStats('書き込み')
+        self.mapped_rows = 0            # filter を通った行数
+        self.queue_samples = 0
+        self.queue_total = 0
+        self.queue_max = 0
+        self.put_wait = 0.0             # キューが一杯で待った時間（書き込みが律速）
+        self.get_wait = 0.0             # 書き込みスレッドがキューの空きを待った時間（上流が律速）
+        self.elapsed = 0.0
+        self.result = ImportResult()
+
+    def sample_queue(self, depth):
+        self.queue_samples += 1
+        self.queue_total += depth
+        self.queue_max = max(self.queue_max, depth)
+
+    @property
+    def queue_mean(self):
+        return self.queue_total / self.queue_samples if self.queue_samples else 0.0
+
+
+def read_chunks(paths, chunk_size=DEFAULT_CHUNK_SIZE, shard_column=SHARD_COLUMN):
+    """CSVを (ヘッダー, [行(list)]) のチャンクで返す（チャンク内は同じ都道府県）"""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                continue
+            header = tuple(header)
+            shard = header.index(shard_column) if shard_column in header else None
+            buffers = {}
+            for record in reader:
+                if not record:
+                    continue
+                key = record[shard] if shard is not None and shard < len(record) else None
+                buffer = buffers.setdefault(key, [])
+                buffer.append(record)
+                if len(buffer) >= chunk_size:
+                    yield header, buffer
+                    buffers[key] = []
+            for buffer in buffers.values():
+                if buffer:
+                    yield header, buffer
+
+
+def map_chunk(mapping_file, header, records):
+    """ワーカー側: チャンクの行を変換して (変換後の行, 入力行数, 秒数) を返す"""
+    mapping = load_mapping(mapping_file)    # プロセスごとに1回だけコンパイル
+    started = time.perf_counter()
+    rows = mapping.transform_all(dict(zip(header, record)) for record in records)
+    return rows, len(records), time.perf_counter() - started
+
+
+class _Writer(threading.Thread):
+    """キューから変換済みの行を取り出し、batch_rows 行ずつ1トランザクションで書き込む"""
+
+    def __init__(self, mapping, db_path, stats, work_queue, batch_rows, defer_indexes):
+        super().__init__(name='import-writer', daemon=True)
+        self.mapping = mapping
+        self.db_path = db_path
+        self.stats = stats
+        self.queue = work_queue
+        self.batch_rows = batch_rows
+        self.defer_indexes = defer_indexes
+        self.error = None
+        self.finished = False   # 終了の印（None）を受け取った
+
+    def _flush(self, conn, batch):
+        started = time.perf_counter()
+        result = self.mapping.merge(conn, batch)
+        stats = self.stats
+        stats.write.seconds += time.perf_counter() - started
+        stats.write.rows += len(batch)
+        stats.write.calls += 1
+        for name in ('staged', 'inserted', 'updated', 'skipped', 'duplicates'):
+            setattr(stats.result, name, getattr(stats.result, name) + getattr(result, name))
+
+    def _drain(self, conn):
+        batch = []
+        while True:
+            started = time.perf_counter()
+            rows = self.queue.get()
+            self.stats.get_wait += time.perf_counter() - started
+            if rows is None:
+                self.finished = True
+                break
+            if self.error is not None:
+                continue                    # 失敗後は読み捨てて上流を止めない
+            batch.extend(rows)
+            if len(batch) >= self.batch_rows:
+                self._flush(conn, batch)
+                batch = []
+        if batch and self.error is None:
+            self._flush(conn, batch)
+
+    def run(self):
+        try:
+            conn = local_connection('import', self.db_path)
+            if self.defer_indexes:
+                with deferred_indexes(conn, TABLE, keep=DEFER_KEEP_INDEXES):
+                    self._drain(conn)
+            else:
+                self._drain(conn)
+        except BaseException as e:   # メインスレッドで再送出する
+            self.error = e
+            while not self.finished:
+                self.finished = self.queue.get() is None
+
+
+def run_pipeline(mapping_name, paths, db_path=None, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 batch_rows=DEFAULT_BATCH_ROWS, queue_size=DEFAULT_QUEUE_SIZE, shard_column=SHARD_COLUMN,
+                 defer_indexes=False, progress=None):
+    """
+    CSVを読み込み・変換・書き込みの段階に分けて取り込む
+
+    Args:
+        mapping_name: マッピング名（scripts/mappings/<名前>.json）またはファイル
+        paths: 入力CSV
+        db_path: SQLiteファイル（省略時: ローカルD1）
+        jobs: 変換のプロセス数（0 または None なら全コア）
+        progress: 進捗を表示する間隔（秒）。None なら表示しない
+
+    Returns:
+        PipelineStats（result に bulk_merge の件数の合計）
+    """
+    jobs = jobs or os.cpu_count() or 1
+    mapping = load_mapping(mapping_name)
+    mapping_file = str(mapping_path(mapping_name).resolve())
+    stats = PipelineStats(jobs, queue_size)
+    work_queue = queue.Queue(maxsize=queue_size)
+    writer = _Writer(mapping, db_path, stats, work_queue, batch_rows, defer_indexes)
+
+    started = time.perf_counter()
+    last_report = started
+    writer.start()
+    try:
+        chunks = _timed(read_chunks(paths, chunk_size, shard_column), stats.read)
+        arguments = ((mapping_file, header, records) for header, records in chunks)
+        for rows, count, seconds in ordered_map(map_chunk, arguments, jobs):
+            stats.map.rows += count
+            stats.map.seconds += seconds
+            stats.map.calls += 1
+            stats.mapped_rows += len(rows)
+            if writer.error is not None:
+                break
+            stats.sample_queue(work_queue.qsize())
+            put_started = time.perf_counter()
+            work_queue.put(rows)
+            stats.put_wait += time.perf_counter() - put_started
+            if progress and time.perf_counter() - last_report >= progress:
+                last_report = time.perf_counter()
+                print(f"   ⏳ 読込 {stats.read.rows:,} / 変換 {stats.map.rows:,} / 書込 {stats.write.rows:,}行 "
+                      f"（キュー {work_queue.qsize()}/{queue_size}）")
+    finally:
+        work_queue.put(None)
+        writer.join()
+        stats.elapsed = time.perf_counter() - started
+    if writer.error is not None:
+        raise writer.error
+    return stats
+
+
+def _timed(iterator, stage):
+    """イテレータの next() にかかった時間と行数を stage に記録する"""
+    while True:
+        started = time.perf_counter()
+        try:
+            header, records = next(iterator)
+        except StopIteration:
+            stage.seconds += time.perf_counter() - started
+            return
+        stage.seconds += time.perf_counter() - started
+        stage.rows += len(records)
+        stage.calls += 1
+        yield header, records
+
+
+def print_stats(stats):
+    """段階ごとの処理速度とキューの深さを表示"""
+    elapsed = stats.elapsed or 1e-9
+    print(f"\n⏱️ パイプライン: {stats.read.rows:,}行 {stats.elapsed:.2f}秒"
+          f"（{stats.read.rows / elapsed:,.0f}行/秒, 変換プロセス {stats.jobs}）")
+    print(f"   {stats.read.name}: {stats.read.rate:,.0f}行/秒（{stats.read.seconds:.2f}秒, {stats.read.calls}チャンク）")
+    per_worker = stats.map.rate
+    print(f"   {stats.map.name}: {per_worker:,.0f}行/秒/プロセス（合計 {stats.map.seconds:.2f}秒, "
+          f"取り込み対象 {stats.mapped_rows:,}行）")
+    print(f"   {stats.write.name}: {stats.write.rate:,.0f}行/秒（{stats.write.seconds:.2f}秒, "
+          f"{stats.write.calls}トランザクション）")
+    print(f"   キュー: 最大 {stats.queue_max}/{stats.queue_size}, 平均 {stats.queue_mean:.1f}, "
+          f"書き込み待ち {stats.put_wait:.2f}秒, 書き込みスレッドの入力待ち {stats.get_wait:.2f}秒")
+    if stats.put_wait > stats.get_wait:
+        print("   → 書き込みが律速")
+    else:
+        print("   → 読み込み・変換が律速")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSVを並列に変換し、1スレッドで building_regulations に書き込む")
+    parser.add_argument('mapping', help="マッピング名（scripts/mappings/<名前>.json）またはファイル")
+    parser.add_argument('csv', nargs='+', help="入力CSV")
+    parser.add_argument('--db', help="SQLiteファイル（省略時: ローカルD1）")
+    parser.add_argument('--jobs', type=int, default=0, help="変換のプロセス数（0: 全コア）")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help="1トランザクションの行数")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--shard-column', default=SHARD_COLUMN, help="チャンクを分ける列")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="投入中は検索に使わないインデックスを外し、最後に作り直す")
+    parser.add_argument('--progress', type=float, default=None, help="進捗を表示する間隔（秒）")
+    args = parser.parse_args()
+
+    missing = [p for p in args.csv if not os.path.exists(p)]
+    if missing:
+        print(f"❌ CSVファイルが見つかりません: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        stats = run_pipeline(args.mapping, args.csv, args.db, args.jobs, args.chunk_size, args.batch_rows,
+                             args.queue_size, args.shard_column, args.defer_indexes, args.progress)
+    except (D1Error, MappingError, sqlite3.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    result = stats.result
+    print(f"📊 統合結果: 新規追加 {result.inserted}件, 更新 {result.updated}件, "
+          f"スキップ {result.skipped}件, 重複 {result.duplicates}件")
+    print_stats(stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+日本語の数値・単位表記の正規化
+
+CSVのセル（'25㎡以上'、'２．５ｍ'、'三十戸以上（定住型を除く）'、'25〜30平米' など）から
+数値・範囲・以上/未満などの条件・単位を取り出す。
+
+  - 全角数字・全角記号は NFKC で半角に揃える（㎡ → m2 も NFKC で変換される）
+  - 単位・条件の直前の漢数字（三十、二百五十 など）は算用数字に変換
+  - 括弧内の注記は数値として読まず、note に入れる
+  - 同じ文字列は LRU キャッシュから返す
+
+使い方:
+  from jp_numeric import parse_quantity, quantity_value
+  parse_quantity('25㎡以上（定住型以外の最低）', 'm2')
+  # Quantity(value=25, upper=None, unit='m2', bound='gte', note='定住型以外の最低')
+  quantity_value('三十戸以上', '戸')   # 30
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+# value: 数値（範囲なら下限）, upper: 範囲の上限, unit: 単位, bound: 条件, note: 括弧内の注記
+Quantity = namedtuple('Quantity', ['value', 'upper', 'unit', 'bound', 'note'])
+
+CACHE_SIZE = 65536
+
+# 正規化後の単位と表記ゆれ（NFKC 後の表記）
+UNIT_ALIASES = {
+    'm2': ('m2', 'm^2', '平方メートル', '平方m', '平米'),
+    'm': ('m', 'メートル'),
+    '戸': ('戸',),
+    '台': ('台',),
+    '階': ('階建て', '階建', '階'),
+    '%': ('%', 'パーセント'),
+    '日': ('日',),
+}
+
+# 条件: gte（以上）, gt（超）, lte（以下）, lt（未満）, range（A〜B）
+BOUNDS = {
+    '以上': 'gte',
+    '以下': 'lte',
+    'まで': 'lte',
+    '未満': 'lt',
+    '超': 'gt',
+    '超え': 'gt',
+    '超える': 'gt',
+    'を超える': 'gt',
+}
+
+KANJI_DIGITS = {'〇': 0, '零': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+KANJI_POWERS = {'十': 10, '百': 100, '千': 1000}
+
+_UNIT_OF = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+_UNIT_RE = '|'.join(re.escape(a) for a in sorted(_UNIT_OF, key=len, reverse=True))
+_BOUND_RE = '|'.join(re.escape(b) for b in sorted(BOUNDS, key=len, reverse=True))
+_NUMBER_RE = r'\d+(?:\.\d+)?'
+_RANGE_RE = r'~|〜|から'
+
+NOTE_PATTERN = re.compile(r'\(([^()]*)\)')
+THOUSANDS_PATTERN = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+KANJI_PATTERN = re.compile(
+    rf'[〇零一二三四五六七八九十百千万]+(?=\s*(?:{_UNIT_RE}|{_BOUND_RE}|{_RANGE_RE}))')
+QUANTITY_PATTERN = re.compile(
+    rf'(?P<value>{_NUMBER_RE})\s*(?P<unit>{_UNIT_RE})?'
+    rf'(?:\s*(?:{_RANGE_RE})\s*(?P<upper>{_NUMBER_RE})\s*(?P<upper_unit>{_UNIT_RE})?)?'
+    rf'\s*(?P<bound>{_BOUND_RE})?'
+)
+
+
+def kanji_to_int(text):
+    """漢数字（三十、二百五十、一万二千、二〇 など）を整数に変換"""
+    total = 0       # 万の位より上
+    section = 0     # 万未満
+    digits = None   # 位取りのない数字の並び（二〇 → 20）
+    for ch in text:
+        if ch in KANJI_DIGITS:
+            digits = KANJI_DIGITS[ch] if digits is None else digits * 10 + KANJI_DIGITS[ch]
+        elif ch in KANJI_POWERS:
+            section += (1 if digits is None else digits) * KANJI_POWERS[ch]
+            digits = None
+        elif ch == '万':
+            total += ((section + (digits or 0)) or 1) * 10000
+            section = 0
+            digits = None
+    return total + section + (digits or 0)
+
+
+def _number(text):
+    return float(text) if '.' in text else int(text)
+
+
+def normalize_text(text):
+    """全角→半角、桁区切りの除去、単位・条件の前の漢数字を算用数字に"""
+    text = unicodedata.normalize('NFKC', text)
+    text = THOUSANDS_PATTERN.sub('', text)
+    return KANJI_PATTERN.sub(lambda m: str(kanji_to_int(m.group())), text)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_quantities(text):
+    """文字列中の数量を出現順にすべて返す（括弧内は除く）"""
+    if not text:
+        return ()
+    text = normalize_text(str(text))
+    notes = [note.strip() for note in NOTE_PATTERN.findall(text) if note.strip()]
+    note = ' '.join(notes) or None
+    text = NOTE_PATTERN.sub(' ', text)
+
+    quantities = []
+    for m in QUANTITY_PATTERN.finditer(text):
+        unit = m.group('unit') or m.group('upper_unit')
+        upper = m.group('upper')
+        if upper is not None:
+            bound = 'range'
+        else:
+            bound = BOUNDS.get(m.group('bound'))
+        quantities.append(Quantity(
+            value=_number(m.group('value')),
+            upper=_number(upper) if upper is not None else None,
+            unit=_UNIT_OF.get(unit),
+            bound=bound,
+            note=note,
+        ))
+    return tuple(quantities)
+
+
+def parse_quantity(text, unit=None):
+    """
+    最初の数量を返す（なければ None）
+
+    unit を指定すると、その単位の最初の数量を返す。その単位の数量がなければ
+    単位のない最初の数量を unit の数量として返す（'25' を ㎡ の列から読む場合など）。
+    """
+    quantities = parse_quantities(text)
+    if unit is None:
+        return quantities[0] if quantities else None
+    for quantity in quantities:
+        if quantity.unit == unit:
+            return quantity
+    for quantity in quantities:
+        if quantity.unit is None:
+            return quantity._replace(unit=unit)
+    return None
+
+
+def quantity_value(text, unit=None):
+    """parse_quantity の数値だけを返す（なければ None）"""
+    quantity = parse_quantity(text, unit)
+    return quantity.value if quantity else None
+
+
+def parse_column(values, unit=None):
+    """列の全セルを parse_quantity する（同じ値は1回だけ解析）"""
+    seen = {}
+    results = []
+    for value in values:
+        if value not in seen:
+            seen[value] = parse_quantity(value, unit)
+        results.append(seen[value])
+    return results
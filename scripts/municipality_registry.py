@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+全国地方公共団体コードによる自治体レジストリ
+
+自治体は6桁の全国地方公共団体コード（5桁の本体 + 検査数字）で識別する。
+  - 都道府県: 130001（東京都）
+  - 政令指定都市と区: 141003（横浜市）→ 141011（横浜市鶴見区）
+  - 特別区・市・町・村: 131181（荒川区）
+
+データは scripts/municipality_codes.csv（code, name, parent, variants, domains）。
+読み込み時に検査数字・親の存在・同じ都道府県内の名前の重複を確認する。
+全国の1,741自治体（+ 政令指定都市の区）まで行を足すだけで広げられる。
+
+格納は配列（array）で、
+  - コード → 位置: 5桁の本体を添字にした配列で直接引く
+  - 名前 → 位置: (都道府県の位置, 名前) の dict
+どちらも O(1)。名前は NFKC で揃え、ヶ/ケ/ヵ の違いは同じ名前として扱う。
+カバレッジの集計や突き合わせはコード（int）の集合で行う。
+
+使い方:
+  python3 scripts/municipality_registry.py 131181 横浜市 東京都港区   コード・名前から引く
+  python3 scripts/municipality_registry.py --list 神奈川県             都道府県内の一覧
+"""
+import argparse
+import csv
+import sys
+import unicodedata
+from array import array
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+
+DATA_PATH = Path(__file__).resolve().parent / "municipality_codes.csv"
+
+KINDS = ('prefecture', 'designated_city', 'city', 'special_ward', 'ward', 'town', 'village')
+PREFECTURE, DESIGNATED_CITY, CITY, SPECIAL_WARD, WARD, TOWN, VILLAGE = range(len(KINDS))
+
+# 市区町村として数える種類（政令指定都市の区は市に含める）
+MUNICIPALITY_KINDS = ('designated_city', 'city', 'special_ward', 'town', 'village')
+
+# 5桁の本体（01000〜47999）を添字にする
+SLOT_COUNT = 48000
+
+CHECK_WEIGHTS = (6, 5, 4, 3, 2)
+
+# 同じ字として扱う表記ゆれ
+KE_VARIANTS = 'ヶケヵ'
+
+VARIANT_SEPARATOR = '|'
+
+
+def check_digit(body):
+    """5桁の本体の検査数字（11 - 重み付き和 % 11 の1の位。10 → 0, 11 → 1）"""
+    total = sum(int(d) * w for d, w in zip(f"{body:05d}", CHECK_WEIGHTS))
+    return (11 - total % 11) % 10
+
+
+def make_code(body):
+    """5桁の本体から6桁のコード"""
+    return body * 10 + check_digit(body)
+
+
+def is_valid_code(code):
+    return 10000 <= code < SLOT_COUNT * 10 and check_digit(code // 10) == code % 10
+
+
+def normalize_name(name):
+    return unicodedata.normalize('NFKC', name).strip()
+
+
+def name_variants(name):
+    """ヶ/ケ/ヵ を入れ替えた表記（元の表記を含む）"""
+    positions = [i for i, ch in enumerate(name) if ch in KE_VARIANTS]
+    if not positions:
+        return [name]
+    variants = []
+    for chars in product(KE_VARIANTS, repeat=len(positions)):
+        text = list(name)
+        for i, ch in zip(positions, chars):
+            text[i] = ch
+        variants.append(''.join(text))
+    return variants
+
+
+class MunicipalityRegistry:
+    """6桁のコードで引く自治体の一覧（配列で格納）"""
+
+    def __init__(self, records):
+        """records: (コード, 名前, 親のコード or None, [別表記], [ドメイン]) の並び（コード順でなくてよい）"""
+        records = sorted(records)
+        self.codes = array('l')
+        self.names = []
+        self.kinds = array('b')
+        self.parents = array('h')       # 政令指定都市の位置（区のみ、それ以外は -1）
+        self.prefectures = array('h')   # 都道府県の位置
+        self.domains = []
+        self._slots = array('h', [-1]) * SLOT_COUNT
+        self._by_name = {}              # (都道府県の位置, 名前) → 位置
+        self._unique = {}               # 名前 → 位置（全国で重複する名前は -1）
+        self._children = {}             # 政令指定都市の位置 → [区の位置]
+
+        for code, name, parent, variants, domains in records:
+            if not is_valid_code(code):
+                raise ValueError(f"不正な地方公共団体コード（検査数字）: {code:06d} {name}")
+            body = code // 10
+            if self._slots[body] != -1:
+                raise ValueError(f"コードが重複しています: {code:06d}")
+            position = len(self.codes)
+            self._slots[body] = position
+            self.codes.append(code)
+            self.names.append(name)
+            self.domains.append(tuple(domains))
+
+            prefecture = self._slots[body // 1000 * 1000]
+            if prefecture == -1:
+                raise ValueError(f"{code:06d} {name}: 都道府県がありません")
+            self.prefectures.append(prefecture)
+
+            if parent:
+                parent_position = self.position(parent)
+                if parent_position == -1 or self.prefectures[parent_position] != prefecture:
+                    raise ValueError(f"{code:06d} {name}: 親 {parent:06d} がありません")
+                self._children.setdefault(parent_position, []).append(position)
+                self.kinds[parent_position] = DESIGNATED_CITY
+                self.parents.append(parent_position)
+                self.kinds.append(WARD)
+            else:
+                self.parents.append(-1)
+                self.kinds.append(self._kind(body, name))
+
+            for text in [name, *variants]:
+                for variant in name_variants(normalize_name(text)):
+                    key = (prefecture, variant)
+                    if self._by_name.get(key, position) != position:
+                        raise ValueError(f"{code:06d} {name}: 名前 {variant} が重複しています")
+                    self._by_name[key] = position
+                    self._unique[variant] = position if self._unique.get(variant, position) == position else -1
+
+    @staticmethod
+    def _kind(body, name):
+        if body % 1000 == 0:
+            return PREFECTURE
+        if body // 1000 == 13 and 100 < body % 1000 < 200:
+            return SPECIAL_WARD
+        if name.endswith('町'):
+            return TOWN
+        if name.endswith('村'):
+            return VILLAGE
+        return CITY
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return self.position(code) != -1
+
+    def __iter__(self):
+        return iter(self.codes)
+
+    def position(self, code):
+        """コードの位置（なければ -1）"""
+        code = int(code)
+        if not is_valid_code(code):
+            return -1
+        return self._slots[code // 10]
+
+    def _position(self, code):
+        position = self.position(code)
+        if position == -1:
+            raise KeyError(code)
+        return position
+
+    def _prefecture_position(self, prefecture):
+        if isinstance(prefecture, int):
+            return self.position(prefecture)
+        position = self._unique.get(normalize_name(prefecture), -1)
+        if position == -1 or self.kinds[position] != PREFECTURE:
+            return -1
+        return position
+
+    # --- 名前 → コード ---
+
+    def code(self, prefecture, name):
+        """都道府県（名前またはコード）と自治体名からコード（なければ None）"""
+        prefecture = self._prefecture_position(prefecture)
+        position = self._by_name.get((prefecture, normalize_name(name)), -1)
+        return self.codes[position] if position != -1 else None
+
+    def require(self, prefecture, name):
+        """code() と同じ（なければ KeyError）"""
+        code = self.code(prefecture, name)
+        if code is None:
+            raise KeyError(f"{prefecture} {name}")
+        return code
+
+    def lookup(self, name):
+        """
+        名前だけからコード（なければ None）
+
+        '東京都港区' のように都道府県名が付いていればその都道府県で、
+        付いていなければ全国で1つだけの名前のときに引ける。
+        """
+        name = normalize_name(name)
+        for length in (3, 4):
+            prefecture = self._prefecture_position(name[:length])
+            if prefecture != -1 and len(name) > length:
+                position = self._by_name.get((prefecture, name[length:]), -1)
+                if position != -1:
+                    return self.codes[position]
+        position = self._unique.get(name, -1)
+        return self.codes[position] if position != -1 else None
+
+    def spellings(self):
+        """登録されている表記（別表記・ヶ/ケ/ヵ の違いを含む）とコードの組"""
+        for (_, name), position in self._by_name.items():
+            yield name, self.codes[position]
+
+    def resolve(self, pairs):
+        """
+        (都道府県, 自治体名) の並びをコードにする
+
+        Returns:
+            ({コード}, [引けなかった (都道府県, 自治体名)])
+        """
+        codes = set()
+        unknown = []
+        for prefecture, name in pairs:
+            code = self.code(prefecture, name)
+            if code is None:
+                unknown.append((prefecture, name))
+            else:
+                codes.add(code)
+        return codes, unknown
+
+    # --- コード → 属性 ---
+
+    def name(self, code):
+        return self.names[self._position(code)]
+
+    def kind(self, code):
+        return KINDS[self.kinds[self._position(code)]]
+
+    def prefecture(self, code):
+        """都道府県のコード"""
+        return self.codes[self.prefectures[self._position(code)]]
+
+    def prefecture_name(self, code):
+        return self.names[self.prefectures[self._position(code)]]
+
+    def parent(self, code):
+        """政令指定都市の区なら市のコード、それ以外は None"""
+        parent = self.parents[self._position(code)]
+        return self.codes[parent] if parent != -1 else None
+
+    def municipality(self, code):
+        """市区町村単位のコード（政令指定都市の区は市に寄せる）"""
+        position = self._position(code)
+        parent = self.parents[position]
+        return self.codes[parent if parent != -1 else position]
+
+    def wards(self, code):
+        """政令指定都市の区のコード"""
+        return [self.codes[p] for p in self._children.get(self._position(code), [])]
+
+    def domain_list(self, code):
+        """公式ドメイン（区は市のドメイン）"""
+        position = self._position(code)
+        if not self.domains[position] and self.parents[position] != -1:
+            position = self.parents[position]
+        return self.domains[position]
+
+    def domain(self, code):
+        """主な公式ドメイン（なければ None）"""
+        domains = self.domain_list(code)
+        return domains[0] if domains else None
+
+    def label(self, code):
+        """'東京都荒川区' の形の表示名"""
+        position = self._position(code)
+        if self.kinds[position] == PREFECTURE:
+            return self.names[position]
+        return self.names[self.prefectures[position]] + self.names[position]
+
+    # --- 一覧 ---
+
+    def select(self, prefectures=None, kinds=MUNICIPALITY_KINDS):
+        """都道府県（名前またはコード）と種類で絞ったコードの一覧（コード順）"""
+        wanted = array('b', [0]) * len(KINDS)
+        for kind in kinds:
+            wanted[KINDS.index(kind)] = 1
+        if prefectures is None:
+            return [code for code, kind in zip(self.codes, self.kinds) if wanted[kind]]
+        positions = {self._prefecture_position(p) for p in prefectures}
+        return [code for code, kind, prefecture in zip(self.codes, self.kinds, self.prefectures)
+                if wanted[kind] and prefecture in positions]
+
+
+def read_records(path=DATA_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield (
+                int(row['code']),
+                row['name'],
+                int(row['parent']) if row['parent'] else None,
+                [v for v in row['variants'].split(VARIANT_SEPARATOR) if v],
+                [d for d in row['domains'].split(VARIANT_SEPARATOR) if d],
+            )
+
+
+@lru_cache(maxsize=None)
+def load_registry(path=DATA_PATH):
+    """レジストリを読み込む（同じファイルは1回だけ）"""
+    return MunicipalityRegistry(read_records(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全国地方公共団体コードで自治体を引く")
+    parser.add_argument('keys', nargs='*', help="6桁のコード、または自治体名（'東京都港区' の形も可）")
+    parser.add_argument('--list', metavar='都道府県', help="都道府県内の自治体を一覧する")
+    args = parser.parse_args()
+
+    registry = load_registry()
+    if args.list:
+        codes = registry.select([args.list], kinds=KINDS[1:])
+        if not codes:
+            print(f"❌ 都道府県が見つかりません: {args.list}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        codes = []
+        for key in args.keys:
+            code = int(key) if key.isdigit() else registry.lookup(key)
+            if code is None or code not in registry:
+                print(f"❌ 見つかりません: {key}", file=sys.stderr)
+                continue
+            codes.append(code)
+
+    for code in codes:
+        parent = registry.parent(code)
+        print(f"{code:06d}  {registry.label(code)}  {registry.kind(code)}"
+              f"{f'  親: {parent:06d}' if parent else ''}"
+              f"{f'  {registry.domain(code)}' if registry.domain(code) else ''}")
+    print(f"\n📊 {len(codes)}件 / 登録 {len(registry)}件")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+備考列（*_note）の重複しない追記
+
+インポートのたびに「既存 + 改行 + 新しい記述」を追記すると、同じ記述が繰り返し積み重なる。
+備考を行単位の区切り（セグメント）に分け、
+  - NFKC・空白の連続・末尾の句点を揃えた文字列のハッシュで同じセグメントを判定
+  - 既存のセグメントの順序はそのまま、まだないセグメントだけを後ろに追加
+する。同じデータを何度インポートしても備考は変わらない。
+
+SQLite には merge_note(既存, 新しい記述) として登録し、bulk_merge の update_set から使う。
+  register_functions(conn)
+  update_set={'building_restrictions_note': "merge_note(b.building_restrictions_note, s.building_restrictions_note)"}
+
+既に重複が積み重なった行は、1回だけ詰め直す（compact_notes）:
+  python3 scripts/note_merge.py               ローカルD1の備考列を詰め直す
+  python3 scripts/note_merge.py --dry-run     件数と削減バイト数だけ表示
+  python3 scripts/note_merge.py --db <SQLite> --columns apartment_restrictions_note
+"""
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+import unicodedata
+
+from d1_client import D1Error, local_connection
+
+TABLE = 'building_regulations'
+
+# インポートで追記される備考列
+NOTE_COLUMNS = ('apartment_restrictions_note', 'building_restrictions_note')
+
+SEGMENT_SEPARATOR = '\n'
+SPACE_PATTERN = re.compile(r'\s+')
+TRAILING_PUNCTUATION = ' 。.、,;；'
+
+
+def normalize_segment(segment):
+    """比較用の正規化（NFKC、空白の連続を1つに、前後の空白・末尾の句点を除く）"""
+    text = unicodedata.normalize('NFKC', segment)
+    return SPACE_PATTERN.sub(' ', text).strip().rstrip(TRAILING_PUNCTUATION)
+
+
+def segment_key(segment):
+    """セグメントの重複判定キー（正規化後の文字列のハッシュ、空なら None）"""
+    normalized = normalize_segment(segment)
+    if not normalized:
+        return None
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
+
+def split_segments(note):
+    """備考をセグメント（前後の空白を除いた行）に分ける"""
+    if not note:
+        return []
+    return [line.strip() for line in str(note).splitlines() if line.strip()]
+
+
+def merge_notes(existing, new):
+    """
+    既存の備考に、まだ含まれないセグメントだけを追加した備考を返す（空なら None）
+
+    既存の備考の中の重複も取り除く。new が None なら既存の備考を詰め直すだけ。
+    """
+    seen = set()
+    merged = []
+    for segment in split_segments(existing) + split_segments(new):
+        key = segment_key(segment)
+        if key is None or key in seen:
+            continue
+        seen.add(key)
+        merged.append(segment)
+    return SEGMENT_SEPARATOR.join(merged) or None
+
+
+def register_functions(conn):
+    """SQLite接続に merge_note(既存, 新しい記述) を登録"""
+    conn.create_function('merge_note', 2, merge_notes, deterministic=True)
+
+
+def merge_note_sql(column, existing='b', new='s'):
+    """bulk_merge の update_set 用のSQL式"""
+    return f"merge_note({existing}.{column}, {new}.{column})"
+
+
+def compact_notes(conn, columns=NOTE_COLUMNS, table=TABLE, dry_run=False):
+    """
+    備考列の重複セグメントを取り除く（1回だけ実行する詰め直し）
+
+    Returns:
+        {列: (詰め直した行数, 削減バイト数)}
+    """
+    register_functions(conn)
+    result = {}
+    for column in columns:
+        changed = f"{column} IS NOT NULL AND {column} IS NOT merge_note({column}, NULL)"
+        rows, saved = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST({column} AS BLOB)) "
+            f"- COALESCE(LENGTH(CAST(merge_note({column}, NULL) AS BLOB)), 0)), 0) "
+            f"FROM {table} WHERE {changed}"
+        ).fetchone()
+        if rows and not dry_run:
+            conn.execute(f"UPDATE {table} SET {column} = merge_note({column}, NULL) WHERE {changed}")
+        result[column] = (rows, saved)
+    if not dry_run:
+        conn.commit()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="備考列の重複した記述を詰め直す")
+    parser.add_argument('--db', help="SQLiteファイル（省略時: ローカルD1）")
+    parser.add_argument('--columns', nargs='+', default=list(NOTE_COLUMNS))
+    parser.add_argument('--dry-run', action='store_true', help="更新せずに件数だけ表示")
+    args = parser.parse_args()
+
+    try:
+        conn = local_connection('import', args.db)
+        result = compact_notes(conn, args.columns, dry_run=args.dry_run)
+    except (D1Error, sqlite3.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    label = "詰め直し対象" if args.dry_run else "詰め直し"
+    for column, (rows, saved) in result.items():
+        print(f"   {column}: {rows}行, {saved:,}バイト削減")
+    total_rows = sum(rows for rows, _ in result.values())
+    total_saved = sum(saved for _, saved in result.values())
+    print(f"\n🧹 {label}: {total_rows}行, {total_saved:,}バイト削減")
+
+
+if __name__ == '__main__':
+    main()
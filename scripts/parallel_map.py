@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+プロセス並列の順序付き map
+
+チャンクをワーカープロセスで処理し、投入した順に結果を返す。処理中のチャンクは jobs の2倍までに
+抑えるので、入力が大きくてもメモリは一定。jobs が1以下なら同じプロセスで順に処理する。
+
+  for result in ordered_map(chunk_sql, ((chunk,) for chunk in chunks), jobs):
+      ...
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+
+def ordered_map(func, arguments, jobs):
+    """func(*args) を arguments の順に並列実行し、投入順に結果を返す（処理中は jobs の2倍まで）"""
+    if jobs <= 1:
+        for args in arguments:
+            yield func(*args)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = []
+        for args in arguments:
+            pending.append(executor.submit(func, *args))
+            if len(pending) >= jobs * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
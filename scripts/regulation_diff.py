@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+building_regulations のローカル/本番差分エンジン（行ハッシュのMerkleツリー）
+
+行ごとの内容ハッシュをSQLite側で計算し、都道府県 → 市区町村 → 行 の順に
+ハッシュを集約して比較する。ハッシュが一致しない枝だけを下りていき、
+全行（SELECT *）をダウンロードするのは差分のあった行だけ。
+各段階のローカル/本番のクエリは d1_fetch のプールで同時に実行する。
+
+ハッシュ方式（片側ずつ選ぶ。どちらも d1_client.row_hash と同じ値になる）:
+  - udf: セッションに d1_row_hash() がある場合（ローカルD1、本番スナップショット）
+  - client: 本番D1にはユーザー定義関数がないため、ハッシュ対象の列を都道府県ごとに
+            1回だけ取得し、行ハッシュと各ノードをクライアントで計算する
+"""
+import asyncio
+import sys
+
+from d1_client import D1Error, row_hash
+from d1_fetch import as_pool, fetch_sharded
+
+TABLE = 'building_regulations'
+
+# 行を同定する自然キー（0044のUNIQUE制約と同じ列）
+KEY_COLUMNS = ('prefecture', 'city', 'district', 'chome', 'banchi_start', 'banchi_end', 'zoning_type')
+
+# 環境ごとに値が異なる列はハッシュに含めない
+EXCLUDED_COLUMNS = {'id', 'created_at', 'last_updated'}
+
+VERIFIED_WHERE = "verification_status = 'VERIFIED'"
+
+HASH_MOD_A = 2147483647
+HASH_MOD_B = 2147483629
+HASH_MASK = 0x7FFFFFFF
+
+# D1の1クエリあたりのバインド変数上限
+MAX_BOUND_PARAMS = 100
+
+
+async def table_columns(pool, table=TABLE):
+    """テーブルの列名リストを取得"""
+    return [row['name'] for row in await pool.query(f"PRAGMA table_info({table})")]
+
+
+async def supports_row_hash(pool):
+    """プールのセッションで d1_row_hash() が使えるか"""
+    cached = getattr(pool, '_supports_row_hash', None)
+    if cached is None:
+        try:
+            await pool.query("SELECT d1_row_hash('') AS h")
+            cached = True
+        except D1Error:
+            cached = False
+        pool._supports_row_hash = cached
+    return cached
+
+
+def _concat_expr(columns):
+    return " || ',' || ".join(f"quote({col})" for col in columns)
+
+
+def row_key_sql():
+    """自然キーを1つの文字列にまとめるSQL式"""
+    return _concat_expr(KEY_COLUMNS)
+
+
+def _leaf_cte(columns, where):
+    """行ハッシュ（leaf）を返すCTEを組み立てる（d1_row_hash() のあるセッション用）"""
+    key = row_key_sql()
+    content = _concat_expr(columns)
+    return (
+        f"WITH hashed AS ("
+        f"SELECT id, prefecture, city, {key} AS row_key, d1_row_hash({content}) AS h "
+        f"FROM {TABLE} WHERE {where}), "
+        f"leaf AS (SELECT id, prefecture, city, row_key, "
+        f"h & {HASH_MASK} AS ha, (h >> 31) & {HASH_MASK} AS hb FROM hashed)"
+    )
+
+
+def _node_select(group_columns):
+    cols = ', '.join(group_columns)
+    return (
+        f"SELECT {cols}, COUNT(*) AS n, SUM(ha) % {HASH_MOD_A} AS ha, SUM(hb) % {HASH_MOD_B} AS hb "
+        f"FROM leaf GROUP BY {cols}"
+    )
+
+
+def _aggregate(leaves, group):
+    """_node_select と同じ集約をクライアントで行う {group(行): (n, ha, hb)}"""
+    nodes = {}
+    for leaf in leaves:
+        key = group(leaf)
+        n, ha, hb = nodes.get(key, (0, 0, 0))
+        nodes[key] = (n + 1, ha + leaf['ha'], hb + leaf['hb'])
+    return {key: (n, ha % HASH_MOD_A, hb % HASH_MOD_B) for key, (n, ha, hb) in nodes.items()}
+
+
+def _number_leaves(rows):
+    """行ハッシュを {(row_key, 重複番号): (id, ha, hb)} にする（自然キーが重複する行はid順の番号で区別）"""
+    leaves = {}
+    seen = {}
+    for row in sorted(rows, key=lambda r: r['id']):
+        ordinal = seen.get(row['row_key'], 0)
+        seen[row['row_key']] = ordinal + 1
+        leaves[(row['row_key'], ordinal)] = (row['id'], row['ha'], row['hb'])
+    return leaves
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class MerkleSide:
+    """片側（local/remote）のハッシュツリー取得（d1_row_hash() でDB側が計算する）"""
+
+    dialect = 'udf'
+
+    def __init__(self, pool, columns, where):
+        self.pool = pool
+        self.columns = columns
+        self.where = where
+        self.rows_downloaded = 0
+
+    def _statement(self, where, params, select):
+        return f"{_leaf_cte(self.columns, where)} {select}", list(params)
+
+    async def prefecture_nodes(self):
+        rows = await self.pool.query(*self._statement(self.where, (), _node_select(['prefecture'])))
+        return {row['prefecture']: (row['n'], row['ha'], row['hb']) for row in rows}
+
+    async def city_nodes(self, prefectures):
+        # 都道府県ごとに分割して並列に取得
+        results = await self.pool.query_all([
+            self._statement(f"({self.where}) AND prefecture = ?", [pref],
+                            _node_select(['prefecture', 'city']))
+            for pref in sorted(prefectures)
+        ])
+        return {(row['prefecture'], row['city']): (row['n'], row['ha'], row['hb'])
+                for rows in results for row in rows}
+
+    async def leaves(self, cities):
+        """指定市区町村の行ハッシュ {(row_key, 重複番号): (id, ha, hb)}"""
+        statements = []
+        for chunk in _chunks(sorted(cities), MAX_BOUND_PARAMS // 2):
+            condition = ' OR '.join('(prefecture = ? AND city = ?)' for _ in chunk)
+            params = [value for pair in chunk for value in pair]
+            statements.append(self._statement(f"({self.where}) AND ({condition})", params,
+                                              "SELECT id, row_key, ha, hb FROM leaf"))
+        return _number_leaves(row for result in await self.pool.query_all(statements) for row in result)
+
+    async def fetch_rows(self, ids):
+        """差分のあった行だけ全列を取得"""
+        results = await self.pool.query_all([
+            (f"SELECT * FROM {TABLE} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            for chunk in _chunks(sorted(ids), MAX_BOUND_PARAMS)
+        ])
+        rows = {row['id']: row for result in results for row in result}
+        self.rows_downloaded += len(rows)
+        return rows
+
+
+class ClientMerkleSide(MerkleSide):
+    """
+    d1_row_hash() のない側（本番D1）のハッシュツリー
+
+    ハッシュ対象の列を都道府県ごとに並列で1回だけ取得し、d1_client.row_hash で
+    行ハッシュを計算する。都道府県・市区町村ノードは取得済みの行から集約する。
+    """
+
+    dialect = 'client'
+
+    def __init__(self, pool, columns, where):
+        super().__init__(pool, columns, where)
+        self._rows = None
+
+    async def _hashed_rows(self):
+        if self._rows is None:
+            select = (f"id, prefecture, city, {row_key_sql()} AS row_key, "
+                      f"{_concat_expr(self.columns)} AS content")
+            self._rows = []
+            for row in await fetch_sharded(self.pool, TABLE, select, self.where):
+                h = row_hash(row['content'])
+                self._rows.append({'id': row['id'], 'prefecture': row['prefecture'], 'city': row['city'],
+                                   'row_key': row['row_key'],
+                                   'ha': h & HASH_MASK, 'hb': (h >> 31) & HASH_MASK})
+        return self._rows
+
+    async def prefecture_nodes(self):
+        return _aggregate(await self._hashed_rows(), lambda row: row['prefecture'])
+
+    async def city_nodes(self, prefectures):
+        rows = [row for row in await self._hashed_rows() if row['prefecture'] in prefectures]
+        return _aggregate(rows, lambda row: (row['prefecture'], row['city']))
+
+    async def leaves(self, cities):
+        return _number_leaves(row for row in await self._hashed_rows()
+                              if (row['prefecture'], row['city']) in cities)
+
+
+def merkle_side(pool, udf, columns, where):
+    """d1_row_hash() の有無に応じたハッシュツリーの取得方法"""
+    return (MerkleSide if udf else ClientMerkleSide)(pool, columns, where)
+
+
+class RegulationDiff:
+    """差分結果"""
+
+    def __init__(self, dialect, columns):
+        self.dialect = dialect
+        self.columns = columns          # ハッシュ対象の列
+        self.shared_columns = columns   # 両DBに存在する全列
+        self.cities_only_local = set()
+        self.cities_only_remote = set()
+        self.only_local = []    # ローカルにのみ存在する行
+        self.only_remote = []   # 本番にのみ存在する行
+        self.changed = []       # (ローカル行, 本番行) 内容が異なる行
+        self.stats = {}
+
+    @property
+    def is_empty(self):
+        return not (self.only_local or self.only_remote or self.changed)
+
+
+def diff_building_regulations(local, remote, where=VERIFIED_WHERE):
+    """
+    2つのDB間で building_regulations の差分を計算
+
+    Args:
+        local: ローカル側セッション（d1_client）またはプール（d1_fetch.SessionPool）
+        remote: 本番側セッションまたはプール
+        where: 比較対象を絞り込むWHERE句（既定: VERIFIEDのみ）
+    """
+    return asyncio.run(diff_building_regulations_async(as_pool(local), as_pool(remote), where))
+
+
+async def diff_building_regulations_async(local, remote, where=VERIFIED_WHERE):
+    """
+    diff_building_regulations の非同期版（各段階でローカル/本番を同時に取得）
+
+    Args:
+        local: ローカル側プール
+        remote: 本番側プール
+        where: 比較対象を絞り込むWHERE句
+    """
+    local_columns, remote_columns, local_udf, remote_udf = await asyncio.gather(
+        table_columns(local), table_columns(remote),
+        supports_row_hash(local), supports_row_hash(remote))
+    shared_columns = [c for c in local_columns if c in set(remote_columns)]
+    columns = sorted(c for c in shared_columns if c not in EXCLUDED_COLUMNS)
+    local_side = merkle_side(local, local_udf, columns, where)
+    remote_side = merkle_side(remote, remote_udf, columns, where)
+    dialect = '/'.join(sorted({local_side.dialect, remote_side.dialect}))
+
+    diff = RegulationDiff(dialect, columns)
+    diff.shared_columns = shared_columns
+
+    # 1. 都道府県ノード
+    local_prefs, remote_prefs = await asyncio.gather(
+        local_side.prefecture_nodes(), remote_side.prefecture_nodes())
+    dirty_prefs = {p for p in set(local_prefs) | set(remote_prefs)
+                   if local_prefs.get(p) != remote_prefs.get(p)}
+
+    # 2. 市区町村ノード（差分のある都道府県のみ）
+    local_cities, remote_cities = await asyncio.gather(
+        local_side.city_nodes(dirty_prefs), remote_side.city_nodes(dirty_prefs))
+    diff.cities_only_local = set(local_cities) - set(remote_cities)
+    diff.cities_only_remote = set(remote_cities) - set(local_cities)
+    dirty_cities = {c for c in set(local_cities) | set(remote_cities)
+                    if local_cities.get(c) != remote_cities.get(c)}
+
+    # 3. 行ハッシュ（差分のある市区町村のみ）
+    local_leaves, remote_leaves = await asyncio.gather(
+        local_side.leaves(dirty_cities), remote_side.leaves(dirty_cities))
+
+    only_local_keys = [k for k in local_leaves if k not in remote_leaves]
+    only_remote_keys = [k for k in remote_leaves if k not in local_leaves]
+    changed_keys = [k for k in local_leaves
+                    if k in remote_leaves and local_leaves[k][1:] != remote_leaves[k][1:]]
+
+    # 4. 差分行のみ全列を取得
+    local_rows, remote_rows = await asyncio.gather(
+        local_side.fetch_rows([local_leaves[k][0] for k in only_local_keys + changed_keys]),
+        remote_side.fetch_rows([remote_leaves[k][0] for k in only_remote_keys + changed_keys]))
+
+    diff.only_local = [local_rows[local_leaves[k][0]] for k in sorted(only_local_keys)]
+    diff.only_remote = [remote_rows[remote_leaves[k][0]] for k in sorted(only_remote_keys)]
+    diff.changed = [(local_rows[local_leaves[k][0]], remote_rows[remote_leaves[k][0]])
+                    for k in sorted(changed_keys)]
+
+    diff.stats = {
+        'dialect': dialect,
+        'prefectures': len(set(local_prefs) | set(remote_prefs)),
+        'dirty_prefectures': len(dirty_prefs),
+        'dirty_cities': len(dirty_cities),
+        'leaves_compared': len(set(local_leaves) | set(remote_leaves)),
+        'rows_downloaded': local_side.rows_downloaded + remote_side.rows_downloaded,
+    }
+    return diff
+
+
+def print_diff_summary(diff, file=sys.stdout):
+    """差分のサマリーを表示"""
+    stats = diff.stats
+    print(f"🌳 Merkle比較 ({stats['dialect']}): "
+          f"都道府県 {stats['dirty_prefectures']}/{stats['prefectures']} → "
+          f"市区町村 {stats['dirty_cities']} → "
+          f"行 {stats['leaves_compared']} → "
+          f"全列取得 {stats['rows_downloaded']}行", file=file)
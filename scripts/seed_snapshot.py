@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+ローカルD1の初期化用スナップショット（.cache/seed_snapshot.*）
+
+migrations/ を0001から順に適用したSQLiteを一度だけ作り、最終状態を
+  - スキーマ（CREATE TABLE）
+  - データ（テーブルごとに主キー順の複数行INSERT）
+  - インデックス・ビュー・トリガー（データ投入の後）
+  - wrangler の適用済みマイグレーション表（d1_migrations）
+の順に書き出す。後のマイグレーションで上書き・削除された行は含まれない。
+
+スナップショットは migrations/*.sql の内容から計算した指紋と対応付けて保存し、
+マイグレーションが追加・変更されると次回の実行で自動的に作り直す。
+
+使い方:
+  python3 scripts/seed_snapshot.py                 古ければ作り直す
+  python3 scripts/seed_snapshot.py --rebuild       常に作り直す
+  python3 scripts/seed_snapshot.py --check         古ければ終了コード1（CI用）
+  python3 scripts/seed_snapshot.py --bootstrap     ローカルD1のファイルをスナップショットで作る
+  python3 scripts/seed_snapshot.py --bootstrap --force  既存のローカルD1を置き換える
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from d1_client import PROJECT_ROOT, local_db_path, split_statements
+from sql_emitter import pack_values, sql_literal
+
+MIGRATIONS_DIR = PROJECT_ROOT / "migrations"
+CACHE_DIR = PROJECT_ROOT / ".cache"
+SNAPSHOT_SQL = CACHE_DIR / "seed_snapshot.sql"
+SNAPSHOT_DB = CACHE_DIR / "seed_snapshot.sqlite"
+SNAPSHOT_META = CACHE_DIR / "seed_snapshot.json"
+
+# wrangler d1 migrations apply が使う適用済み一覧
+MIGRATIONS_TABLE = 'd1_migrations'
+MIGRATIONS_TABLE_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE}("
+    f"id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, "
+    f"applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+)
+
+# スナップショットに含めないテーブル（SQLite・miniflare の内部テーブル）
+INTERNAL_PREFIXES = ('sqlite_', '_cf_')
+
+
+def migration_files(migrations_dir=MIGRATIONS_DIR):
+    """適用対象のマイグレーション（*.sql.disabled は除く）"""
+    return sorted(glob.glob(str(Path(migrations_dir) / "*.sql")))
+
+
+def migrations_fingerprint(files):
+    """マイグレーションのファイル名と内容から計算した指紋"""
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(Path(path).name.encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def apply_migrations(conn, files):
+    """
+    マイグレーションを順に適用し、適用できなかった文の数を返す（適用できない文は飛ばす）
+
+    最初から1文ずつ実行する（executescript は失敗した文より前をコミット済みにするため、
+    失敗後にファイル全体をやり直すと INSERT が二重になる）。
+    """
+    skipped = 0
+    for migration in files:
+        with open(migration, 'r', encoding='utf-8') as f:
+            sql = f.read()
+        for statement in split_statements(sql):
+            try:
+                conn.execute(statement)
+            except sqlite3.Error:
+                skipped += 1
+        conn.commit()
+    return skipped
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _user_tables(conn):
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql IS NOT NULL ORDER BY rowid"
+    ).fetchall()
+    return [(name, sql) for name, sql in rows
+            if not name.startswith(INTERNAL_PREFIXES) and name != MIGRATIONS_TABLE]
+
+
+def _order_by(conn, table):
+    """主キー順（WITHOUT ROWID は主キー列、それ以外は rowid）"""
+    pk = [row[1] for row in sorted(conn.execute(f"PRAGMA table_info({_quote(table)})"), key=lambda r: r[5])
+          if row[5]]
+    try:
+        conn.execute(f"SELECT rowid FROM {_quote(table)} LIMIT 0")
+        return "rowid"
+    except sqlite3.OperationalError:
+        return ', '.join(_quote(c) for c in pk) if pk else '1'
+
+
+def dump_snapshot(conn, fp, fingerprint, migration_names):
+    """スキーマ・データ・インデックスの順にSQLを書き出し、(テーブル数, 行数) を返す"""
+    fp.write(f"-- Seed snapshot of migrations/ ({len(migration_names)} files)\n")
+    fp.write(f"-- fingerprint: {fingerprint}\n")
+    fp.write(f"-- generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    fp.write("PRAGMA foreign_keys = OFF;\nBEGIN;\n\n")
+
+    tables = _user_tables(conn)
+    for _, sql in tables:
+        fp.write(f"{sql};\n")
+    fp.write(f"{MIGRATIONS_TABLE_SQL};\n\n")
+
+    total = 0
+    for table, _ in tables:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+        prefix = f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) VALUES\n"
+        cursor = conn.execute(f"SELECT * FROM {_quote(table)} ORDER BY {_order_by(conn, table)}")
+        values = ('(' + ', '.join(sql_literal(v) for v in row) + ')' for row in cursor)
+        for statement in pack_values(prefix, values):
+            fp.write(statement + "\n")
+        count = conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0]
+        if count:
+            fp.write("\n")
+        total += count
+
+    # AUTOINCREMENT の採番位置（削除された行の分も含めて）を合わせる
+    has_sequence = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'").fetchone()
+    if has_sequence:
+        fp.write("DELETE FROM sqlite_sequence;\n")
+        for name, seq in conn.execute("SELECT name, seq FROM sqlite_sequence ORDER BY name"):
+            if name != MIGRATIONS_TABLE:
+                fp.write(f"INSERT INTO sqlite_sequence (name, seq) VALUES ({sql_literal(name)}, {seq});\n")
+        fp.write("\n")
+
+    for name in migration_names:
+        fp.write(f"INSERT INTO {MIGRATIONS_TABLE} (name) VALUES ({sql_literal(name)});\n")
+    fp.write("\n")
+
+    # インデックス・ビュー・トリガーはデータの後
+    for kind in ('index', 'view', 'trigger'):
+        for name, sql in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = ? AND sql IS NOT NULL ORDER BY rowid", (kind,)):
+            if not name.startswith(INTERNAL_PREFIXES):
+                fp.write(f"{sql};\n")
+    fp.write("\nCOMMIT;\n")
+    return len(tables), total
+
+
+def read_meta(path=SNAPSHOT_META):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_stale(files=None):
+    """スナップショットがないか、マイグレーションと指紋が一致しない"""
+    files = migration_files() if files is None else files
+    meta = read_meta()
+    if not (SNAPSHOT_SQL.exists() and SNAPSHOT_DB.exists()):
+        return True
+    return meta.get('fingerprint') != migrations_fingerprint(files)
+
+
+def build_snapshot(files=None, verbose=True):
+    """マイグレーションを適用したSQLiteからスナップショット（SQLとSQLite）を作る"""
+    files = migration_files() if files is None else files
+    fingerprint = migrations_fingerprint(files)
+    names = [Path(path).name for path in files]
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="seed_snapshot_", dir=str(CACHE_DIR)))
+    try:
+        scratch = sqlite3.connect(str(work_dir / "scratch.sqlite"))
+        try:
+            skipped = apply_migrations(scratch, files)
+            sql_path = work_dir / "snapshot.sql"
+            with open(sql_path, 'w', encoding='utf-8') as fp:
+                table_count, row_count = dump_snapshot(scratch, fp, fingerprint, names)
+        finally:
+            scratch.close()
+
+        # 書き出したSQLから作り直して、スナップショット単体で復元できることを確かめる
+        db_path = work_dir / "snapshot.sqlite"
+        conn = sqlite3.connect(str(db_path))
+        try:
+            with open(sql_path, 'r', encoding='utf-8') as f:
+                conn.executescript(f.read())
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+        os.replace(sql_path, SNAPSHOT_SQL)
+        os.replace(db_path, SNAPSHOT_DB)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    meta = {
+        'fingerprint': fingerprint,
+        'migrations': len(names),
+        'last_migration': names[-1] if names else None,
+        'tables': table_count,
+        'rows': row_count,
+        'skipped_statements': skipped,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(SNAPSHOT_META, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    if verbose:
+        print(f"📸 スナップショットを作成: {len(names)}マイグレーション → {table_count}テーブル {row_count:,}行 "
+              f"({time.perf_counter() - started:.1f}秒, 適用できなかった文 {skipped}件)")
+        print(f"   {SNAPSHOT_SQL} ({SNAPSHOT_SQL.stat().st_size // 1024:,}KB)")
+    return meta
+
+
+def ensure_snapshot(rebuild=False, verbose=True):
+    """スナップショットが古ければ作り直し、メタ情報を返す"""
+    files = migration_files()
+    if rebuild or is_stale(files):
+        return build_snapshot(files, verbose)
+    return read_meta()
+
+
+def bootstrap(target, force=False):
+    """スナップショットのSQLiteをコピーしてDBファイルを作る"""
+    target = Path(target)
+    if target.exists() and not force:
+        raise FileExistsError(f"{target} は既にあります（置き換える場合は --force）")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ('-wal', '-shm', '-journal'):
+        stale = Path(f"{target}{suffix}")
+        if stale.exists():
+            stale.unlink()
+    shutil.copyfile(SNAPSHOT_DB, target)
+    return target
+
+
+def main():
+    args = sys.argv[1:]
+    if '--check' in args:
+        if is_stale():
+            print("⚠️ スナップショットがマイグレーションと一致しません（python3 scripts/seed_snapshot.py で作り直し）")
+            sys.exit(1)
+        print("✅ スナップショットは最新です")
+        return
+
+    meta = ensure_snapshot(rebuild='--rebuild' in args)
+    if '--rebuild' not in args:
+        print(f"✅ スナップショット: {meta.get('migrations')}マイグレーション "
+              f"（最後: {meta.get('last_migration')}）{meta.get('rows', 0):,}行")
+
+    if '--bootstrap' in args:
+        try:
+            target = bootstrap(local_db_path(), force='--force' in args)
+        except (FileExistsError, KeyError, OSError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"🚀 ローカルD1を作成しました: {target}")
+
+
+if __name__ == '__main__':
+    main()
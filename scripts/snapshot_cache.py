@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+本番D1の規制テーブルのスナップショットキャッシュ（.cache/remote_snapshot.sqlite）
+
+building_regulations と子テーブル（0053の拡張テーブル）を本番からSQLiteファイルに複製し、
+分析スクリプトはこのファイルを読む。TTL内なら本番へのリクエストは0回。
+
+  - 初回: id のキーセットページングで全件取得
+  - 2回目以降: 更新日時列（last_updated / updated_at）の最大値以降の行だけ取得し、
+              id一覧との突き合わせで本番側で削除された行を除去
+  - --verify: building_regulations をさらに行ハッシュ（Merkle比較）で本番と照合し、
+              更新日時を変えずに書き換えられた行も取り直す（全行のハッシュ対象列を
+              取得するため、update_urls_phase3.sql のようなSQLを本番へ流した後にだけ使う）
+
+環境変数:
+  D1_SNAPSHOT_CACHE_PATH  キャッシュファイルのパス（省略時: .cache/remote_snapshot.sqlite）
+  D1_SNAPSHOT_TTL         有効期間（秒、省略時: 3600）
+
+使い方:
+  python3 scripts/snapshot_cache.py            TTL切れなら差分更新
+  python3 scripts/snapshot_cache.py --refresh  TTLに関係なく差分更新
+  python3 scripts/snapshot_cache.py --verify   差分更新の後、行ハッシュで本番と照合
+  python3 scripts/snapshot_cache.py --full     全件取り直し
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from d1_client import PROJECT_ROOT, D1Error, LocalD1Session, iter_table, open_session
+from regulation_diff import MAX_BOUND_PARAMS, TABLE, diff_building_regulations
+
+CACHE_DIR = PROJECT_ROOT / ".cache"
+DEFAULT_TTL = 3600
+
+# キャッシュ対象テーブルと差分取得に使う更新日時列
+SNAPSHOT_TABLES = {
+    'building_regulations': 'last_updated',
+    'urban_planning_regulations': 'updated_at',
+    'site_road_requirements': 'updated_at',
+    'building_design_requirements': 'updated_at',
+    'development_ground_requirements': 'updated_at',
+    'construction_environmental_regulations': 'updated_at',
+    'local_specific_requirements': 'updated_at',
+}
+
+META_TABLE = '_snapshot_meta'
+
+
+def cache_path():
+    """キャッシュファイルのパス"""
+    override = os.environ.get('D1_SNAPSHOT_CACHE_PATH')
+    return Path(override) if override else CACHE_DIR / "remote_snapshot.sqlite"
+
+
+def snapshot_ttl():
+    return int(os.environ.get('D1_SNAPSHOT_TTL', DEFAULT_TTL))
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _connect(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {META_TABLE} ("
+        f"table_name TEXT PRIMARY KEY, columns TEXT, high_water TEXT, "
+        f"row_count INTEGER, refreshed_at REAL)"
+    )
+    return conn
+
+
+def _meta(conn, table):
+    row = conn.execute(
+        f"SELECT columns, high_water, refreshed_at FROM {META_TABLE} WHERE table_name = ?", (table,)
+    ).fetchone()
+    return row if row else (None, None, None)
+
+
+def _create_table(conn, table, columns):
+    """本番の列定義どおりにキャッシュ側のテーブルを作り直す"""
+    conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+    defs = []
+    for col in columns:
+        definition = f"{_quote(col['name'])} {col['type'] or ''}".rstrip()
+        if col['name'] == 'id':
+            definition += ' PRIMARY KEY'
+        defs.append(definition)
+    conn.execute(f"CREATE TABLE {_quote(table)} ({', '.join(defs)})")
+    if any(col['name'] == 'prefecture' for col in columns) and any(col['name'] == 'city' for col in columns):
+        conn.execute(f"CREATE INDEX idx_{table}_pref_city ON {_quote(table)} (prefecture, city)")
+    if any(col['name'] == 'building_regulation_id' for col in columns):
+        conn.execute(f"CREATE INDEX idx_{table}_building_regulation_id "
+                     f"ON {_quote(table)} (building_regulation_id)")
+
+
+def _store(conn, table, names, rows):
+    sql = (f"INSERT OR REPLACE INTO {_quote(table)} ({', '.join(_quote(n) for n in names)}) "
+           f"VALUES ({', '.join('?' * len(names))})")
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append([row.get(name) for name in names])
+        if len(batch) >= 500:
+            conn.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def refresh_table(conn, remote, table, high_water_column, full=False):
+    """1テーブルを本番から更新し、(取得行数, 削除行数) を返す"""
+    try:
+        columns = remote.query(f"PRAGMA table_info({table})")
+    except D1Error:
+        columns = []
+    if not columns:
+        return None     # 本番にテーブルがない
+
+    names = [col['name'] for col in columns]
+    cached_columns, high_water, _ = _meta(conn, table)
+    if full or cached_columns != ','.join(names):
+        _create_table(conn, table, columns)
+        high_water = None
+    if high_water_column not in names:
+        high_water = None
+
+    if high_water is None:
+        fetched = _store(conn, table, names, iter_table(remote, table))
+        deleted = 0
+    else:
+        # 同じ時刻の更新を取りこぼさないよう >= で取得する
+        changed = iter_table(remote, table, where=f"{high_water_column} >= ? OR {high_water_column} IS NULL",
+                             params=[high_water])
+        fetched = _store(conn, table, names, changed)
+
+        # id一覧を突き合わせ、削除された行を除去・取りこぼした行を取得
+        remote_ids = {row['id'] for row in iter_table(remote, table, columns='id', page_size=5000)}
+        cached_ids = {row[0] for row in conn.execute(f"SELECT id FROM {_quote(table)}")}
+        stale = [(id_,) for id_ in cached_ids if id_ not in remote_ids]
+        conn.executemany(f"DELETE FROM {_quote(table)} WHERE id = ?", stale)
+        deleted = len(stale)
+        missing = sorted(remote_ids - cached_ids)
+        for i in range(0, len(missing), MAX_BOUND_PARAMS):
+            chunk = missing[i:i + MAX_BOUND_PARAMS]
+            rows = remote.query(
+                f"SELECT * FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            fetched += _store(conn, table, names, rows)
+
+    new_high_water = None
+    if high_water_column in names:
+        new_high_water = conn.execute(
+            f"SELECT MAX({_quote(high_water_column)}) FROM {_quote(table)}").fetchone()[0]
+    row_count = conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0]
+    conn.execute(
+        f"INSERT OR REPLACE INTO {META_TABLE} (table_name, columns, high_water, row_count, refreshed_at) "
+        f"VALUES (?, ?, ?, ?, ?)",
+        (table, ','.join(names), new_high_water, row_count, time.time()),
+    )
+    conn.commit()
+    return fetched, deleted
+
+
+def verify_regulations(path, remote):
+    """
+    building_regulations をMerkle比較で本番と突き合わせ、内容の異なる行を取り直す
+
+    last_updated を更新しない UPDATE（update_urls_phase3.sql など）は高水位では
+    検出できないため、行ハッシュで比較する。全列を取得するのは内容の異なる行だけ。
+    """
+    cache = LocalD1Session(path)
+    try:
+        diff = diff_building_regulations(cache, remote, where='1 = 1')
+        names = diff.shared_columns
+        rows = diff.only_remote + [remote_row for _, remote_row in diff.changed]
+        stale = [(row['id'],) for row in diff.only_local]
+        stale += [(cached['id'],) for cached, _ in diff.changed]
+        cache.conn.executemany(f"DELETE FROM {TABLE} WHERE id = ?", stale)
+        fetched = _store(cache.conn, TABLE, names, rows)
+        # refresh_table が記録した行数を、削除・取り直した後の行数にする
+        cache.conn.execute(
+            f"UPDATE {META_TABLE} SET row_count = (SELECT COUNT(*) FROM {TABLE}) WHERE table_name = ?",
+            (TABLE,))
+        cache.conn.commit()
+    finally:
+        cache.close()
+    return fetched, len(stale) - len(diff.changed)
+
+
+def is_fresh(path=None, ttl=None):
+    """キャッシュがTTL内か"""
+    path = path or cache_path()
+    ttl = snapshot_ttl() if ttl is None else ttl
+    if not path.exists():
+        return False
+    conn = _connect(path)
+    try:
+        rows = conn.execute(f"SELECT table_name, refreshed_at FROM {META_TABLE}").fetchall()
+    finally:
+        conn.close()
+    refreshed = {table: at for table, at in rows}
+    if 'building_regulations' not in refreshed:
+        return False
+    oldest = min(at or 0 for at in refreshed.values())
+    return time.time() - oldest < ttl
+
+
+def refresh_snapshot(full=False, path=None, verbose=True, verify=False):
+    """
+    本番からキャッシュを更新
+
+    Args:
+        full: 全件取り直す
+        verify: 差分更新の後、building_regulations を行ハッシュで本番と照合する
+    """
+    path = path or cache_path()
+    remote = open_session('remote')
+    conn = _connect(path)
+    try:
+        for table, high_water_column in SNAPSHOT_TABLES.items():
+            result = refresh_table(conn, remote, table, high_water_column, full)
+            if verbose and result is not None:
+                fetched, deleted = result
+                print(f"   🔄 {table}: 取得 {fetched}行 / 削除 {deleted}行")
+    finally:
+        conn.close()
+
+    if full or not verify:
+        return
+    fetched, deleted = verify_regulations(path, remote)
+    if verbose and (fetched or deleted):
+        print(f"   🌳 {TABLE}（ハッシュ照合）: 取得 {fetched}行 / 削除 {deleted}行")
+
+
+def invalidate(path=None):
+    """次回の open_snapshot で必ず差分更新させる（本番へ適用した後に呼ぶ）"""
+    path = path or cache_path()
+    if not path.exists():
+        return
+    conn = _connect(path)
+    try:
+        conn.execute(f"UPDATE {META_TABLE} SET refreshed_at = 0")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def open_snapshot(ttl=None, refresh=False, verify=False):
+    """
+    本番スナップショットのセッション（LocalD1Session）を返す
+
+    Args:
+        ttl: 有効期間（秒）。省略時は D1_SNAPSHOT_TTL
+        refresh: TTLに関係なく差分更新する
+        verify: TTLに関係なく差分更新し、行ハッシュで本番と照合する
+    """
+    path = cache_path()
+    if refresh or verify or not is_fresh(path, ttl):
+        print(f"📥 本番スナップショットを更新中: {path}")
+        refresh_snapshot(path=path, verify=verify)
+    return LocalD1Session(path, profile='analysis')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本番D1の規制テーブルのスナップショットキャッシュ")
+    parser.add_argument('--refresh', action='store_true', help="TTLに関係なく差分更新する")
+    parser.add_argument('--verify', action='store_true', help="差分更新の後、行ハッシュで本番と照合する")
+    parser.add_argument('--full', action='store_true', help="全件取り直す")
+    args = parser.parse_args()
+
+    path = cache_path()
+    try:
+        if args.full:
+            print(f"📥 本番スナップショットを全件取得中: {path}")
+            refresh_snapshot(full=True, path=path)
+        else:
+            open_snapshot(refresh=args.refresh, verify=args.verify).close()
+    except D1Error as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, row_count, high_water, refreshed_at FROM {META_TABLE} ORDER BY table_name"
+        ).fetchall()
+    finally:
+        conn.close()
+    print(f"\n📦 スナップショット: {path}")
+    for table, row_count, high_water, refreshed_at in rows:
+        age = int(time.time() - (refreshed_at or 0))
+        print(f"   {table}: {row_count}行 (最終更新 {high_water or '-'}, {age}秒前に取得)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+migrations/*.sql と scripts/*.sql の INSERT / UPDATE 文の索引（.cache/sql_corpus.sqlite）
+
+各ファイルの INSERT ... VALUES と UPDATE ... SET ... WHERE を字句解析し、
+(テーブル, 都道府県, 市区町村, 列) ごとに値と出現位置（ファイル・行）を記録する。
+2回目以降は更新日時・サイズの変わったファイルだけ解析し直す。
+
+「最新の値」は migrations（ファイル名順）→ scripts/*.sql（ファイル名順）の順で最後に現れた値。
+
+使い方:
+  python3 scripts/sql_corpus.py 千葉県 茂原市                 列ごとの最新の値と出所
+  python3 scripts/sql_corpus.py 千葉県 茂原市 data_source_url --history  列の値の履歴
+  python3 scripts/sql_corpus.py --value https://www.city.mobara.chiba.jp/0000000359.html  値の出所
+  python3 scripts/sql_corpus.py --rebuild                    索引を作り直す
+"""
+import argparse
+import bisect
+import glob
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+from d1_client import PROJECT_ROOT
+
+INDEX_PATH = PROJECT_ROOT / ".cache" / "sql_corpus.sqlite"
+
+# 索引対象（順位が大きいほど新しい）
+CORPUS_GLOBS = (
+    (0, "migrations/*.sql"),
+    (1, "scripts/*.sql"),
+)
+
+DEFAULT_TABLE = 'building_regulations'
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<blob>[xX]'[0-9a-fA-F]*')
+  | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+  | (?P<op><>|!=|<=|>=|\|\||[(),;=.*<>+\-/%])
+  | (?P<other>.)
+""", re.S | re.X)
+
+# 値として読むトークン
+LITERAL_KINDS = ('string', 'number', 'blob')
+
+
+class Token:
+    __slots__ = ('kind', 'text', 'start', 'end')
+
+    def __init__(self, kind, text, start, end):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+
+    @property
+    def word(self):
+        """識別子・キーワードを大文字で（引用符は外す）"""
+        if self.kind != 'ident':
+            return None
+        if self.text[0] in '"`[':
+            return self.text[1:-1]
+        return self.text.upper()
+
+    @property
+    def name(self):
+        """識別子（大文字小文字はそのまま、引用符は外す）"""
+        return self.text[1:-1] if self.text[0] in '"`[' else self.text
+
+
+def tokenize(sql):
+    """コメントと空白を除いたトークンの列"""
+    return [Token(m.lastgroup, m.group(), m.start(), m.end())
+            for m in TOKEN_PATTERN.finditer(sql) if m.lastgroup not in ('ws', 'comment')]
+
+
+def split_tokens(tokens):
+    """; でトークン列を文ごとに分ける"""
+    statement = []
+    for token in tokens:
+        if token.kind == 'op' and token.text == ';':
+            if statement:
+                yield statement
+            statement = []
+        else:
+            statement.append(token)
+    if statement:
+        yield statement
+
+
+def _literal(tokens):
+    """式が1つのリテラルなら (True, 値)、そうでなければ (False, None)"""
+    sign = 1
+    if len(tokens) == 2 and tokens[0].text in ('-', '+') and tokens[1].kind == 'number':
+        sign = -1 if tokens[0].text == '-' else 1
+        tokens = tokens[1:]
+    if len(tokens) != 1:
+        return False, None
+    token = tokens[0]
+    if token.kind == 'string':
+        return True, token.text[1:-1].replace("''", "'")
+    if token.kind == 'number':
+        text = token.text
+        number = float(text) if any(c in text for c in '.eE') else int(text)
+        return True, sign * number
+    if token.kind == 'blob':
+        return True, bytes.fromhex(token.text[2:-1])
+    if token.word == 'NULL':
+        return True, None
+    return False, None
+
+
+def _split_list(tokens, i, stop_words=()):
+    """
+    tokens[i] から , 区切りの式を読む（括弧の深さ0の , と ) で区切る）
+
+    Returns:
+        (式のトークン列のリスト, 次の位置)
+    """
+    items = []
+    current = []
+    depth = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == 'op' and token.text == '(':
+            depth += 1
+        elif token.kind == 'op' and token.text == ')':
+            if depth == 0:
+                break
+            depth -= 1
+        elif depth == 0 and token.kind == 'op' and token.text == ',':
+            items.append(current)
+            current = []
+            i += 1
+            continue
+        elif depth == 0 and token.word in stop_words:
+            break
+        current.append(token)
+        i += 1
+    items.append(current)
+    return items, i
+
+
+def _table_name(tokens, i):
+    """tokens[i] からテーブル名（schema.table も可）を読む"""
+    name = tokens[i].name
+    i += 1
+    if i + 1 < len(tokens) and tokens[i].text == '.':
+        name = tokens[i + 1].name
+        i += 2
+    return name, i
+
+
+def parse_insert(tokens, sql):
+    """INSERT ... VALUES の各行を (テーブル, 先頭トークン, {列: (リテラルか, 値, 式)}) で返す"""
+    words = [t.word for t in tokens[:8]]
+    if 'INTO' not in words:
+        return []
+    i = words.index('INTO') + 1
+    table, i = _table_name(tokens, i)
+    if i >= len(tokens) or tokens[i].text != '(':
+        return []       # 列名のない INSERT は列が分からない
+    columns, i = _split_list(tokens, i + 1)
+    columns = [col[0].name for col in columns if col]
+    i += 1
+    if i >= len(tokens) or tokens[i].word != 'VALUES':
+        return []       # INSERT ... SELECT / DEFAULT VALUES
+    i += 1
+
+    rows = []
+    while i < len(tokens) and tokens[i].text == '(':
+        first = tokens[i]
+        values, i = _split_list(tokens, i + 1)
+        i += 1
+        if len(values) == len(columns):
+            rows.append((table, first, {
+                col: _expression(value, sql) for col, value in zip(columns, values)
+            }))
+        if i < len(tokens) and tokens[i].text == ',':
+            i += 1
+        else:
+            break
+    return rows
+
+
+def _expression(tokens, sql):
+    is_literal, value = _literal(tokens)
+    raw = sql[tokens[0].start:tokens[-1].end] if tokens else ''
+    return is_literal, value, raw
+
+
+def _where_keys(tokens):
+    """WHERE の AND 条件から prefecture / city の値（city IN (...) は複数）を読む"""
+    keys = {}
+    conditions, _ = _split_list(tokens, 0)
+    if len(conditions) != 1:
+        return None
+    # AND で分割（括弧の外の OR があれば判定しない）
+    parts = [[]]
+    depth = 0
+    for token in conditions[0]:
+        if token.text == '(':
+            depth += 1
+        elif token.text == ')':
+            depth -= 1
+        if depth == 0 and token.word == 'OR':
+            return None
+        if depth == 0 and token.word == 'AND':
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    for part in parts:
+        if len(part) < 3 or part[0].kind != 'ident':
+            continue
+        column = part[0].name.lower()
+        if column not in ('prefecture', 'city'):
+            continue
+        if part[1].text == '=':
+            is_literal, value = _literal(part[2:])
+            if is_literal:
+                keys[column] = [value]
+        elif part[1].word == 'IN' and part[2].text == '(':
+            values, _ = _split_list(part, 3)
+            literals = [_literal(v) for v in values]
+            if all(ok for ok, _ in literals):
+                keys[column] = [value for _, value in literals]
+    return keys
+
+
+def parse_update(tokens, sql):
+    """UPDATE ... SET ... WHERE を (テーブル, 先頭トークン, {列: ...}, [(都道府県, 市区町村)]) で返す"""
+    i = 1
+    if i < len(tokens) and tokens[i].word == 'OR':
+        i += 2
+    table, i = _table_name(tokens, i)
+    if i < len(tokens) and tokens[i].word == 'AS':
+        i += 2
+    if i >= len(tokens) or tokens[i].word != 'SET':
+        return None
+    assignments, i = _split_list(tokens, i + 1, stop_words=('WHERE', 'FROM', 'RETURNING'))
+    values = {}
+    for assignment in assignments:
+        if len(assignment) >= 3 and assignment[1].text == '=':
+            values[assignment[0].name] = _expression(assignment[2:], sql)
+    if i >= len(tokens) or tokens[i].word != 'WHERE':
+        return None     # 全行更新・UPDATE FROM は自治体が分からない
+    keys = _where_keys(tokens[i + 1:])
+    if not keys or 'city' not in keys:
+        return None
+    prefectures = keys.get('prefecture', [None])
+    return table, tokens[0], values, [(p, c) for p in prefectures for c in keys['city']]
+
+
+def parse_sql(sql):
+    """
+    SQLテキストから値の記録を返す
+
+    Returns:
+        [(テーブル, 都道府県, 市区町村, 列, 値, 式, 文の種類, 行番号, 行の番号)]
+    """
+    line_starts = [0] + [m.end() for m in re.finditer('\n', sql)]
+
+    def line_of(token):
+        return bisect.bisect_right(line_starts, token.start)
+
+    facts = []
+    seq = 0
+    for tokens in split_tokens(tokenize(sql)):
+        keyword = tokens[0].word
+        if keyword in ('INSERT', 'REPLACE'):
+            for table, first, values in parse_insert(tokens, sql):
+                seq += 1
+                prefecture = values.get('prefecture', (False, None, ''))
+                city = values.get('city', (False, None, ''))
+                if not (city[0] and city[1]):
+                    continue
+                for column, (is_literal, value, raw) in values.items():
+                    facts.append((table, prefecture[1] if prefecture[0] else None, city[1], column,
+                                  value if is_literal else None, raw, 'insert', line_of(first), seq))
+        elif keyword == 'UPDATE':
+            parsed = parse_update(tokens, sql)
+            if parsed is None:
+                continue
+            table, first, values, keys = parsed
+            for prefecture, city in keys:
+                seq += 1
+                for column, (is_literal, value, raw) in values.items():
+                    facts.append((table, prefecture, city, column,
+                                  value if is_literal else None, raw, 'update', line_of(first), seq))
+    return facts
+
+
+# ---------------------------------------------------------------------------
+# 索引
+# ---------------------------------------------------------------------------
+
+def _connect(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, rank INTEGER, mtime_ns INTEGER, size INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS facts (
+            path TEXT, seq INTEGER, line INTEGER, kind TEXT,
+            table_name TEXT, prefecture TEXT, city TEXT, column_name TEXT, value, raw TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_facts_key ON facts (table_name, prefecture, city, column_name);
+        CREATE INDEX IF NOT EXISTS idx_facts_value ON facts (value);
+        CREATE INDEX IF NOT EXISTS idx_facts_path ON facts (path, seq);
+    """)
+    return conn
+
+
+def corpus_files(root=PROJECT_ROOT):
+    """{相対パス: 順位}"""
+    files = {}
+    for rank, pattern in CORPUS_GLOBS:
+        for path in sorted(glob.glob(str(Path(root) / pattern))):
+            files[os.path.relpath(path, root)] = rank
+    return files
+
+
+class SqlCorpus:
+    """SQLファイル群の索引"""
+
+    def __init__(self, path=INDEX_PATH, root=PROJECT_ROOT):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.conn = _connect(self.path)
+
+    def close(self):
+        self.conn.close()
+
+    def refresh(self, rebuild=False):
+        """更新日時・サイズの変わったファイルだけ解析し直し、(解析したファイル数, 削除したファイル数) を返す"""
+        if rebuild:
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM facts")
+        known = {path: (mtime, size) for path, mtime, size
+                 in self.conn.execute("SELECT path, mtime_ns, size FROM files")}
+        files = corpus_files(self.root)
+
+        parsed = 0
+        for path, rank in files.items():
+            stat = os.stat(self.root / path)
+            if known.get(path) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            with open(self.root / path, 'r', encoding='utf-8', errors='replace') as f:
+                facts = parse_sql(f.read())
+            self.conn.execute("DELETE FROM facts WHERE path = ?", (path,))
+            self.conn.executemany(
+                "INSERT INTO facts (table_name, prefecture, city, column_name, value, raw, kind, line, seq, path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [fact + (path,) for fact in facts])
+            self.conn.execute("INSERT OR REPLACE INTO files (path, rank, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                              (path, rank, stat.st_mtime_ns, stat.st_size))
+            parsed += 1
+
+        removed = [path for path in known if path not in files]
+        for path in removed:
+            self.conn.execute("DELETE FROM facts WHERE path = ?", (path,))
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.conn.commit()
+        return parsed, len(removed)
+
+    def _query(self, sql, params):
+        cursor = self.conn.execute(sql, params)
+        names = [col[0] for col in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def history(self, prefecture, city, column=None, table=DEFAULT_TABLE):
+        """値の記録を古い順に返す（prefecture が書かれていない UPDATE も含める）"""
+        sql = ("SELECT f.column_name, f.value, f.raw, f.kind, f.path, f.line, f.prefecture, f.city "
+               "FROM facts AS f JOIN files AS fl ON fl.path = f.path "
+               "WHERE f.table_name = ? AND f.city = ? AND (f.prefecture = ? OR f.prefecture IS NULL)")
+        params = [table, city, prefecture]
+        if column:
+            sql += " AND f.column_name = ?"
+            params.append(column)
+        return self._query(sql + " ORDER BY fl.rank, f.path, f.seq", params)
+
+    def latest(self, prefecture, city, table=DEFAULT_TABLE):
+        """{列: 最後に現れた記録}"""
+        latest = {}
+        for fact in self.history(prefecture, city, table=table):
+            latest[fact['column_name']] = fact
+        return latest
+
+    def find_value(self, value):
+        """値が書かれている場所"""
+        return self._query(
+            "SELECT f.table_name, f.prefecture, f.city, f.column_name, f.kind, f.path, f.line "
+            "FROM facts AS f JOIN files AS fl ON fl.path = f.path "
+            "WHERE f.value = ? ORDER BY fl.rank, f.path, f.seq", [value])
+
+    def column_values(self, path, column, where=None, table=DEFAULT_TABLE):
+        """
+        1ファイル内の列の値 [(都道府県, 市区町村, 値)]
+
+        where: {列: 値} 同じ行（文）にその値がある記録だけに絞る
+        """
+        sql = ("SELECT f.prefecture, f.city, f.value FROM facts AS f "
+               "WHERE f.path = ? AND f.table_name = ? AND f.column_name = ?")
+        params = [os.path.relpath(self.root / path, self.root), table, column]
+        for other, value in (where or {}).items():
+            sql += (" AND EXISTS (SELECT 1 FROM facts AS w WHERE w.path = f.path AND w.seq = f.seq "
+                    "AND w.column_name = ? AND w.value = ?)")
+            params += [other, value]
+        return [tuple(row) for row in self.conn.execute(sql + " ORDER BY f.seq", params)]
+
+
+def open_corpus(refresh=True):
+    """索引を開く（refresh=True なら変更されたファイルを解析し直す）"""
+    corpus = SqlCorpus()
+    if refresh:
+        corpus.refresh()
+    return corpus
+
+
+def _format_value(fact):
+    if fact['value'] is None and fact['raw'].upper() != 'NULL':
+        return fact['raw']
+    return repr(fact['value'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="migrations/*.sql と scripts/*.sql の INSERT / UPDATE 文の索引")
+    parser.add_argument('keys', nargs='*', metavar='都道府県 市区町村 [列]',
+                        help="列ごとの最新の値（列を指定すると値の履歴）")
+    parser.add_argument('--value', nargs='+', metavar='値', help="値が現れるファイル・行を探す")
+    parser.add_argument('--history', action='store_true', help="すべての列の値の履歴を表示する")
+    parser.add_argument('--rebuild', action='store_true', help="索引を作り直す")
+    args = parser.parse_args()
+    if args.keys and not 2 <= len(args.keys) <= 3:
+        parser.error("都道府県と市区町村（と列）を指定してください")
+
+    corpus = SqlCorpus()
+    try:
+        parsed, removed = corpus.refresh(rebuild=args.rebuild)
+        if parsed or removed:
+            print(f"🔄 索引を更新: 解析 {parsed}ファイル / 削除 {removed}ファイル ({corpus.path})")
+
+        if args.value:
+            for value in args.value:
+                facts = corpus.find_value(value)
+                print(f"\n🔎 {value}: {len(facts)}件")
+                for fact in facts:
+                    print(f"   {fact['path']}:{fact['line']}  {fact['kind']} {fact['table_name']}."
+                          f"{fact['column_name']} ({fact['prefecture'] or '-'} {fact['city']})")
+            return
+
+        if not args.keys:
+            if not (parsed or removed or args.rebuild):
+                parser.print_help()
+            return
+        prefecture, city, column = (args.keys + [None])[:3]
+
+        if args.history or column:
+            facts = corpus.history(prefecture, city, column)
+            print(f"\n📜 {prefecture} {city}{' ' + column if column else ''}: {len(facts)}件")
+            for fact in facts:
+                print(f"   {fact['path']}:{fact['line']}  {fact['column_name']} = {_format_value(fact)}")
+        else:
+            latest = corpus.latest(prefecture, city)
+            print(f"\n📋 {prefecture} {city}: {len(latest)}列")
+            for column_name, fact in sorted(latest.items()):
+                print(f"   {column_name} = {_format_value(fact)}  ({fact['path']}:{fact['line']})")
+    finally:
+        corpus.close()
+
+
+if __name__ == '__main__':
+    main()
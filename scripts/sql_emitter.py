@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+building_regulations 用のストリーミングSQL生成
+
+行（dict）のイテレータを受け取り、複数行VALUESの INSERT / INSERT OR REPLACE / UPSERT 文を
+ファイルへ順に書き出す。行をすべてメモリに載せないため、件数に関係なくメモリは一定。
+
+  - 列の型・DEFAULT・NOT NULL は migrations/ の CREATE TABLE（0044）と ALTER TABLE から読む
+  - 値は列の型に合わせてリテラル化（INTEGER/REAL列の数値文字列は数値として出力）
+  - 行にない列は DEFAULT 値（なければ NULL）
+  - 1文あたりの行数・バイト数（D1の上限）で区切る
+"""
+import glob
+import re
+import sqlite3
+from pathlib import Path
+
+from d1_client import PROJECT_ROOT, split_statements
+
+# D1の1文あたりの最大長（バイト）
+D1_MAX_STATEMENT_BYTES = 100_000
+DEFAULT_MAX_ROWS = 500
+
+MIGRATIONS_DIR = PROJECT_ROOT / "migrations"
+SCHEMA_MIGRATION = "0044_create_building_regulations_table.sql"
+
+MODES = {
+    'insert': 'INSERT INTO',
+    'replace': 'INSERT OR REPLACE INTO',
+    'upsert': 'INSERT INTO',
+}
+
+
+def sql_literal(value):
+    """Pythonの値をSQLリテラルに変換"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (bytes, bytearray)):
+        return f"X'{bytes(value).hex()}'"
+    escaped = str(value).replace("'", "''")
+    return f"'{escaped}'"
+
+
+def _number(text, integer_only=False):
+    """数値として読める文字列なら int / float を返す（読めなければ None）"""
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    if integer_only:
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    if number != number or number in (float('inf'), float('-inf')):
+        return None
+    return number
+
+
+def typed_literal(value, affinity):
+    """列の型（affinity）に合わせてリテラル化"""
+    if value is None or isinstance(value, (bytes, bytearray)):
+        return sql_literal(value)
+    if affinity == 'TEXT':
+        if isinstance(value, bool):
+            value = int(value)
+        return sql_literal(str(value))
+    if affinity in ('INTEGER', 'REAL', 'NUMERIC') and isinstance(value, str):
+        number = _number(value.strip())
+        if number is None:
+            return sql_literal(value)   # 数値でなければ文字列のまま（日時など）
+        if affinity == 'INTEGER' and isinstance(number, float) and number.is_integer():
+            number = int(number)
+        if affinity == 'REAL':
+            number = float(number)
+        return sql_literal(number)
+    if affinity == 'REAL' and isinstance(value, int) and not isinstance(value, bool):
+        return sql_literal(float(value))
+    return sql_literal(value)
+
+
+def column_affinity(declared_type):
+    """SQLiteの型名から affinity を決める（SQLiteのルールと同じ順）"""
+    upper = (declared_type or '').upper()
+    if 'INT' in upper:
+        return 'INTEGER'
+    if 'CHAR' in upper or 'CLOB' in upper or 'TEXT' in upper:
+        return 'TEXT'
+    if not upper or 'BLOB' in upper:
+        return 'BLOB'
+    if 'REAL' in upper or 'FLOA' in upper or 'DOUB' in upper:
+        return 'REAL'
+    return 'NUMERIC'
+
+
+class TableSchema:
+    """テーブルの列定義（列順・affinity・DEFAULT・NOT NULL）"""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns      # {列名: {'affinity', 'default', 'not_null'}}
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def split(self, columns):
+        """(スキーマにある列, ない列) に分ける"""
+        known = [c for c in columns if c in self.columns]
+        return known, [c for c in columns if c not in self.columns]
+
+    def literal(self, column, row):
+        """行の値をリテラル化（行にない列は DEFAULT）"""
+        spec = self.columns[column]
+        if column not in row:
+            return spec['default'] if spec['default'] is not None else 'NULL'
+        value = row[column]
+        if value is None:
+            if spec['not_null'] and spec['default'] is None:
+                raise ValueError(f"{self.table}.{column} は NOT NULL です: {row}")
+            return 'NULL'
+        if type(value) is str and spec['affinity'] == 'TEXT':
+            return "'" + value.replace("'", "''") + "'"
+        return typed_literal(value, spec['affinity'])
+
+
+def _strip_comments(statement):
+    """文の先頭のコメント行を取り除く"""
+    lines = statement.lstrip().splitlines()
+    while lines and (not lines[0].strip() or lines[0].lstrip().startswith('--')):
+        lines.pop(0)
+    return '\n'.join(lines).lstrip()
+
+
+def load_table_schema(table='building_regulations', migrations_dir=MIGRATIONS_DIR,
+                      first_migration=SCHEMA_MIGRATION):
+    """
+    CREATE TABLE のマイグレーションと、それ以降の ALTER TABLE ... ADD COLUMN から列定義を作る
+
+    文をメモリ上のSQLiteで実行し、PRAGMA table_info で型・DEFAULT を読む。
+    """
+    pattern = re.compile(rf"(CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?|ALTER\s+TABLE\s+){table}\b",
+                         re.IGNORECASE)
+    conn = sqlite3.connect(':memory:')
+    try:
+        for path in sorted(glob.glob(str(Path(migrations_dir) / "*.sql"))):
+            if Path(path).name < first_migration:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            for statement in statements:
+                if pattern.match(_strip_comments(statement)):
+                    try:
+                        conn.execute(statement)
+                    except sqlite3.Error:
+                        pass    # 重複した ADD COLUMN など
+        info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    finally:
+        conn.close()
+    if not info:
+        raise ValueError(f"{table} の CREATE TABLE が {migrations_dir} に見つかりません")
+    return TableSchema(table, {
+        name: {'affinity': column_affinity(col_type), 'default': default, 'not_null': bool(not_null)}
+        for _, name, col_type, not_null, default, _ in info
+    })
+
+
+_schemas = {}
+
+
+def table_schema(table='building_regulations'):
+    """load_table_schema の結果をキャッシュして返す"""
+    if table not in _schemas:
+        _schemas[table] = load_table_schema(table)
+    return _schemas[table]
+
+
+def pack_values(prefix, values, suffix=';', max_bytes=D1_MAX_STATEMENT_BYTES,
+                max_rows=DEFAULT_MAX_ROWS, with_counts=False):
+    """VALUESの各行を、上限に収まる複数行INSERT文に詰める（with_counts なら (文, 行数) を返す）"""
+    budget = max_bytes - len(prefix.encode('utf-8')) - len(suffix.encode('utf-8'))
+    batch = []
+    size = 0
+    for value in values:
+        value_size = len(value.encode('utf-8')) + 2  # ",\n"
+        if batch and (size + value_size > budget or len(batch) >= max_rows):
+            statement = prefix + ',\n'.join(batch) + suffix
+            yield (statement, len(batch)) if with_counts else statement
+            batch = []
+            size = 0
+        batch.append(value)
+        size += value_size
+    if batch:
+        statement = prefix + ',\n'.join(batch) + suffix
+        yield (statement, len(batch)) if with_counts else statement
+
+
+class SqlEmitter:
+    """行を複数行INSERT文にしてファイルへ書き出す"""
+
+    def __init__(self, columns, schema=None, mode='insert', conflict_columns=('id',), update_columns=None,
+                 max_rows=DEFAULT_MAX_ROWS, max_bytes=D1_MAX_STATEMENT_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"mode は {', '.join(MODES)} のいずれかです: {mode}")
+        self.schema = schema or table_schema()
+        known, unknown = self.schema.split(columns)
+        if unknown:
+            raise ValueError(f"{self.schema.table} にない列です: {', '.join(unknown)}")
+        self.columns = known
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.statements = 0
+        self.bytes = 0
+
+        self.prefix = f"{MODES[mode]} {self.schema.table} ({', '.join(self.columns)}) VALUES\n"
+        self.suffix = ';'
+        if mode == 'upsert':
+            if update_columns is None:
+                update_columns = [c for c in self.columns if c not in conflict_columns and c != 'created_at']
+            self.suffix = (f"\nON CONFLICT({', '.join(conflict_columns)}) DO UPDATE SET "
+                           + ', '.join(f"{col} = excluded.{col}" for col in update_columns) + ';')
+
+    def values(self, row):
+        literal = self.schema.literal
+        return '(' + ', '.join([literal(col, row) for col in self.columns]) + ')'
+
+    def statements_for(self, rows):
+        """行のイテレータから文を1つずつ返す"""
+        def values():
+            for row in rows:
+                self.rows += 1
+                yield self.values(row)
+        for statement in pack_values(self.prefix, values(), self.suffix, self.max_bytes, self.max_rows):
+            self.statements += 1
+            yield statement
+
+    def write(self, fp, rows, separator="\n\n"):
+        """文をファイルへ書き出し、書いた文数を返す"""
+        before = self.statements
+        for statement in self.statements_for(rows):
+            fp.write(statement + separator)
+            self.bytes += len(statement.encode('utf-8')) + len(separator)
+        return self.statements - before
+
+
+def write_insert_sql(rows, output_path, columns, header=(), **options):
+    """
+    行をSQLファイルに書き出し、SqlEmitter（件数の集計付き）を返す
+
+    Args:
+        rows: 行（dict）のイテレータ
+        output_path: 出力ファイル
+        columns: 出力する列
+        header: 先頭に書くコメント行（'-- ' は自動で付ける）
+        options: SqlEmitter の引数（mode, max_rows, max_bytes など）
+    """
+    emitter = SqlEmitter(columns, **options)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for line in header:
+            f.write(f"-- {line}\n")
+        if header:
+            f.write("\n")
+        emitter.write(f, rows)
+    return emitter
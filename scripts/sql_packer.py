@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+生成SQLの詰め直しと分割（D1 / wrangler の上限に合わせる）
+
+  1. 連続する同じ形の INSERT（同じテーブル・列・INSERT OR ... ）を複数行INSERTにまとめる
+     （1文あたりのバイト数・行数の上限まで。上限を超える複数行INSERTは行で分ける）
+  2. 文を番号付きのファイル（<名前>.part001.sql, ...）に分ける
+     （1ファイルあたりのバイト数・文数・行数の上限まで）
+  3. 適用順を <名前>.manifest.json に書き出す
+
+UPDATE など INSERT 以外の文と、ON CONFLICT / RETURNING / SELECT 付きの INSERT はそのまま残す。
+文の順序は変えない（間に別の文がある INSERT どうしはまとめない）。
+`-- @chunk <グループ>` の区切りは各ファイルに引き継ぐ（sync_executor で並列適用できる）。
+
+値はリテラルで書かれているため、D1のバインド変数の上限（100個）は関係しない。
+
+使い方:
+  python3 scripts/sql_packer.py scripts/sync_local_to_production_20251227.sql
+  python3 scripts/sql_packer.py scripts/update_saitama_urls_phase5_batch*.sql --name saitama_urls
+  python3 scripts/sql_packer.py <SQL...> --output-dir scripts/packed --max-file-bytes 2000000
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from delta_sync import CHUNK_MARKER
+from sql_corpus import _split_list, tokenize
+from sql_emitter import D1_MAX_STATEMENT_BYTES, DEFAULT_MAX_ROWS, pack_values
+from sync_executor import read_plan
+
+# 1ファイルあたりの上限（wrangler d1 execute --file 1回分）
+DEFAULT_MAX_FILE_BYTES = 5_000_000
+DEFAULT_MAX_FILE_STATEMENTS = 1000
+
+
+class PackStats:
+    def __init__(self):
+        self.input_statements = 0
+        self.output_statements = 0
+        self.rows = 0
+        self.oversized = 0      # 上限を超えるが分けられない文
+
+
+def parse_insert_rows(statement):
+    """
+    単純な INSERT ... VALUES なら (文の先頭部分, [各行のVALUES]) を、そうでなければ None を返す
+
+    文の先頭部分は空白を揃えた 'INSERT OR REPLACE INTO t (a, b) VALUES\\n'。
+    """
+    tokens = tokenize(statement)
+    if tokens and tokens[-1].text == ';':
+        tokens = tokens[:-1]
+    if not tokens or tokens[0].word not in ('INSERT', 'REPLACE'):
+        return None
+    words = [t.word for t in tokens[:6]]
+    if 'INTO' not in words:
+        return None
+    i = words.index('INTO') + 1
+    verb = ' '.join(t.word for t in tokens[:i])
+    table_end = i + 1
+    if table_end + 1 < len(tokens) and tokens[table_end].text == '.':
+        table_end += 2
+    table = ''.join(t.text for t in tokens[i:table_end])
+    if table_end >= len(tokens) or tokens[table_end].text != '(':
+        return None
+    columns, i = _split_list(tokens, table_end + 1)
+    if any(len(col) != 1 or col[0].kind != 'ident' for col in columns):
+        return None
+    i += 1
+    if i >= len(tokens) or tokens[i].word != 'VALUES':
+        return None
+    i += 1
+
+    rows = []
+    while i < len(tokens) and tokens[i].text == '(':
+        start = tokens[i].start
+        _, i = _split_list(tokens, i + 1)
+        if i >= len(tokens):
+            return None
+        rows.append(statement[start:tokens[i].end])
+        i += 1
+        if i < len(tokens) and tokens[i].text == ',':
+            i += 1
+        else:
+            break
+    if i != len(tokens) or not rows:
+        return None     # ON CONFLICT / RETURNING などが続く
+    prefix = f"{verb} {table} ({', '.join(col[0].text for col in columns)}) VALUES\n"
+    return prefix, rows
+
+
+def pack_statements(statements, max_bytes=D1_MAX_STATEMENT_BYTES, max_rows=DEFAULT_MAX_ROWS, stats=None):
+    """
+    文のイテレータから、連続する同じ形の INSERT をまとめた文を (文, 行数) で返す
+
+    INSERT 以外の文の行数は 0。
+    """
+    stats = stats or PackStats()
+    prefix = None
+    values = []
+
+    def flush():
+        for packed, rows in pack_values(prefix, values, ';', max_bytes, max_rows, with_counts=True):
+            stats.output_statements += 1
+            if len(packed.encode('utf-8')) > max_bytes:
+                stats.oversized += 1
+            yield packed, rows
+        values.clear()
+
+    for statement in statements:
+        stats.input_statements += 1
+        parsed = parse_insert_rows(statement)
+        if parsed is not None and parsed[0] == prefix:
+            values.extend(parsed[1])
+            stats.rows += len(parsed[1])
+            continue
+        if values:
+            yield from flush()
+        if parsed is not None:
+            prefix, rows = parsed
+            values.extend(rows)
+            stats.rows += len(rows)
+            continue
+        prefix = None
+        statement = statement.strip()
+        if not statement.endswith(';'):
+            statement += ';'
+        stats.output_statements += 1
+        if len(statement.encode('utf-8')) > max_bytes:
+            stats.oversized += 1
+        yield statement, 0
+    if values:
+        yield from flush()
+
+
+class PartWriter:
+    """番号付きファイルへ上限内で書き分ける"""
+
+    def __init__(self, output_dir, name, max_file_bytes=DEFAULT_MAX_FILE_BYTES,
+                 max_file_statements=DEFAULT_MAX_FILE_STATEMENTS, max_file_rows=None):
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.max_file_bytes = max_file_bytes
+        self.max_file_statements = max_file_statements
+        self.max_file_rows = max_file_rows
+        self.parts = []
+        self.fp = None
+        self.group = None
+
+    def _open(self, group):
+        self.close()
+        path = self.output_dir / f"{self.name}.part{len(self.parts) + 1:03d}.sql"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.fp = open(path, 'w', encoding='utf-8')
+        self.parts.append({'file': str(path), 'statements': 0, 'rows': 0, 'bytes': 0, 'groups': []})
+        self._write(f"-- {self.name} part {len(self.parts)}\n\n")
+        if group is not None:
+            self._marker(group)
+
+    def _write(self, text):
+        self.fp.write(text)
+        self.parts[-1]['bytes'] += len(text.encode('utf-8'))
+
+    def _marker(self, group):
+        self._write(f"{CHUNK_MARKER} {group}\n")
+        self.parts[-1]['groups'].append(group)
+
+    def _fits(self, size, rows):
+        part = self.parts[-1]
+        if part['statements'] == 0:
+            return True
+        if part['bytes'] + size > self.max_file_bytes:
+            return False
+        if self.max_file_statements and part['statements'] >= self.max_file_statements:
+            return False
+        if self.max_file_rows and part['rows'] + rows > self.max_file_rows:
+            return False
+        return True
+
+    def write(self, group, statement, rows):
+        text = statement + "\n\n"
+        size = len(text.encode('utf-8')) + (len(f"{CHUNK_MARKER} {group}\n".encode('utf-8')) if group else 0)
+        # 区切りのない文をグループの後に続けると、そのグループの一部として扱われるため新しいファイルにする
+        back_to_sequential = group is None and self.group is not None
+        if self.fp is None or back_to_sequential or not self._fits(size, rows):
+            self._open(group)
+        elif group != self.group:
+            self._marker(group)
+        self.group = group
+        self._write(text)
+        self.parts[-1]['statements'] += 1
+        self.parts[-1]['rows'] += rows
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def pack_files(sources, output_dir, name, max_bytes=D1_MAX_STATEMENT_BYTES, max_rows=DEFAULT_MAX_ROWS,
+               max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_file_statements=DEFAULT_MAX_FILE_STATEMENTS,
+               max_file_rows=None):
+    """SQLファイル群を詰め直して分割し、マニフェスト（dict）を返す"""
+    stats = PackStats()
+    writer = PartWriter(output_dir, name, max_file_bytes, max_file_statements, max_file_rows)
+    try:
+        for source in sources:
+            for group, statements in read_plan(source):
+                for statement, rows in pack_statements(statements, max_bytes, max_rows, stats):
+                    writer.write(group, statement, rows)
+    finally:
+        writer.close()
+
+    for part in writer.parts:
+        part['sha256'] = _sha256(part['file'])
+    manifest = {
+        'name': name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'sources': [str(s) for s in sources],
+        'limits': {
+            'max_statement_bytes': max_bytes,
+            'max_rows_per_statement': max_rows,
+            'max_file_bytes': max_file_bytes,
+            'max_file_statements': max_file_statements,
+            'max_file_rows': max_file_rows,
+        },
+        'input_statements': stats.input_statements,
+        'output_statements': stats.output_statements,
+        'rows': stats.rows,
+        'oversized_statements': stats.oversized,
+        'parts': writer.parts,    # この順に適用する
+    }
+    manifest_path = Path(output_dir) / f"{name}.manifest.json"
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    manifest['path'] = str(manifest_path)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成SQLを複数行INSERTに詰め直し、上限内のファイルに分割")
+    parser.add_argument('sources', nargs='+', help="入力SQLファイル（指定順に連結）")
+    parser.add_argument('--name', help="出力ファイル名の接頭辞（省略時: 最初の入力ファイル名）")
+    parser.add_argument('--output-dir', help="出力先（省略時: 最初の入力ファイルと同じ場所の packed/）")
+    parser.add_argument('--max-statement-bytes', type=int, default=D1_MAX_STATEMENT_BYTES)
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS, help="1文あたりの行数")
+    parser.add_argument('--max-file-bytes', type=int, default=DEFAULT_MAX_FILE_BYTES)
+    parser.add_argument('--max-file-statements', type=int, default=DEFAULT_MAX_FILE_STATEMENTS)
+    parser.add_argument('--max-file-rows', type=int, default=None)
+    args = parser.parse_args()
+
+    missing = [s for s in args.sources if not os.path.exists(s)]
+    if missing:
+        print(f"❌ SQLファイルが見つかりません: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    first = Path(args.sources[0])
+    name = args.name or first.stem
+    output_dir = Path(args.output_dir) if args.output_dir else first.parent / "packed"
+
+    manifest = pack_files(args.sources, output_dir, name, args.max_statement_bytes, args.max_rows,
+                          args.max_file_bytes, args.max_file_statements, args.max_file_rows)
+
+    print(f"📦 {manifest['input_statements']}文 → {manifest['output_statements']}文"
+          f"（{manifest['rows']}行, {len(manifest['parts'])}ファイル）")
+    if manifest['oversized_statements']:
+        print(f"⚠️ 1文の上限（{args.max_statement_bytes:,}バイト）を超える分割できない文: "
+              f"{manifest['oversized_statements']}件", file=sys.stderr)
+    print(f"📝 マニフェスト: {manifest['path']}")
+    print("\n適用順:")
+    for part in manifest['parts']:
+        print(f"   npx wrangler d1 execute real-estate-200units-db --remote --file={part['file']}"
+              f"  # {part['statements']}文 / {part['rows']}行 / {part['bytes']:,}バイト")
+
+
+if __name__ == '__main__':
+    main()
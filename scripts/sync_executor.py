@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+同期SQLの再開可能な実行ツール
+
+sync_local_to_production*.py が生成した .sql をチャンクに分け、チャンクごとに
+1トランザクションで適用する。
+
+  - チャンクが成功するたびにチェックポイント（<SQLファイル>.<local|remote>.checkpoint.json）を記録
+  - 途中で失敗しても、再実行すると完了済みのチャンクを飛ばして続きから適用
+  - `-- @chunk <都道府県>` で区切られたチャンクは互いに独立なので並列に適用
+  - チャンクごとのスループット（文/秒・変更行/秒）を表示
+
+使い方:
+  python3 scripts/sync_executor.py scripts/sync_local_to_production_delta_20251227.sql
+  python3 scripts/sync_executor.py <SQLファイル> --local       ローカルD1に適用
+  python3 scripts/sync_executor.py <SQLファイル> --parallel 8  同時に適用する都道府県数
+  python3 scripts/sync_executor.py <SQLファイル> --status      進捗のみ表示
+  python3 scripts/sync_executor.py <SQLファイル> --reset       チェックポイントを破棄して最初から
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from d1_client import D1Error, split_statements
+from d1_fetch import DEFAULT_CONCURRENCY, open_pool
+from delta_sync import CHUNK_MARKER, D1_MAX_STATEMENT_BYTES
+from snapshot_cache import invalidate
+
+# 1チャンク（1トランザクション）あたりの上限
+CHUNK_MAX_STATEMENTS = 50
+CHUNK_MAX_BYTES = D1_MAX_STATEMENT_BYTES
+
+
+class Chunk:
+    """1トランザクションで適用する文のまとまり"""
+
+    def __init__(self, chunk_id, group, statements):
+        self.id = chunk_id
+        self.group = group          # 都道府県（None なら順番に適用）
+        self.statements = statements
+
+    @property
+    def size(self):
+        return sum(len(s.encode('utf-8')) for s in self.statements)
+
+
+def read_plan(path):
+    """SQLファイルを [(グループ, [文, ...]), ...] に分割"""
+    groups = [(None, [])]
+    buffer = ''
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            stripped = line.strip()
+            # 文の途中でなければ、コメント行とチャンク区切りを処理
+            if not buffer.strip() and (stripped.startswith('--') or not stripped):
+                if stripped.startswith(CHUNK_MARKER):
+                    groups.append((stripped[len(CHUNK_MARKER):].strip(), []))
+                continue
+            buffer += line
+            if sqlite3.complete_statement(buffer):
+                groups[-1][1].extend(split_statements(buffer))
+                buffer = ''
+    if buffer.strip():
+        groups[-1][1].extend(split_statements(buffer))
+    return [(group, statements) for group, statements in groups if statements]
+
+
+def build_chunks(groups, max_statements=CHUNK_MAX_STATEMENTS, max_bytes=CHUNK_MAX_BYTES):
+    """文をチャンクに詰める（1文が上限を超える場合はその文だけで1チャンク）"""
+    chunks = []
+    sequence = 0
+    for group, statements in groups:
+        batch = []
+        size = 0
+        for statement in statements + [None]:
+            statement_size = len(statement.encode('utf-8')) if statement is not None else 0
+            if batch and (statement is None or len(batch) >= max_statements
+                          or size + statement_size > max_bytes):
+                sequence += 1
+                label = group if group is not None else 'sequential'
+                chunks.append(Chunk(f"{label}#{sequence:04d}", group, batch))
+                batch = []
+                size = 0
+            if statement is not None:
+                batch.append(statement)
+                size += statement_size
+    return chunks
+
+
+def plan_hash(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.id.encode('utf-8'))
+        for statement in chunk.statements:
+            digest.update(b'\0' + statement.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """適用済みチャンクの記録（チャンク完了ごとに書き換える）"""
+
+    def __init__(self, path, plan_sha256, target):
+        self.path = path
+        self.plan_sha256 = plan_sha256
+        self.target = target
+        self.done = {}
+
+    @classmethod
+    def load(cls, path, plan_sha256, target, reset=False):
+        checkpoint = cls(path, plan_sha256, target)
+        if reset or not os.path.exists(path):
+            return checkpoint
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('plan_sha256') != plan_sha256:
+            raise D1Error(
+                f"チェックポイントは別の内容のSQLファイルに対するものです: {path}\n"
+                f"SQLファイルを再生成した場合は --reset を付けて実行してください"
+            )
+        checkpoint.done = data.get('chunks', {})
+        return checkpoint
+
+    def mark_done(self, chunk, stats):
+        self.done[chunk.id] = stats
+        self.save()
+
+    def save(self):
+        data = {
+            'plan_sha256': self.plan_sha256,
+            'target': self.target,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'chunks': self.done,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+async def _apply_chunk(pool, checkpoint, chunk):
+    started = time.perf_counter()
+    meta = await pool.execute_batch(chunk.statements)
+    elapsed = time.perf_counter() - started
+    stats = {
+        'statements': len(chunk.statements),
+        'bytes': chunk.size,
+        'changes': meta.get('changes', 0),
+        'seconds': round(elapsed, 3),
+        'applied_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    checkpoint.mark_done(chunk, stats)
+    rate = max(elapsed, 1e-6)
+    print(f"   ✅ {chunk.id}: {stats['statements']}文 / 変更 {stats['changes']}行 / "
+          f"{elapsed:.2f}秒 ({stats['statements'] / rate:.1f}文/秒, {stats['changes'] / rate:.0f}行/秒)")
+
+
+async def _apply_group(pool, checkpoint, chunks, limit, failures):
+    """1グループのチャンクを順に適用（失敗したらそのグループは中断）"""
+    async with limit:
+        for chunk in chunks:
+            if chunk.id in checkpoint.done:
+                continue
+            try:
+                await _apply_chunk(pool, checkpoint, chunk)
+            except D1Error as e:
+                print(f"   ❌ {chunk.id}: {e}", file=sys.stderr)
+                failures.append(chunk.id)
+                return
+
+
+async def apply_chunks(chunks, pool, checkpoint, parallel=DEFAULT_CONCURRENCY):
+    """チャンクを適用し、失敗したチャンクIDのリストを返す"""
+    failures = []
+    limit = asyncio.Semaphore(max(1, parallel))
+
+    # 区切りのない文はファイル順に1つずつ
+    sequential = [chunk for chunk in chunks if chunk.group is None]
+    await _apply_group(pool, checkpoint, sequential, limit, failures)
+    if failures:
+        return failures
+
+    # 都道府県ごとのチャンクは並列に
+    groups = {}
+    for chunk in chunks:
+        if chunk.group is not None:
+            groups.setdefault(chunk.group, []).append(chunk)
+    await asyncio.gather(*(
+        _apply_group(pool, checkpoint, group_chunks, limit, failures)
+        for group_chunks in groups.values()
+    ))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='同期SQLをチャンク単位で再開可能に適用')
+    parser.add_argument('sql_file')
+    parser.add_argument('--local', action='store_true', help='ローカルD1に適用（既定: 本番）')
+    parser.add_argument('--parallel', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--chunk-statements', type=int, default=CHUNK_MAX_STATEMENTS)
+    parser.add_argument('--status', action='store_true', help='進捗のみ表示')
+    parser.add_argument('--reset', action='store_true', help='チェックポイントを破棄')
+    args = parser.parse_args()
+
+    target = 'local' if args.local else 'remote'
+    chunks = build_chunks(read_plan(args.sql_file), args.chunk_statements)
+    checkpoint_path = f"{args.sql_file}.{target}.checkpoint.json"
+
+    print("=" * 80)
+    print(f"同期SQLの適用 ({target}): {args.sql_file}")
+    print("=" * 80)
+
+    try:
+        checkpoint = Checkpoint.load(checkpoint_path, plan_hash(chunks), target, args.reset)
+    except D1Error as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    pending = [chunk for chunk in chunks if chunk.id not in checkpoint.done]
+    total_statements = sum(len(chunk.statements) for chunk in chunks)
+    print(f"\n📦 {len(chunks)}チャンク / {total_statements}文"
+          f"（完了済み {len(chunks) - len(pending)}チャンク、残り {len(pending)}チャンク）")
+    if args.status or not pending:
+        if not pending:
+            print("\n✅ すべてのチャンクが適用済みです")
+        return
+
+    print(f"\n🚀 適用中（並列数 {args.parallel}）...")
+    started = time.perf_counter()
+    try:
+        pool = open_pool(target, args.parallel)
+        failures = asyncio.run(apply_chunks(chunks, pool, checkpoint, args.parallel))
+    except D1Error as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    # 本番の内容が変わったので、次の分析では本番スナップショットを差分更新させる
+    if target == 'remote':
+        invalidate()
+
+    applied = [checkpoint.done[chunk.id] for chunk in pending if chunk.id in checkpoint.done]
+    statements = sum(stats['statements'] for stats in applied)
+    changes = sum(stats['changes'] for stats in applied)
+    print(f"\n📊 今回の適用: {len(applied)}チャンク / {statements}文 / 変更 {changes}行 / {elapsed:.2f}秒")
+    print(f"   チェックポイント: {checkpoint_path}")
+
+    if failures:
+        print(f"\n⚠️ 失敗したチャンク: {', '.join(sorted(failures))}", file=sys.stderr)
+        print("   原因を解消して同じコマンドを再実行すると、未完了のチャンクから再開します", file=sys.stderr)
+        sys.exit(1)
+    print("\n✅ すべてのチャンクを適用しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,27 +4,13 @@ Phase 3-1: URL補完スクリプト
 千葉県と埼玉県のdata_source_urlをUPDATE文で更新
 """
 
-import re
+from sql_corpus import open_corpus
 
-def extract_url_from_sql(sql_file):
-    """SQLファイルからcity, data_source_urlを抽出"""
-    url_map = {}
-    
-    with open(sql_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # INSERT OR REPLACE文からcityとdata_source_urlを抽出
-    pattern = r"VALUES\s*\('([^']+)',\s*'([^']+)',\s*'[^']*',\s*'[^']*',\s*'[^']*',\s*'([^']*)',\s*'[^']*',\s*'VERIFIED'"
-    matches = re.findall(pattern, content)
-    
-    for match in matches:
-        prefecture = match[0]
-        city = match[1]
-        url = match[2]
-        if url and url.strip():
-            url_map[city] = url
-    
-    return url_map
+def extract_url_from_sql(sql_file, corpus=None):
+    """SQLファイルからcity, data_source_urlを抽出（sql_corpus の索引から読む）"""
+    corpus = corpus or open_corpus()
+    rows = corpus.column_values(sql_file, 'data_source_url', where={'verification_status': 'VERIFIED'})
+    return {city: url for _, city, url in rows if url and url.strip()}
 
 def generate_update_sql(prefecture, url_map):
     """UPDATE SQLを生成"""
@@ -47,15 +33,18 @@ def main():
     print("Phase 3-1: URL補完スクリプト実行中...")
     print()
     
+    corpus = open_corpus()
+
     # 千葉県のURL抽出
     print("千葉県のURL情報を抽出中...")
-    chiba_urls = extract_url_from_sql('scripts/chiba_27_municipalities_complete.sql')
+    chiba_urls = extract_url_from_sql('scripts/chiba_27_municipalities_complete.sql', corpus)
     print(f"  抽出完了: {len(chiba_urls)}自治体")
     
     # 埼玉県のURL抽出
     print("埼玉県のURL情報を抽出中...")
-    saitama_urls = extract_url_from_sql('scripts/saitama_37_municipalities_complete.sql')
+    saitama_urls = extract_url_from_sql('scripts/saitama_37_municipalities_complete.sql', corpus)
     print(f"  抽出完了: {len(saitama_urls)}自治体")
+    corpus.close()
     
     print()
     print("UPDATE SQL文を生成中...")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+wrangler d1 execute の出力（JSON）をストリーミングで読むリーダー
+
+  - 先頭のバナー（⛅️ wrangler ... / 🌀 Executing ...）を読み飛ばす
+  - results 配列を1行ずつパースして返すため、出力サイズに関係なくメモリは一定
+
+使い方:
+  python3 scripts/wrangler_output.py production-deals-backup-2025-12-02.json
+  python3 scripts/wrangler_output.py production-deals-backup-2025-12-02.json --jsonl > deals.jsonl
+"""
+import json
+import sys
+
+CHUNK_SIZE = 64 * 1024
+
+
+class WranglerOutputError(Exception):
+    """wrangler出力の解析に失敗した"""
+
+
+class _JsonStream:
+    """ファイルからJSON値を1つずつ取り出す（必要な分だけ読み込む）"""
+
+    def __init__(self, fp, buffer='', chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.buf = buffer
+        self.pos = 0
+        self.eof = False
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 消費済みの部分を捨ててバッファを小さく保つ
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """空白を読み飛ばして次の1文字を返す（終端なら空文字）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise WranglerOutputError(f"'{chars}' が必要な位置に '{ch or 'EOF'}' があります")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        """次のJSON値を1つパースして返す"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or not self._fill():
+                    raise WranglerOutputError(f"JSON解析エラー: {e.msg}") from e
+                continue
+            # 数値がバッファ末尾で途切れている可能性があるので、末尾なら読み足して再解析
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _skip_banner(fp):
+    """バナー行を読み飛ばし、JSON部分の先頭行を返す"""
+    banner = []
+    while True:
+        line = fp.readline()
+        if not line:
+            break
+        if line.lstrip().startswith('['):
+            return line
+        banner.append(line.rstrip())
+    detail = '\n'.join(line for line in banner[-5:] if line)
+    raise WranglerOutputError(f"wrangler出力にJSONが見つかりません\n{detail}")
+
+
+def iter_rows(fp, metas=None):
+    """
+    wrangler出力から results の行（dict）を1件ずつ返す
+
+    Args:
+        fp: テキストモードのファイル（またはサブプロセスの標準出力）
+        metas: リストを渡すと各コマンドの meta を追記する
+    """
+    stream = _JsonStream(fp, _skip_banner(fp))
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+
+    while True:
+        # コマンドごとの結果 {"results": [...], "success": ..., "meta": {...}}
+        stream.expect('{')
+        if stream.peek() != '}':
+            while True:
+                key = stream.value()
+                stream.expect(':')
+                if key == 'results' and stream.peek() == '[':
+                    stream.expect('[')
+                    if stream.peek() != ']':
+                        while True:
+                            yield stream.value()
+                            if stream.expect(',]') == ']':
+                                break
+                    else:
+                        stream.expect(']')
+                else:
+                    value = stream.value()
+                    if key == 'meta' and metas is not None:
+                        metas.append(value)
+                if stream.expect(',}') == '}':
+                    break
+        else:
+            stream.expect('}')
+
+        if stream.expect(',]') == ']':
+            return
+
+
+def load_rows(path, metas=None):
+    """wrangler出力を保存したファイルから行を1件ずつ返す"""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_rows(f, metas)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("使い方: python3 scripts/wrangler_output.py <wrangler出力ファイル> [--jsonl]", file=sys.stderr)
+        sys.exit(1)
+
+    path = sys.argv[1]
+    as_jsonl = '--jsonl' in sys.argv[2:]
+    metas = []
+    count = 0
+    columns = None
+    try:
+        for row in load_rows(path, metas):
+            count += 1
+            if columns is None:
+                columns = list(row.keys())
+            if as_jsonl:
+                print(json.dumps(row, ensure_ascii=False))
+    except WranglerOutputError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    out = sys.stderr if as_jsonl else sys.stdout
+    print(f"📊 {path}: {count}行 / {len(metas)}コマンド", file=out)
+    if columns:
+        print(f"   列: {', '.join(columns)}", file=out)
+
+
+if __name__ == '__main__':
+    main()